@@ -1,52 +1,113 @@
+import logging
+
 from selenium import webdriver
+from selenium.common.exceptions import TimeoutException, WebDriverException
+from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.common.by import By
-from selenium.webdriver.common.keys import Keys
-import time
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.webdriver.support.ui import WebDriverWait
+
+from form_submitter import (AMOUNT_FIELD_IDS, ERROR_CLASS, FIELD_IDS, RESULT_ID, SUBMIT_BUTTON_ID, FormSubmitter,
+                            parse_page, submit_error)
+
+logger = logging.getLogger(__name__)
 
-class WebFormFiller:
-    def __init__(self, driver_path, url):
+
+class WebFormFiller(FormSubmitter):
+    def __init__(self, driver_path, url, timeout: float = 10, headless: bool = False, cookies=None):
         self.driver_path = driver_path
         self.url = url
+        self.timeout = timeout
+        self.headless = headless
+        self.cookies = cookies  # 登录后导出的 Cookie {名称: 值}，启动时带上
         self.driver = None
+        self.last_error = None  # 最近一次提交失败的原因
 
     def start_browser(self):
-        # 启动浏览器
-        self.driver = webdriver.Chrome(executable_path=self.driver_path)
-        self.driver.get(self.url)
-        time.sleep(2)  # 等待页面加载
+        # 启动浏览器；同一个实例可以连续提交多张账单，只在第一次调用时启动
+        if self.driver is not None:
+            return
+        options = webdriver.ChromeOptions()
+        if self.headless:
+            options.add_argument("--headless=new")
+        self.driver = webdriver.Chrome(service=Service(self.driver_path), options=options)
+        if self.cookies:
+            # Cookie 只能加到当前域名上，先打开页面再设置
+            self.driver.get(self.url)
+            for name, value in self.cookies.items():
+                self.driver.add_cookie({"name": name, "value": value})
+        self.open_form()
 
-    def fill_form(self, bill_info):
-        # 填写表单
-        try:
-            # 定位表单元素并填写数据
-            bill_number_input = self.driver.find_element(By.ID, "bill_number_input_id")
-            bill_number_input.send_keys(bill_info["bill_number"])
-
-            date_input = self.driver.find_element(By.ID, "date_input_id")
-            date_input.send_keys(bill_info["date"])
+    def open_form(self):
+        # 打开表单页面，等到第一个输入框出现（代替固定等待 2 秒）
+        self.driver.get(self.url)
+        self._wait_for_form()
 
-            user_input = self.driver.find_element(By.ID, "user_input_id")
-            user_input.send_keys(bill_info["user"])
+    def _wait_for_form(self):
+        return WebDriverWait(self.driver, self.timeout).until(
+            EC.element_to_be_clickable((By.ID, FIELD_IDS["bill_number"]))
+        )
 
-            vehicle_input = self.driver.find_element(By.ID, "vehicle_input_id")
-            vehicle_input.send_keys(bill_info["vehicle"])
+    def fill_form(self, bill_info) -> bool:
+        # 填写并提交表单，返回是否提交成功
+        self.last_error = None
+        try:
+            # 上一次提交后页面不是表单（例如跳转到了结果页）时重新打开
+            if not self.driver.find_elements(By.ID, SUBMIT_BUTTON_ID):
+                self.open_form()
+            else:
+                self._wait_for_form()
 
-            department_input = self.driver.find_element(By.ID, "department_input_id")
-            department_input.send_keys(bill_info["department"])
+            for key, element_id in FIELD_IDS.items():
+                field = self.driver.find_element(By.ID, element_id)
+                field.clear()
+                field.send_keys(bill_info[key])
+            for key, element_id in AMOUNT_FIELD_IDS.items():
+                fields = self.driver.find_elements(By.ID, element_id)
+                if fields and key in bill_info:
+                    fields[0].clear()
+                    fields[0].send_keys(f"{bill_info[key]:.2f}")
 
-            # 提交表单
-            submit_button = self.driver.find_element(By.ID, "submit_button_id")
+            # 提交表单，等到原页面被替换（提交请求已返回），代替固定等待 2 秒
+            submit_button = self.driver.find_element(By.ID, SUBMIT_BUTTON_ID)
             submit_button.click()
+            wait = WebDriverWait(self.driver, self.timeout)
+            wait.until(EC.staleness_of(submit_button))
+            # 再等新页面出现结果提示、错误提示、表单或登录框之一，按页面内容判断是否被接受（与 http 方式相同）
+            wait.until(EC.any_of(
+                EC.presence_of_element_located((By.ID, RESULT_ID)),
+                EC.presence_of_element_located((By.CLASS_NAME, ERROR_CLASS)),
+                EC.presence_of_element_located((By.ID, SUBMIT_BUTTON_ID)),
+                EC.presence_of_element_located((By.CSS_SELECTOR, "input[type=password]")),
+            ))
+            self.last_error = submit_error(parse_page(self.driver.page_source), bill_info["bill_number"])
+            if self.last_error:
+                logger.error(f"提交账单 {bill_info.get('bill_number')} 失败: {self.last_error}")
+                return False
+            return True
 
-            time.sleep(2)  # 等待表单提交
-
+        except TimeoutException:
+            self.last_error = "等待页面超时"
+            logger.error(f"提交账单 {bill_info.get('bill_number')} 超时")
+        except WebDriverException as e:
+            self.last_error = e.msg or type(e).__name__
+            logger.error(f"填写表单时出错: {bill_info.get('bill_number')}, 错误: {e}")
         except Exception as e:
-            print(f"填写表单时出错: {e}")
+            # 与原来一样捕获所有错误并记为这一张失败，由提交队列退避重试，不中断会话
+            self.last_error = str(e) or type(e).__name__
+            logger.exception(f"填写表单时出错: {bill_info.get('bill_number')}")
+        return False
 
     def close_browser(self):
         # 关闭浏览器
         if self.driver:
             self.driver.quit()
+            self.driver = None
+
+    # FormSubmitter 接口
+    start = start_browser
+    submit = fill_form
+    close = close_browser
 
 if __name__ == "__main__":
     # 示例数据
@@ -66,4 +127,4 @@ if __name__ == "__main__":
     form_filler = WebFormFiller(driver_path, url)
     form_filler.start_browser()
     form_filler.fill_form(bill_info)
-    form_filler.close_browser()
\ No newline at end of file
+    form_filler.close_browser()
@@ -0,0 +1,294 @@
+"""
+账单分析：按年月分区的 Parquet 导出和汇总报表
+
+export 把 bills、bill_items 按账单日期的年月分区写成 Parquet（OUT/bills/year_month=2024-07/part-*.parquet），
+employees 整表写入 OUT/employees.parquet。每次只导出上次导出的最大行ID之后的新行（状态记在 OUT/_export_state.json）；
+已导出的行被删除、替换或修改过（例如 main.py --reparse）时自动全量重建。
+report 只读取需要的列和分区，用 pandas 按月/年汇总各部门、各车型或各明细项目的金额
+（部门和车型报表包括没有明细的账单）。与数据库直接汇总的核对见 benchmarks/check_analytics.py。
+需要 pyarrow
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import re
+import shutil
+import sqlite3
+import zlib
+from datetime import date, datetime
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, List, Optional, Sequence, Tuple
+
+if TYPE_CHECKING:
+    import pandas as pd
+    import pyarrow as pa
+
+logger = logging.getLogger(__name__)
+
+STATE_FILE = "_export_state.json"
+PART_NAME = re.compile(r"part-(\d+)-(\d+)\.parquet$")
+YEAR_MONTH = "(substr(bills.date, 7, 4) || '-' || substr(bills.date, 4, 2))"
+
+# 分区导出的表 -> (查询新行的 SQL, 统计已导出范围 (行数, 校验和) 的 SQL, [(列名, 类型)])，查询的最后一列是分区键 year_month
+# 类型: int64 / float64 / string / category（字典编码）/ date（dd.mm.yyyy 转为 date32，无法解析的为空）
+# bills 的校验和是各行 row_checksum 之和，账单被原地更新（main.py --reparse）时也能发现；
+# 明细重新解析时总是删除后重新插入，行数就能发现变化
+PARTITIONED_TABLES = {
+    "bills": (
+        f"""
+        SELECT bills.id, bills.bill_number, bills.date, bills.user_name, bills.vehicle_name, {YEAR_MONTH}
+        FROM bills WHERE bills.id > ? ORDER BY bills.id
+        """,
+        "SELECT COUNT(*), TOTAL(row_checksum(id, bill_number, date, user_name, vehicle_name)) FROM bills "
+        "WHERE id <= ?",
+        [("id", "int64"), ("bill_number", "string"), ("date", "date"),
+         ("user_name", "category"), ("vehicle_name", "category")],
+    ),
+    "bill_items": (
+        f"""
+        SELECT bill_items.id, bill_items.bill_id, bill_items.item_name, bill_items.amount, bill_items.tax,
+               bill_items.tax_rate, bill_items.total_amount, {YEAR_MONTH}
+        FROM bill_items JOIN bills ON bills.id = bill_items.bill_id
+        WHERE bill_items.id > ? ORDER BY bill_items.id
+        """,
+        "SELECT COUNT(*), 0 FROM bill_items JOIN bills ON bills.id = bill_items.bill_id WHERE bill_items.id <= ?",
+        [("id", "int64"), ("bill_id", "int64"), ("item_name", "category"), ("amount", "float64"),
+         ("tax", "float64"), ("tax_rate", "category"), ("total_amount", "float64")],
+    ),
+}
+CHECKSUM_TABLES = {"bills"}
+EMPLOYEE_COLUMNS = [("id", "int64"), ("name", "string"), ("department", "category"), ("vehicle_name", "category")]
+
+# 报表 -> 分组列；周期 -> 从 year_month 取的前缀长度
+REPORTS = {"department": "department", "vehicle": "vehicle_name", "item": "item_name"}
+PERIODS = {"month": 7, "year": 4}
+
+
+def row_checksum(*values) -> int:
+    """一行的 CRC32，导出时在 Python 中累加，核对时注册为 SQLite 函数在数据库中累加"""
+    return zlib.crc32("\x1f".join(map(str, values)).encode("utf-8"))
+
+
+def _parse_date(value) -> Optional[date]:
+    try:
+        return datetime.strptime(value, "%d.%m.%Y").date()
+    except (TypeError, ValueError):
+        return None
+
+
+def _arrow_table(columns: Sequence[Tuple[str, str]], rows: List[tuple]) -> pa.Table:
+    import pyarrow as pa
+
+    arrays = []
+    for (name, kind), values in zip(columns, zip(*rows)):
+        if kind == "date":
+            # 逐行解析，个别格式不对的日期记为空，不让整次导出失败
+            dates = [_parse_date(value) for value in values]
+            invalid = sum(1 for value, parsed in zip(values, dates) if parsed is None and value is not None)
+            if invalid:
+                logger.warning(f"{name}: {invalid} 个日期无法解析，导出为空")
+            array = pa.array(dates, pa.date32())
+        elif kind == "category":
+            array = pa.array(values, pa.string()).dictionary_encode()
+        else:
+            array = pa.array(values, getattr(pa, kind)())
+        arrays.append(array)
+    return pa.Table.from_arrays(arrays, names=[name for name, _ in columns])
+
+
+def _write_parquet(table: pa.Table, path: Path):
+    """先写临时文件再改名，中断时不会留下不完整的文件"""
+    import pyarrow.parquet as pq
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    pq.write_table(table, tmp, compression="zstd")
+    tmp.replace(path)
+
+
+class ParquetExporter:
+    def __init__(self, db_path: str, out_dir: str, chunk_size: int = 100_000):
+        self.db_path = db_path
+        self.out_dir = Path(out_dir)
+        self.chunk_size = chunk_size
+
+    def load_state(self) -> Dict[str, Dict[str, int]]:
+        """表 -> {last_id: 已导出的最大行ID, rows: 已导出行数, checksum: 已导出行的校验和}"""
+        path = self.out_dir / STATE_FILE
+        if not path.exists():
+            return {}
+        return json.loads(path.read_text(encoding="utf-8"))
+
+    def save_state(self, state: Dict[str, Dict[str, int]]):
+        path = self.out_dir / STATE_FILE
+        tmp = path.with_name(path.name + ".tmp")
+        tmp.write_text(json.dumps(state, indent=2), encoding="utf-8")
+        tmp.replace(path)
+
+    def _rows_changed(self, conn: sqlite3.Connection, state: Dict[str, Dict[str, int]]) -> bool:
+        """已导出范围内的行数或校验和与导出时不同，说明有行被删除、替换或原地更新"""
+        conn.create_function("row_checksum", -1, row_checksum, deterministic=True)
+        for table, exported in state.items():
+            count, checksum = conn.execute(PARTITIONED_TABLES[table][1], (exported["last_id"],)).fetchone()
+            if count != exported["rows"]:
+                logger.warning(f"{table} 中已导出的行有变化（{exported['rows']} -> {count}），全量重新导出")
+                return True
+            if int(checksum) != exported.get("checksum"):
+                logger.warning(f"{table} 中已导出的行被修改过，全量重新导出")
+                return True
+        return False
+
+    def _drop_unrecorded(self, table_dir: Path, last_id: int):
+        """删除上次中断时已写出、但没记入状态的分区文件（其中的行会重新导出）"""
+        for path in table_dir.glob("year_month=*/part-*.parquet"):
+            match = PART_NAME.search(path.name)
+            if match and int(match.group(1)) > last_id:
+                path.unlink()
+
+    def _write_chunk(self, table_dir: Path, columns, rows: List[tuple]):
+        partitions: Dict[str, List[tuple]] = {}
+        for row in rows:
+            partitions.setdefault(row[-1], []).append(row[:-1])
+        for year_month, part_rows in partitions.items():
+            name = f"part-{part_rows[0][0]:012d}-{part_rows[-1][0]:012d}.parquet"
+            _write_parquet(_arrow_table(columns, part_rows), table_dir / f"year_month={year_month}" / name)
+
+    def export(self, full: bool = False) -> Dict[str, int]:
+        """导出新行，返回各表本次导出的行数"""
+        conn = sqlite3.connect(self.db_path)
+        try:
+            state = self.load_state()
+            if full or self._rows_changed(conn, state):
+                for table in PARTITIONED_TABLES:
+                    shutil.rmtree(self.out_dir / table, ignore_errors=True)
+                state = {}
+            self.out_dir.mkdir(parents=True, exist_ok=True)
+
+            exported = {}
+            for table, (sql, _, columns) in PARTITIONED_TABLES.items():
+                table_state = state.get(table, {"last_id": 0, "rows": 0, "checksum": 0})
+                self._drop_unrecorded(self.out_dir / table, table_state["last_id"])
+                cursor = conn.execute(sql, (table_state["last_id"],))
+                exported[table] = 0
+                while True:
+                    rows = cursor.fetchmany(self.chunk_size)
+                    if not rows:
+                        break
+                    self._write_chunk(self.out_dir / table, columns, rows)
+                    checksum = table_state["checksum"]
+                    if table in CHECKSUM_TABLES:
+                        checksum += sum(row_checksum(*row[:-1]) for row in rows)
+                    table_state = {"last_id": rows[-1][0], "rows": table_state["rows"] + len(rows),
+                                   "checksum": checksum}
+                    state[table] = table_state
+                    self.save_state(state)
+                    exported[table] += len(rows)
+                logger.info(f"{table}: 导出 {exported[table]} 行，共 {table_state['rows']} 行")
+
+            # 员工表很小且会被修改（部门），每次整表重写
+            rows = conn.execute("SELECT id, name, department, vehicle_name FROM employees ORDER BY id").fetchall()
+            if rows:
+                _write_parquet(_arrow_table(EMPLOYEE_COLUMNS, rows), self.out_dir / "employees.parquet")
+            else:
+                (self.out_dir / "employees.parquet").unlink(missing_ok=True)
+            exported["employees"] = len(rows)
+            return exported
+        finally:
+            conn.close()
+
+
+def _partition_filters(date_from: Optional[str], date_to: Optional[str]):
+    """yyyy-mm 或 yyyy 的起止范围 -> year_month 分区过滤条件"""
+    filters = []
+    if date_from:
+        filters.append(("year_month", ">=", date_from[:7]))
+    if date_to:
+        # 只给到年份时包含该年的全部月份
+        filters.append(("year_month", "<=", date_to[:7] if len(date_to) >= 7 else f"{date_to}-12"))
+    return filters or None
+
+
+def load_frames(out_dir: str, report: str, date_from: Optional[str] = None,
+                date_to: Optional[str] = None) -> Tuple[pd.DataFrame, Optional[pd.DataFrame], Optional[pd.DataFrame]]:
+    """读取报表所需的列和分区: (明细, 账单, 员工)，用不到的表为 None"""
+    import pandas as pd
+
+    out = Path(out_dir)
+    filters = _partition_filters(date_from, date_to)
+    if report == "item":
+        items = pd.read_parquet(out / "bill_items", columns=["bill_id", "item_name", "amount", "tax", "total_amount",
+                                                             "year_month"], filters=filters)
+        return items, None, None
+    items = pd.read_parquet(out / "bill_items", columns=["bill_id", "amount", "tax", "total_amount"], filters=filters)
+    bills = pd.read_parquet(out / "bills", columns=["id", "user_name", "vehicle_name", "year_month"], filters=filters)
+    if report != "department":
+        return items, bills, None
+    employees = pd.read_parquet(out / "employees.parquet", columns=["name", "vehicle_name", "department"])
+    return items, bills, employees
+
+
+def build_report(items: pd.DataFrame, bills: Optional[pd.DataFrame], employees: Optional[pd.DataFrame],
+                 report: str = "department", period: str = "month") -> pd.DataFrame:
+    """
+    按周期和报表维度汇总账单数与净额/税额/总额。部门和车型报表以账单为主左连接明细，
+    没有明细的账单也计入账单数（金额为 0）；部门按姓名和车辆匹配员工，与 bill_report 一致。
+    明细项目报表只统计明细，账单数是含有该项目的账单数
+    """
+    if report == "item":
+        frame, bill_id = items, "bill_id"
+    else:
+        amounts = items[["bill_id", "amount", "tax", "total_amount"]]
+        frame, bill_id = bills.merge(amounts, left_on="id", right_on="bill_id", how="left"), "id"
+    if report == "department":
+        frame = frame.merge(employees, left_on=["user_name", "vehicle_name"], right_on=["name", "vehicle_name"],
+                            how="left")
+        frame["department"] = frame["department"].astype(object).fillna("Unknown")
+    key = REPORTS[report]
+    # 读回的名称列是分类类型，groupby 会按字典中出现的先后排序，转成字符串才按字母排序
+    frame[key] = frame[key].astype(str)
+    frame[period] = frame["year_month"].astype(str).str[:PERIODS[period]]
+    result = (
+        frame.groupby([period, key], observed=True, sort=True)
+        .agg(bills=(bill_id, "nunique"), net=("amount", "sum"), tax=("tax", "sum"), gross=("total_amount", "sum"))
+        .reset_index()
+    )
+    return result.round({"net": 2, "tax": 2, "gross": 2})
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="账单 Parquet 导出和分析报表")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = commands.add_parser("export", help="增量导出 bills / bill_items / employees 到 Parquet")
+    export_parser.add_argument("out", help="输出目录")
+    export_parser.add_argument("--db", default="bills.db", help="数据库路径 (默认: bills.db)")
+    export_parser.add_argument("--full", action="store_true", help="删除已导出的文件，全量重新导出")
+    export_parser.add_argument("--chunk-size", type=int, default=100_000, help="每批读取的行数 (默认: 100000)")
+
+    report_parser = commands.add_parser("report", help="基于导出的 Parquet 汇总金额")
+    report_parser.add_argument("out", help="export 的输出目录")
+    report_parser.add_argument("--by", default="department", choices=REPORTS, help="汇总维度 (默认: department)")
+    report_parser.add_argument("--period", default="month", choices=PERIODS, help="汇总周期 (默认: month)")
+    report_parser.add_argument("--from", dest="date_from", help="开始年月 yyyy-mm 或年份 yyyy（含）")
+    report_parser.add_argument("--to", dest="date_to", help="结束年月 yyyy-mm 或年份 yyyy（含）")
+    report_parser.add_argument("-o", "--output", help="写入 CSV 文件（默认打印）")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    if args.command == "export":
+        exported = ParquetExporter(args.db, args.out, args.chunk_size).export(args.full)
+        print("  ".join(f"{table}: {count}" for table, count in exported.items()))
+        return
+
+    result = build_report(*load_frames(args.out, args.by, args.date_from, args.date_to), args.by, args.period)
+    if args.output:
+        result.to_csv(args.output, index=False, encoding="utf-8-sig")
+        print(f"已写入 {len(result)} 行到 {args.output}")
+    else:
+        print(result.to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
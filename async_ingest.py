@@ -0,0 +1,137 @@
+"""
+基于 asyncio 的账单导入：文件读取与解析重叠进行
+
+网络共享目录上大部分时间花在等待文件读取上。这里用信号量限制同时读入内存的文件数，
+并发预读PDF内容并在内存中计算哈希（不再为哈希单独读一遍文件），
+再把内存中的内容交给执行器里的 PDFExtractor 解析；所有结果按输入顺序交给唯一的写库协程
+"""
+import asyncio
+import hashlib
+import logging
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, Optional, Tuple
+
+from db_manager import DBManager
+from pdf_extractor import PDFExtractor
+from pipeline import BillRecord, _extract_bytes_in_worker, _init_worker, normalize, record_worker_timings, write_batch
+from text_cache import TextCache
+
+logger = logging.getLogger(__name__)
+
+
+def read_bytes(pdf_path: Path) -> bytes:
+    """读取文件内容（可替换，例如基准测试中模拟慢速文件系统）"""
+    return pdf_path.read_bytes()
+
+
+def _load(pdf_path: Path, reader: Callable[[Path], bytes]) -> Tuple[bytes, str]:
+    """在 I/O 线程中读取文件并计算 SHA-256"""
+    data = reader(pdf_path)
+    return data, hashlib.sha256(data).hexdigest()
+
+
+async def ingest_async(bills_path: Path, db: DBManager, extractor: Optional[PDFExtractor] = None,
+                       workers: int = 1, prefetch: int = 8, force: bool = False,
+                       commit_size: Optional[int] = None,
+                       on_record: Optional[Callable[[BillRecord], None]] = None,
+                       reader: Callable[[Path], bytes] = read_bytes,
+                       text_cache: Optional[TextCache] = None) -> int:
+    """
+    导入 bills_path 下的所有PDF，返回处理的文件数
+    prefetch: 同时读入内存（读取中或等待解析）的文件数上限
+    workers: >1 时在进程池中解析，否则在单个线程中解析
+    on_record: 每条记录写库后的回调
+    text_cache: 提取出的文本写入该缓存
+    """
+    extractor = extractor or PDFExtractor()
+    commit_size = commit_size or db.commit_size
+    manifest = {} if force else db.get_manifest()
+    known_hashes = {entry[2]: entry[3] for entry in manifest.values()}
+    loop = asyncio.get_running_loop()
+    semaphore = asyncio.Semaphore(prefetch)
+    io_pool = ThreadPoolExecutor(max_workers=prefetch, thread_name_prefix='pdf-io')
+    if workers > 1:
+        cpu_pool: Executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                                 initargs=(extractor.layout_mode,))
+        extract = _extract_bytes_in_worker
+    else:
+        cpu_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix='pdf-parse')
+
+        def extract(data: bytes) -> Tuple[Optional[Dict], Dict, Optional[str]]:
+            bill_data = extractor.extract_bill_data_from_bytes(data)
+            return bill_data, extractor.last_timings, extractor.last_text
+
+    async def process(pdf_path: Path) -> Optional[BillRecord]:
+        async with semaphore:
+            stat = await loop.run_in_executor(io_pool, pdf_path.stat)
+            entry = manifest.get(str(pdf_path.resolve()))
+            if entry and entry[0] == stat.st_size and entry[1] == stat.st_mtime_ns:
+                return None
+            try:
+                data, content_hash = await loop.run_in_executor(io_pool, _load, pdf_path, reader)
+            except OSError as e:
+                logger.error(f"读取文件失败: {pdf_path.name}, 错误: {str(e)}")
+                return BillRecord(pdf_path)
+            record = BillRecord(pdf_path, (stat.st_size, stat.st_mtime_ns, content_hash))
+            if content_hash in known_hashes:
+                record.known_bill_id = known_hashes[content_hash]
+                return record
+            logger.debug(f"处理文件: {pdf_path.name}...")
+            record.bill_data, record.timings, record.text = await loop.run_in_executor(cpu_pool, extract, data)
+            if workers > 1:
+                record_worker_timings(record)
+        record.valid = bool(record.bill_data) and extractor.validate_data(record.bill_data)
+        return record
+
+    # 队列中是按输入顺序创建的任务，写库协程依次等待，写入顺序与串行处理一致
+    tasks: asyncio.Queue = asyncio.Queue(maxsize=prefetch * 2)
+
+    async def produce():
+        for pdf_path in Path(bills_path).glob("*.pdf"):
+            await tasks.put(asyncio.ensure_future(process(pdf_path)))
+        await tasks.put(None)
+
+    async def writer() -> int:
+        processed = 0
+        skipped = 0
+        batch = []
+
+        def flush():
+            records = list(normalize(batch))
+            write_batch(db, records, text_cache)
+            if on_record:
+                for record in records:
+                    on_record(record)
+            batch.clear()
+
+        while True:
+            task = await tasks.get()
+            if task is None:
+                break
+            record = await task
+            if record is None:
+                skipped += 1
+                continue
+            processed += 1
+            batch.append(record)
+            if len(batch) >= commit_size:
+                flush()
+        if batch:
+            flush()
+        logger.info(f"共 {processed + skipped} 个文件，跳过未变化的 {skipped} 个，处理 {processed} 个")
+        return processed
+
+    producer = asyncio.ensure_future(produce())
+    try:
+        processed = await writer()
+        await producer
+        return processed
+    finally:
+        producer.cancel()
+        while not tasks.empty():
+            task = tasks.get_nowait()
+            if task is not None:
+                task.cancel()
+        io_pool.shutdown(wait=True, cancel_futures=True)
+        cpu_pool.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,89 @@
+"""
+asyncio 导入在慢速文件系统上的重叠收益基准测试
+
+每次读文件前人为等待 --latency 毫秒模拟网络共享目录，对比逐个读取+解析与 ingest_async 的墙钟时间
+用法: python benchmarks/bench_async_io.py [pdf_dir] [--files 60] [--latency 50] [--prefetch 8] [--workers 1]
+pdf_dir 中的PDF会被循环复制到临时目录直到凑够 --files 个文件
+"""
+import argparse
+import asyncio
+import logging
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from async_ingest import ingest_async  # noqa: E402
+from db_manager import DBManager  # noqa: E402
+from pdf_extractor import PDFExtractor  # noqa: E402
+from pipeline import BillRecord, normalize, write_batch  # noqa: E402
+
+
+def slow_reader(latency: float):
+    """返回一个在读取前等待 latency 秒的读取函数"""
+    def read(pdf_path: Path) -> bytes:
+        time.sleep(latency)
+        return pdf_path.read_bytes()
+    return read
+
+
+def prepare_files(source_dir: Path, target_dir: Path, count: int):
+    sources = sorted(source_dir.glob("*.pdf"))
+    if not sources:
+        raise SystemExit(f"{source_dir} 中没有PDF文件")
+    for n in range(count):
+        shutil.copy(sources[n % len(sources)], target_dir / f"bill_{n:05d}.pdf")
+
+
+def bench_sequential(files_dir: Path, db: DBManager, reader) -> int:
+    """逐个读取、解析，按批写库（读取与解析不重叠）"""
+    extractor = PDFExtractor()
+    batch = []
+    for pdf_path in sorted(files_dir.glob("*.pdf")):
+        record = BillRecord(pdf_path)
+        record.bill_data = extractor.extract_bill_data_from_bytes(reader(pdf_path))
+        record.valid = bool(record.bill_data) and extractor.validate_data(record.bill_data)
+        batch.append(record)
+    write_batch(db, list(normalize(batch)))
+    return len(batch)
+
+
+def bench_async(files_dir: Path, db: DBManager, reader, prefetch: int, workers: int) -> int:
+    return asyncio.run(ingest_async(files_dir, db, workers=workers, prefetch=prefetch, force=True, reader=reader))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="asyncio 导入在慢速文件系统上的基准测试")
+    parser.add_argument("pdf_dir", nargs="?", default="Bills", help="样本PDF目录 (默认: Bills)")
+    parser.add_argument("--files", type=int, default=60, help="文件数量 (默认: 60)")
+    parser.add_argument("--latency", type=float, default=50, help="每次读取的附加延迟，毫秒 (默认: 50)")
+    parser.add_argument("--prefetch", type=int, default=8, help="ingest_async 的预读并发数 (默认: 8)")
+    parser.add_argument("--workers", type=int, default=1, help="ingest_async 的解析进程数 (默认: 1)")
+    args = parser.parse_args()
+
+    logging.disable(logging.ERROR)
+    reader = slow_reader(args.latency / 1000)
+    with tempfile.TemporaryDirectory() as tmp:
+        files_dir = Path(tmp) / "bills"
+        files_dir.mkdir()
+        prepare_files(Path(args.pdf_dir), files_dir, args.files)
+        results = {}
+        for name, func in [
+            ("sequential", lambda db: bench_sequential(files_dir, db, reader)),
+            ("asyncio", lambda db: bench_async(files_dir, db, reader, args.prefetch, args.workers)),
+        ]:
+            with DBManager(str(Path(tmp) / f"{name}.db")) as db:
+                start = time.perf_counter()
+                count = func(db)
+                elapsed = time.perf_counter() - start
+            results[name] = elapsed
+            print(f"{name:>10}: {count} 个文件, {elapsed:.2f}s, {count / elapsed:.1f} 文件/s")
+        print(f"读取延迟 {args.latency:.0f}ms, prefetch={args.prefetch}: "
+              f"加速 {results['sequential'] / results['asyncio']:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+DBManager 写入吞吐量基准测试
+
+用法: python benchmarks/bench_db_ingest.py [--bills 2000] [--items 15]
+"""
+import argparse
+import logging
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from db_manager import DBManager  # noqa: E402
+
+ITEM_NAMES = ["Finanzleasingrate", "Servicerate", "Kfz Steuer", "Rundfunkbeitrag", "Reifenersatz", "Wartung"]
+
+
+def make_bills(count: int, items_per_bill: int, seed: int = 42):
+    """生成合成账单数据，格式与 PDFExtractor.extract_bill_data 的返回值一致"""
+    rnd = random.Random(seed)
+    bills = []
+    for n in range(count):
+        items = []
+        for k in range(items_per_bill):
+            amount = round(rnd.uniform(5, 900), 2)
+            tax = round(amount * 0.19, 2)
+            items.append({
+                'tax_rate': '19',
+                'item_name': f"{ITEM_NAMES[k % len(ITEM_NAMES)]} {k}",
+                'amount': amount,
+                'tax': tax,
+                'total_amount': amount + tax
+            })
+        bills.append(({
+            'bill_number': str(40000000 + n),
+            'date': f"{rnd.randint(1, 28):02d}.{rnd.randint(1, 12):02d}.2024",
+            'user_name': f"Max{n % 500} Mustermann",
+            'vehicle_name': rnd.choice(["ID.4", "TESLA", "BMW", "AUDI"]),
+            'items': items
+        }, f"Rechnung_{40000000 + n}.pdf"))
+    return bills
+
+
+def bench_per_row(db_path: str, bills) -> float:
+    db = DBManager(db_path)
+    start = time.perf_counter()
+    for bill_data, filename in bills:
+        bill_id = db.add_bill(bill_data, filename)
+        for item in bill_data['items']:
+            db.add_bill_item(bill_id, item)
+    return time.perf_counter() - start
+
+
+def bench_bulk(db_path: str, bills) -> float:
+    db = DBManager(db_path)
+    start = time.perf_counter()
+    db.bulk_ingest(bills)
+    return time.perf_counter() - start
+
+
+def bench_lookups(db_path: str, bills, rounds: int = 200) -> float:
+    """查看器/报表常用查询的平均延迟（毫秒）"""
+    db = DBManager(db_path)
+    db.bulk_ingest(bills)
+    rnd = random.Random(7)
+    cursor = db.conn.cursor()
+    start = time.perf_counter()
+    for _ in range(rounds):
+        bill_data, _ = rnd.choice(bills)
+        cursor.execute("""
+            SELECT item_name, amount, tax, total_amount
+            FROM bill_items
+            WHERE bill_id = (SELECT id FROM bills WHERE bill_number = ?)
+        """, (bill_data['bill_number'],)).fetchall()
+        cursor.execute("""
+            SELECT bills.bill_number, employees.department
+            FROM employees
+            JOIN bills ON employees.name = bills.user_name AND employees.vehicle_name = bills.vehicle_name
+            WHERE employees.name = ?
+        """, (bill_data['user_name'],)).fetchall()
+    return (time.perf_counter() - start) / rounds * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="DBManager 写入吞吐量基准测试")
+    parser.add_argument("--bills", type=int, default=2000, help="账单数量 (默认: 2000)")
+    parser.add_argument("--items", type=int, default=15, help="每张账单的明细数 (默认: 15)")
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    bills = make_bills(args.bills, args.items)
+    modes = [("per-row", bench_per_row)]
+    if hasattr(DBManager, "bulk_ingest"):
+        modes.append(("bulk_ingest", bench_bulk))
+
+    for name, func in modes:
+        with tempfile.TemporaryDirectory() as tmp:
+            elapsed = func(str(Path(tmp) / "bench.db"), bills)
+        print(f"{name:12s} {args.bills} bills x {args.items} items: {elapsed:8.3f}s  "
+              f"{args.bills / elapsed:10.1f} bills/s")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        latency = bench_lookups(str(Path(tmp) / "bench.db"), bills)
+    print(f"{'lookup':12s} bill items + employee bills: {latency:8.3f} ms/query pair")
+
+
+if __name__ == "__main__":
+    main()
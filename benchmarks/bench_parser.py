@@ -0,0 +1,160 @@
+"""
+_parse_bill_text 微基准：计时 PDFExtractor._parse_bill_text，并与本文件中保存的参照实现比对结果和耗时，
+修改解析规则或尝试其他写法后用来确认结果是否变化、是否真的更快
+
+语料可以是已保存的提取文本（每个 .txt 文件为一张账单的 extract_text 输出），也可以是合成文本:
+    python benchmarks/bench_parser.py --dump-from Bills --text-dir texts   # 从 PDF 保存提取文本
+    python benchmarks/bench_parser.py --text-dir texts
+    python benchmarks/bench_parser.py --synthetic 2000
+"""
+import argparse
+import logging
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.corpus import corpus  # noqa: E402
+from pdf_extractor import PDFExtractor  # noqa: E402
+
+_reference_logger = logging.getLogger("reference_parser")
+
+
+def reference_parse_bill_text(text: str) -> Dict:
+    """逐行子串判断的参照实现（与 PDFExtractor._parse_bill_text 的原实现相同）"""
+    bill_data_head = {
+        'bill_number': None,
+        'date': None,
+        'driver_name': None,
+        'vehicle_name': None
+    }
+
+    bill_data_items = {
+        'items': [],
+        'errors': []
+    }
+    
+    try:
+        pages = text.split('\n')
+        for i, line in enumerate(pages):
+            if 'Rechnung:' in line or 'Gutschrift:' in line:
+                if 'Rechnung:' in line:
+                    bill_data_head['bill_number'] = line.split('Rechnung:')[1].split('/')[0].strip()
+                elif 'Gutschrift:' in line:
+                    bill_data_head['bill_number'] = line.split('Gutschrift:')[1].split('/')[0].strip()
+            elif 'Oberhaching,' in line:
+                bill_data_head['date'] = line.split('Oberhaching,')[1].strip()
+            elif 'Vertragsnummer' in line:  # 找到第二页的合同号所在行
+                # 用户名在合同号上面一行
+                user_line = pages[i-1]
+                bill_data_head['driver_name'] = user_line.replace('Herr', '').replace('Frau', '').strip()
+                # 车辆型号在合同号上面两行
+                vehicle_line = pages[i-2]
+                parts = vehicle_line.split()
+                bill_data_head['vehicle_name'] = ''.join(parts[0]).strip().upper()
+            elif 'Rechnung exkl. MwSt.' in line or 'Gesamtsumme Gutschrift exkl. MwSt.' in line:
+                # 开始解析详细支出项
+                for item_line in pages[i+1:]:
+                    if 'Total MwSt.' in item_line:
+                        break  # 遇到Total MwSt.时停止解析
+                    if '%' in item_line:
+                        try:
+                            parts = item_line.split()
+                            tax_rate = parts[0].replace('%', '')
+                            if 'MwSt.' in item_line:
+                                mwst_index = item_line.find('MwSt.') + len('MwSt.')
+                                item_details = item_line[mwst_index:].strip().split()
+                            else:
+                                item_details = parts[1:-2]
+
+                            item_name = ' '.join(item_details[:-2])  # 取 `MwSt.` 后面的部分
+                            amount = float(item_details[-2].replace(',', '.'))
+                            tax = float(item_details[-1].replace(',', '.'))
+                            total_amount = amount + tax
+
+                            bill_data_items['items'].append({
+                                'tax_rate': tax_rate,
+                                'item_name': item_name,
+                                'amount': amount,
+                                'tax': tax,
+                                'total_amount': total_amount
+                            })
+
+                        except Exception as e:
+                            # 如果解析失败，记录错误行
+                            bill_data_items['errors'].append({
+                                'error': str(e),
+                                'line': item_line
+                            })
+                            _reference_logger.error(f"解析行时出错: {item_line}, 错误: {str(e)}")
+    except Exception as e:
+        _reference_logger.error(f"解析主文本时出错: {str(e)}")
+    
+    bill_data_head.update(bill_data_items)
+    return bill_data_head
+
+
+def dump_texts(pdf_dir: Path, text_dir: Path) -> int:
+    """把 PDF 前两页的提取文本保存为 .txt 语料"""
+    import pdfplumber
+
+    text_dir.mkdir(parents=True, exist_ok=True)
+    count = 0
+    for pdf_path in sorted(pdf_dir.glob("*.pdf")):
+        with pdfplumber.open(pdf_path) as pdf:
+            text = '\n'.join(page.extract_text() for page in pdf.pages[:2])
+        (text_dir / f"{pdf_path.stem}.txt").write_text(text, encoding="utf-8")
+        count += 1
+    return count
+
+
+def load_texts(text_dir: Path) -> List[str]:
+    return [path.read_text(encoding="utf-8") for path in sorted(text_dir.glob("*.txt"))]
+
+
+def time_parser(func, texts: List[str], repeat: int) -> float:
+    """返回 repeat 轮中最快一轮的耗时（秒）"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for text in texts:
+            func(text)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="_parse_bill_text 微基准")
+    parser.add_argument("--text-dir", help="已保存的提取文本目录 (*.txt)")
+    parser.add_argument("--dump-from", help="先从该目录的 PDF 提取文本并保存到 --text-dir")
+    parser.add_argument("--synthetic", type=int, default=2000, help="未指定 --text-dir 时的合成账单数量 (默认: 2000)")
+    parser.add_argument("--repeat", type=int, default=5, help="计时轮数，取最快一轮 (默认: 5)")
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    if args.dump_from:
+        if not args.text_dir:
+            parser.error("--dump-from 需要同时指定 --text-dir")
+        print(f"已保存 {dump_texts(Path(args.dump_from), Path(args.text_dir))} 份提取文本")
+    texts = load_texts(Path(args.text_dir)) if args.text_dir else corpus(args.synthetic)
+    if not texts:
+        parser.error("语料为空")
+
+    extractor = PDFExtractor()
+    mismatches = [i for i, text in enumerate(texts) if reference_parse_bill_text(text) != extractor._parse_bill_text(text)]
+    reference = time_parser(reference_parse_bill_text, texts, args.repeat)
+    current = time_parser(extractor._parse_bill_text, texts, args.repeat)
+
+    print(f"语料: {len(texts)} 份文本, 结果不一致: {len(mismatches)}")
+    print(f"reference {reference * 1000:9.2f} ms  {reference / len(texts) * 1e6:8.2f} us/bill")
+    print(f"current   {current * 1000:9.2f} ms  {current / len(texts) * 1e6:8.2f} us/bill  "
+          f"({reference / current:.2f}x)")
+    if mismatches:
+        print(f"不一致的文本序号: {mismatches[:20]}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+IBOS 提交内容构建基准测试
+
+对比逐张账单查询（与查询界面相同：账单+员工一次、明细一次、金额汇总一次）与 ibos_payload.iter_payloads 一次集合查询
+构建全部待提交内容的用时，并核对两者结果一致
+用法: python benchmarks/bench_payload.py [--items-total 300000] [--items 15] [--db 保留数据库的路径]
+"""
+import argparse
+import sqlite3
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.bench_report import build_db  # noqa: E402
+from db_manager import DBManager  # noqa: E402
+from ibos_payload import iter_payloads  # noqa: E402
+from submission_queue import SubmissionQueue  # noqa: E402
+
+
+def per_bill(conn: sqlite3.Connection):
+    """原来的方式：先取待提交账单号，再逐张查询"""
+    payloads = []
+    bill_numbers = [row[0] for row in conn.execute(
+        "SELECT bills.bill_number FROM bills JOIN submissions ON submissions.bill_number = bills.bill_number "
+        "WHERE submissions.status = 'pending' ORDER BY bills.id")]
+    for bill_number in bill_numbers:
+        bill_number, date, user, vehicle, department = conn.execute("""
+            SELECT bills.bill_number, bills.date, bills.user_name, bills.vehicle_name, employees.department
+            FROM bills
+            LEFT JOIN employees ON bills.user_name = employees.name AND bills.vehicle_name = employees.vehicle_name
+            WHERE bills.bill_number = ?
+        """, (bill_number,)).fetchone()
+        conn.execute("""
+            SELECT item_name, amount, tax, total_amount FROM bill_items
+            WHERE bill_id = (SELECT id FROM bills WHERE bill_number = ?)
+        """, (bill_number,)).fetchall()
+        totals = conn.execute("""
+            SELECT net, tax, gross, leasing_service_net, leasing_service_tax FROM bill_totals
+            WHERE bill_id = (SELECT id FROM bills WHERE bill_number = ?)
+        """, (bill_number,)).fetchone() or (0, 0, 0, 0, 0)
+        payloads.append({"bill_number": bill_number, "date": f"{date[6:]}-{date[3:5]}-{date[:2]}", "user": user,
+                         "vehicle": vehicle, "department": department or "Unknown",
+                         **dict(zip(("net", "tax", "gross", "leasing_service_net", "leasing_service_tax"),
+                                    (round(value, 2) for value in totals)))})
+    return payloads
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="IBOS 提交内容构建基准测试")
+    parser.add_argument("--items-total", type=int, default=300000, help="明细总数 (默认: 300000)")
+    parser.add_argument("--items", type=int, default=15, help="每张账单的明细数 (默认: 15)")
+    parser.add_argument("--db", help="保留数据库的路径（已存在时直接使用）")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = args.db or str(Path(tmp) / "bench.db")
+        if not Path(db_path).exists():
+            build_db(db_path, args.items_total, args.items)
+        with DBManager(db_path) as db:
+            SubmissionQueue(db).enqueue_new()
+        conn = sqlite3.connect(db_path)
+
+        start = time.perf_counter()
+        old = per_bill(conn)
+        old_seconds = time.perf_counter() - start
+        start = time.perf_counter()
+        new = list(iter_payloads(conn))
+        new_seconds = time.perf_counter() - start
+        conn.close()
+
+    assert old == new, "两种方式的结果不一致"
+    print(f"per-bill queries   {len(old)} payloads: {old_seconds:8.3f}s  ({len(old) / old_seconds:10.0f} payloads/s)")
+    print(f"iter_payloads      {len(new)} payloads: {new_seconds:8.3f}s  ({len(new) / new_seconds:10.0f} payloads/s)")
+
+
+if __name__ == "__main__":
+    main()
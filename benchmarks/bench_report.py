@@ -0,0 +1,87 @@
+"""
+高额账单报表导出基准测试
+
+生成约 --items-total 条明细的合成数据库，对比一次 fetchall 全部结果与 bill_report 逐批流式导出 CSV / XLSX
+的用时和进程内存峰值（每种方式在单独的子进程中运行，读取 ru_maxrss，仅限 Linux/macOS）
+用法: python benchmarks/bench_report.py [--items-total 1000000] [--items 15] [--db 保留数据库的路径] [--group-by bill]
+"""
+import argparse
+import logging
+import random
+import resource
+import sqlite3
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.bench_db_ingest import make_bills  # noqa: E402
+from bill_report import GROUPINGS, ReportQuery, iter_report, write_csv, write_xlsx  # noqa: E402
+from db_manager import DBManager  # noqa: E402
+
+DEPARTMENTS = ["Sales", "Service", "Finance", "IT", "Logistics"]
+
+
+def build_db(db_path: str, items_total: int, items_per_bill: int, chunk: int = 5000):
+    """分批写入合成账单，并给员工随机分配部门"""
+    count = items_total // items_per_bill
+    start = time.perf_counter()
+    with DBManager(db_path) as db:
+        for offset in range(0, count, chunk):
+            bills = make_bills(min(chunk, count - offset), items_per_bill, seed=offset)
+            for n, (bill_data, _) in enumerate(bills):
+                bill_data['bill_number'] = str(40000000 + offset + n)
+                bill_data['date'] = bill_data['date'][:-4] + str(2020 + (offset + n) % 5)
+            db.bulk_ingest((bill_data, f"Rechnung_{bill_data['bill_number']}.pdf") for bill_data, _ in bills)
+        rnd = random.Random(1)
+        ids = [row[0] for row in db.conn.execute("SELECT id FROM employees")]
+        with db.conn:
+            db.conn.executemany("UPDATE employees SET department = ? WHERE id = ?",
+                                [(rnd.choice(DEPARTMENTS), employee_id) for employee_id in ids])
+    print(f"build        {count} bills x {items_per_bill} items: {time.perf_counter() - start:8.2f}s")
+
+
+def run_mode(mode: str, db_path: str, group_by: str, out_dir: str):
+    """在子进程中执行一种导出方式，返回 (行数, 秒, 内存峰值MB)"""
+    baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    query = ReportQuery(group_by=group_by)
+    conn = sqlite3.connect(db_path)
+    start = time.perf_counter()
+    if mode == "fetchall":
+        header, sql, params = query.build_sql()
+        rows = len(conn.execute(sql, params).fetchall())
+    elif mode == "stream csv":
+        rows = write_csv(iter_report(conn, query), Path(out_dir) / "report.csv")
+    else:
+        rows = write_xlsx(iter_report(conn, query), Path(out_dir) / "report.xlsx")
+    elapsed = time.perf_counter() - start
+    conn.close()
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rows, elapsed, (peak - baseline) / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description="高额账单报表导出基准测试")
+    parser.add_argument("--items-total", type=int, default=1000000, help="明细总数 (默认: 1000000)")
+    parser.add_argument("--items", type=int, default=15, help="每张账单的明细数 (默认: 15)")
+    parser.add_argument("--db", help="数据库路径；文件已存在时直接使用，不重新生成")
+    parser.add_argument("--group-by", default="bill", choices=["bill", *GROUPINGS], help="汇总方式 (默认: bill)")
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = args.db or str(Path(tmp) / "bench.db")
+        if not Path(db_path).exists():
+            build_db(db_path, args.items_total, args.items)
+        for mode in ("fetchall", "stream csv", "stream xlsx"):
+            with ProcessPoolExecutor(max_workers=1) as pool:
+                rows, elapsed, peak = pool.submit(run_mode, mode, db_path, args.group_by, tmp).result()
+            print(f"{mode:12s} {rows:8d} rows: {elapsed:8.2f}s  {rows / elapsed:10.0f} rows/s  "
+                  f"peak +{peak:7.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+表单提交基准测试
+
+在本地启动 IBOS 表单替身（form_server.py，带会话 Cookie 和 CSRF 校验），比较各种提交方式的吞吐量，并核对服务器收到的提交数:
+- legacy: 原来的方式，每张账单启动一次浏览器、固定等待 2+2 秒
+- browser: SubmissionEngine + WebFormFiller，长期会话、条件等待（需要 selenium 和 chromedriver）
+- http: SubmissionEngine + HttpFormSubmitter，每个会话一条保持的连接
+--reject-every N 时表单替身拒绝账单号能被 N 整除的提交（HTTP 200 + 错误提示），核对各提交方式把它们记为失败、
+其余记为成功，与服务器一致，不一致时退出码为 1（端到端检查提交结果的判断）
+用法: python benchmarks/bench_submit.py [--backends legacy browser http] [--bills 40] [--sessions 1 4] [--delay 0.2]
+                                       [--reject-every 5]
+"""
+import argparse
+import resource
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.form_server import FormServer  # noqa: E402
+from submission_engine import SubmissionEngine  # noqa: E402
+
+LOGIN_COOKIE = "ibos_session=bench"
+
+
+def make_bills(count: int):
+    return [{"bill_number": str(50000000 + n), "date": f"{1 + n % 28:02d}.03.2024",
+             "user": f"User {n % 17}", "vehicle": f"B-XX {n % 17}", "department": "Sales"}
+            for n in range(count)]
+
+
+def run_legacy(driver_path: str, url: str, bills) -> float:
+    """原来的用法：每张账单一个新浏览器，打开页面和提交后各固定等待 2 秒"""
+    from selenium import webdriver
+    from selenium.webdriver.chrome.service import Service
+    from selenium.webdriver.common.by import By
+
+    from form_submitter import FIELD_IDS, SUBMIT_BUTTON_ID
+
+    name, value = LOGIN_COOKIE.split("=")
+    start = time.perf_counter()
+    for bill_info in bills:
+        options = webdriver.ChromeOptions()
+        options.add_argument("--headless=new")
+        driver = webdriver.Chrome(service=Service(driver_path), options=options)
+        try:
+            driver.get(url)
+            driver.add_cookie({"name": name, "value": value})
+            driver.get(url)
+            time.sleep(2)
+            for key, element_id in FIELD_IDS.items():
+                driver.find_element(By.ID, element_id).send_keys(bill_info[key])
+            driver.find_element(By.ID, SUBMIT_BUTTON_ID).click()
+            time.sleep(2)
+        finally:
+            driver.quit()
+    return time.perf_counter() - start
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="表单提交基准测试")
+    parser.add_argument("--backends", nargs="+", choices=["legacy", "browser", "http"], default=["http"],
+                        help="测试的提交方式 (默认: http)")
+    parser.add_argument("--driver", default="chromedriver", help="chromedriver 路径")
+    parser.add_argument("--bills", type=int, default=40, help="提交的账单数 (默认: 40)")
+    parser.add_argument("--sessions", type=int, nargs="+", default=[1, 4], help="测试的并行会话数 (默认: 1 4)")
+    parser.add_argument("--delay", type=float, default=0.2, help="表单替身每次提交的处理时间 (默认: 0.2s)")
+    parser.add_argument("--reject-every", type=int, default=0, help="表单替身拒绝账单号能被 N 整除的提交 (默认: 不拒绝)")
+    args = parser.parse_args(argv)
+
+    server = FormServer(("127.0.0.1", 0), args.delay, LOGIN_COOKIE, args.reject_every)
+    server.start()
+    bills = make_bills(args.bills)
+    rejected = {bill["bill_number"] for bill in bills
+                if args.reject_every and int(bill["bill_number"]) % args.reject_every == 0}
+    ok = True
+    cookies = dict([LOGIN_COOKIE.split("=")])
+    try:
+        if "legacy" in args.backends:
+            # 原来的方式太慢，只提交一小部分
+            sample = bills[:min(5, len(bills))]
+            elapsed = run_legacy(args.driver, server.url, sample)
+            print(f"legacy         {len(sample) / elapsed:8.2f} bills/s  ({len(sample)} bills, {elapsed:.1f}s)")
+
+        for backend in (b for b in ("browser", "http") if b in args.backends):
+            for sessions in args.sessions:
+                server.reset()
+                engine = SubmissionEngine(server.url, sessions, backend, driver_path=args.driver, cookies=cookies)
+                stats = engine.run(bills)
+                rate = len(stats.submitted) / stats.seconds
+                saved = {fields["bill_number"] for fields in server.submissions}
+                consistent = set(stats.failed) == rejected and set(stats.submitted) == saved
+                ok &= consistent
+                print(f"{backend:7s} x{sessions:<3d}  {rate:8.2f} bills/s  ({len(stats.submitted)} ok, "
+                      f"{len(stats.failed)} failed, server received {len(server.submissions)} "
+                      f"over {server.connections} connections, {stats.seconds:.2f}s)"
+                      f"{'' if consistent else '  与服务器记录不一致'}")
+        # 浏览器在子进程中，这里只反映本进程（http 方式）的内存
+        print(f"peak RSS of this process: {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.1f} MB")
+    finally:
+        server.shutdown()
+        server.server_close()
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
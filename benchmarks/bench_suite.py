@@ -0,0 +1,234 @@
+"""
+端到端基准测试：合成账单 PDF -> 提取 -> 解析 -> 写入数据库 -> 查看器查询
+
+各阶段分别计时，结果写入 JSON 文件；指定 --compare 时与之前的结果逐项对比，平均耗时变慢超过 --tolerance 的
+阶段视为回归，退出码为 1
+用法:
+    python benchmarks/bench_suite.py --count 200 --output results.json
+    python benchmarks/bench_suite.py --count 200 --output new.json --compare results.json
+    python benchmarks/bench_suite.py --pdf-dir Bills --output real.json   # 使用已有的 PDF
+"""
+import argparse
+import json
+import logging
+import platform
+import random
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.corpus import write_invoices  # noqa: E402
+from bill_search import BillSearch  # noqa: E402
+from db_manager import DBManager  # noqa: E402
+from pdf_extractor import PDFExtractor  # noqa: E402
+
+logger = logging.getLogger(__name__)
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def summarize(latencies: List[float]) -> Dict:
+    """单次操作耗时列表（秒）-> 统计结果（毫秒）"""
+    ordered = sorted(latencies)
+    total = sum(ordered)
+    return {
+        'count': len(ordered),
+        'total_s': round(total, 4),
+        'mean_ms': round(total / len(ordered) * 1000, 4),
+        'p50_ms': round(ordered[len(ordered) // 2] * 1000, 4),
+        'p95_ms': round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000, 4),
+        'max_ms': round(ordered[-1] * 1000, 4),
+        'per_s': round(len(ordered) / total, 1) if total else None,
+    }
+
+
+def summarize_total(total: float, count: int) -> Dict:
+    """只有整体耗时的阶段（如批量写入）按平均值折算"""
+    return {
+        'count': count,
+        'total_s': round(total, 4),
+        'mean_ms': round(total / count * 1000, 4),
+        'per_s': round(count / total, 1) if total else None,
+    }
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def bench_extract(pdf_paths: List[Path], layout_mode: bool):
+    """逐个文件调用 extract_bill_data，同时收集 last_timings 中的打开/取文本/解析耗时"""
+    extractor = PDFExtractor(layout_mode=layout_mode)
+    records, latencies = [], []
+    phases: Dict[str, List[float]] = {}
+    for pdf_path in pdf_paths:
+        bill_data, elapsed = timed(extractor.extract_bill_data, str(pdf_path))
+        latencies.append(elapsed)
+        for phase, value in extractor.last_timings.items():
+            if isinstance(value, float) and phase != 'total':
+                phases.setdefault(phase, []).append(value)
+        if bill_data and extractor.validate_data(bill_data):
+            records.append((bill_data, pdf_path.name))
+    results = {'extract': summarize(latencies)}
+    for phase, values in phases.items():
+        results[f'extract.{phase}'] = summarize(values)
+    return records, results
+
+
+def bench_parse(pdf_paths: List[Path], repeat: int) -> Dict:
+    """对预先提取的文本单独计时 _parse_bill_text，每张账单取 repeat 次中最快的一次"""
+    import pdfplumber
+
+    texts = []
+    for pdf_path in pdf_paths:
+        with pdfplumber.open(pdf_path) as pdf:
+            texts.append('\n'.join(page.extract_text() for page in pdf.pages[:2]))
+    extractor = PDFExtractor()
+    latencies = [min(timed(extractor._parse_bill_text, text)[1] for _ in range(repeat)) for text in texts]
+    return {'parse': summarize(latencies)}
+
+
+def bench_db_writes(records, tmp: Path) -> Dict:
+    """逐条 add_bill/add_bill_item 与 bulk_ingest 分别写入新数据库，返回统计结果；bulk 数据库留给查询阶段"""
+    latencies = []
+    with DBManager(str(tmp / "per_row.db")) as db:
+        for bill_data, filename in records:
+            start = time.perf_counter()
+            bill_id = db.add_bill(bill_data, filename)
+            for item in bill_data['items']:
+                db.add_bill_item(bill_id, item)
+            latencies.append(time.perf_counter() - start)
+    with DBManager(str(tmp / "bulk.db")) as db:
+        _, elapsed = timed(db.bulk_ingest, records)
+    return {'db.add_bill': summarize(latencies), 'db.bulk_ingest': summarize_total(elapsed, len(records))}
+
+
+def bench_viewer(db_path: Path, records, rounds: int) -> Dict:
+    """查看器的几类查询，使用 checkinfo.BillViewer 中的同一套查询方法"""
+    rnd = random.Random(7)
+    picks = [rnd.choice(records)[0] for _ in range(rounds)]
+    conn = sqlite3.connect(str(db_path))
+    search = BillSearch(conn)
+    results = {
+        'viewer.suggest_user': summarize([timed(search.suggest, bill['user_name'][:3])[1] for bill in picks]),
+        'viewer.suggest_bill': summarize([timed(search.suggest, bill['bill_number'][:5], 'bill_number')[1]
+                                          for bill in picks]),
+    }
+    try:
+        from checkinfo import BillViewer
+    except ImportError as e:
+        logger.warning(f"无法导入 checkinfo，跳过查看器查询: {e}")
+        results['viewer.skipped'] = str(e)
+    else:
+        # 这几个查询方法只用到传入的连接，不需要创建窗口
+        results['viewer.bill'] = summarize([
+            timed(BillViewer._query_bill_data, None, conn, bill['bill_number'], "bill")[1] for bill in picks])
+        results['viewer.user'] = summarize([
+            timed(BillViewer._query_bill_data, None, conn, bill['user_name'], "user")[1] for bill in picks])
+        results['viewer.user_bills'] = summarize([
+            timed(BillViewer.fetch_user_bills, None, conn, bill['user_name'])[1] for bill in picks])
+    conn.close()
+    return results
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(current: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    """逐阶段比较平均耗时，返回回归的阶段名"""
+    regressions = []
+    print(f"\n{'stage':24s} {'baseline ms':>12s} {'current ms':>12s} {'change':>8s}")
+    for stage, stats in current['results'].items():
+        old = baseline['results'].get(stage)
+        if not isinstance(stats, dict) or not isinstance(old, dict):
+            continue
+        change = stats['mean_ms'] / old['mean_ms'] - 1 if old['mean_ms'] else 0.0
+        flag = ""
+        if change > tolerance:
+            regressions.append(stage)
+            flag = "  REGRESSION"
+        print(f"{stage:24s} {old['mean_ms']:12.4f} {stats['mean_ms']:12.4f} {change:+8.1%}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="端到端基准测试，结果写入 JSON")
+    parser.add_argument("--count", type=int, default=200, help="生成的合成账单数量 (默认: 200)")
+    parser.add_argument("--seed", type=int, default=0, help="合成账单的随机种子 (默认: 0)")
+    parser.add_argument("--pdf-dir", help="使用该目录中已有的 PDF，不生成合成账单")
+    parser.add_argument("--layout", action="store_true", help="提取时使用版面区域模式")
+    parser.add_argument("--repeat", type=int, default=5, help="解析阶段每张账单的重复次数 (默认: 5)")
+    parser.add_argument("--rounds", type=int, default=500, help="查看器查询次数 (默认: 500)")
+    parser.add_argument("-o", "--output", default="bench_results.json", help="结果文件 (默认: bench_results.json)")
+    parser.add_argument("--compare", help="与之前的结果文件对比")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="平均耗时允许变慢的比例 (默认: 0.25)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    logging.getLogger("pdf_extractor").setLevel(logging.CRITICAL)
+    logging.getLogger("db_manager").setLevel(logging.WARNING)
+
+    results: Dict = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        if args.pdf_dir:
+            pdf_paths = sorted(Path(args.pdf_dir).glob("*.pdf"))
+        else:
+            pdf_paths, elapsed = timed(write_invoices, tmp / "pdfs", args.count, args.seed)
+            results['generate'] = summarize_total(elapsed, len(pdf_paths))
+        if not pdf_paths:
+            parser.error("没有可用的 PDF")
+
+        records, extract_results = bench_extract(pdf_paths, args.layout)
+        results.update(extract_results)
+        if not records:
+            parser.error("没有成功提取的账单")
+        results.update(bench_parse(pdf_paths, args.repeat))
+        results.update(bench_db_writes(records, tmp))
+        results.update(bench_viewer(tmp / "bulk.db", records, args.rounds))
+
+    report = {
+        'meta': {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'revision': git_revision(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'sqlite': sqlite3.sqlite_version,
+            'args': vars(args),
+            'files': len(pdf_paths),
+            'bills': len(records),
+        },
+        'results': results,
+    }
+    Path(args.output).write_text(json.dumps(report, indent=2, ensure_ascii=False), encoding="utf-8")
+
+    for stage, stats in results.items():
+        if isinstance(stats, dict):
+            print(f"{stage:24s} n={stats['count']:6d}  mean {stats['mean_ms']:10.4f} ms  "
+                  f"{stats['per_s'] or 0:10.1f} /s")
+    print(f"结果已写入 {args.output}")
+
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text(encoding="utf-8"))
+        regressions = compare(report, baseline, args.tolerance)
+        if regressions:
+            print(f"回归: {', '.join(regressions)}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""
+analytics 报表核对
+
+生成合成数据库（部分账单没有明细、部分员工没有部门），分两次增量导出 Parquet，再原地修改账单后导出，
+对每种报表和周期比较 load_frames + build_report 的结果与直接在 SQLite 上 GROUP BY 的结果。
+没有安装 pyarrow 时只用从 SQLite 读出的 DataFrame 核对 build_report 的汇总逻辑，Parquet 导出部分跳过并提示
+用法: python benchmarks/check_analytics.py [--bills 3000] [--db 保留数据库的路径]
+"""
+import argparse
+import random
+import sqlite3
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from analytics import PERIODS, REPORTS, YEAR_MONTH, ParquetExporter, build_report, load_frames  # noqa: E402
+from benchmarks.bench_db_ingest import make_bills  # noqa: E402
+from db_manager import DBManager  # noqa: E402
+
+DEPARTMENTS = ["Sales", "Service", "Finance"]
+
+# 报表 -> (分组列, 联表)；部门和车型以账单为主左连接明细，明细项目只看明细
+SQL_REPORTS = {
+    "department": ("COALESCE(employees.department, 'Unknown')",
+                   "bills LEFT JOIN bill_items ON bill_items.bill_id = bills.id "
+                   "LEFT JOIN employees ON employees.name = bills.user_name "
+                   "AND employees.vehicle_name = bills.vehicle_name"),
+    "vehicle": ("bills.vehicle_name", "bills LEFT JOIN bill_items ON bill_items.bill_id = bills.id"),
+    "item": ("bill_items.item_name", "bills JOIN bill_items ON bill_items.bill_id = bills.id"),
+}
+
+
+def add_bills(db_path: str, count: int, seed: int):
+    """写入 count 张账单，其中约十分之一没有明细，日期分布在两年内"""
+    bills = make_bills(count, 4, seed=seed)
+    rnd = random.Random(seed)
+    for n, (bill_data, _) in enumerate(bills):
+        bill_data["bill_number"] = str(50000000 + seed * 100000 + n)
+        bill_data["date"] = bill_data["date"][:-4] + str(2023 + n % 2)
+        if rnd.random() < 0.1:
+            bill_data["items"] = []
+    with DBManager(db_path) as db:
+        db.bulk_ingest((bill_data, f"Rechnung_{bill_data['bill_number']}.pdf") for bill_data, _ in bills)
+        ids = [row[0] for row in db.conn.execute("SELECT id FROM employees")]
+        with db.conn:
+            # 留下一部分员工为 Unknown
+            db.conn.executemany("UPDATE employees SET department = ? WHERE id = ?",
+                                [(rnd.choice(DEPARTMENTS), employee_id) for employee_id in ids if rnd.random() < 0.7])
+
+
+def sql_report(conn: sqlite3.Connection, report: str, period: str):
+    key, source = SQL_REPORTS[report]
+    return conn.execute(f"""
+        SELECT substr({YEAR_MONTH}, 1, {PERIODS[period]}) AS period, {key} AS key, COUNT(DISTINCT bills.id),
+               ROUND(TOTAL(bill_items.amount), 2), ROUND(TOTAL(bill_items.tax), 2),
+               ROUND(TOTAL(bill_items.total_amount), 2)
+        FROM {source}
+        GROUP BY period, key ORDER BY period, key
+    """).fetchall()
+
+
+def sqlite_frames(conn: sqlite3.Connection):
+    """不经过 Parquet，直接从数据库读出 build_report 需要的 (明细, 账单, 员工)"""
+    import pandas as pd
+
+    items = pd.read_sql_query(
+        f"SELECT bill_items.bill_id, bill_items.item_name, bill_items.amount, bill_items.tax, "
+        f"bill_items.total_amount, {YEAR_MONTH} AS year_month "
+        f"FROM bill_items JOIN bills ON bills.id = bill_items.bill_id", conn)
+    bills = pd.read_sql_query(f"SELECT id, user_name, vehicle_name, {YEAR_MONTH} AS year_month FROM bills", conn)
+    employees = pd.read_sql_query("SELECT name, vehicle_name, department FROM employees", conn)
+    return items, bills, employees
+
+
+def compare(label: str, result, expected) -> bool:
+    rows = list(result.itertuples(index=False, name=None))
+    ok = len(rows) == len(expected) and all(
+        str(got[0]) == want[0] and str(got[1]) == want[1] and int(got[2]) == want[2]
+        and all(abs(g - w) <= 0.01 for g, w in zip(got[3:], want[3:]))
+        for got, want in zip(rows, expected)
+    )
+    print(f"{label:40s} {len(rows):5d} 行  {'OK' if ok else '不一致'}")
+    if not ok:
+        for got, want in zip(rows, expected):
+            if tuple(map(str, got[:2])) != want[:2] or int(got[2]) != want[2]:
+                print(f"    第一处不同: pandas {got}  sqlite {want}")
+                break
+    return ok
+
+
+def check(conn: sqlite3.Connection, label: str, frames_for) -> bool:
+    ok = True
+    for report in REPORTS:
+        items, bills, employees = frames_for(report)
+        for period in PERIODS:
+            result = build_report(items, bills, employees, report, period)
+            ok &= compare(f"{label} {report}/{period}", result, sql_report(conn, report, period))
+    return ok
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="核对 analytics 报表与 SQLite 汇总一致")
+    parser.add_argument("--bills", type=int, default=3000, help="每次写入的账单数 (默认: 3000)")
+    parser.add_argument("--db", help="保留数据库的路径（默认用临时目录）")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = args.db or str(Path(tmp) / "bills.db")
+        out_dir = str(Path(tmp) / "parquet")
+        add_bills(db_path, args.bills, seed=1)
+        conn = sqlite3.connect(db_path)
+        try:
+            frames = sqlite_frames(conn)
+            ok = check(conn, "sqlite", lambda report: frames)
+
+            try:
+                import pyarrow  # noqa: F401
+            except ImportError:
+                print("没有安装 pyarrow，跳过 Parquet 导出的核对")
+                return 0 if ok else 1
+
+            exporter = ParquetExporter(db_path, out_dir, chunk_size=1000)
+            exporter.export()
+            ok &= check(conn, "parquet", lambda report: load_frames(out_dir, report))
+            # 第二批账单走增量导出
+            add_bills(db_path, args.bills, seed=2)
+            print(f"增量导出: {exporter.export()}")
+            ok &= check(conn, "parquet 增量", lambda report: load_frames(out_dir, report))
+            # 原地修改一张没有明细的账单的员工和车辆（行数不变），另一张改成无法解析的日期：应全量重新导出且不失败
+            with conn:
+                name, vehicle = conn.execute(
+                    "SELECT name, vehicle_name FROM employees ORDER BY id DESC LIMIT 1").fetchone()
+                conn.execute("UPDATE bills SET user_name = ?, vehicle_name = ? WHERE id = (SELECT MIN(id) FROM bills "
+                             "WHERE id NOT IN (SELECT bill_id FROM bill_items))", (name, vehicle))
+                conn.execute("UPDATE bills SET date = '31.02.2024' WHERE id = (SELECT MAX(id) FROM bills)")
+            print(f"修改后导出: {exporter.export()}")
+            ok &= check(conn, "parquet 修改", lambda report: load_frames(out_dir, report))
+        finally:
+            conn.close()
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,179 @@
+"""
+合成 Oberhaching 账单文本，供基准测试使用
+
+生成的文本与 pdfplumber 对真实账单 extract_text 的输出结构一致：
+第一页为抬头（账单号、日期），第二页为合同块（车型、用户、Vertragsnummer）和 MwSt 明细表；
+invoice_pdf 把同样的内容写成两页 PDF，文字位置与 PDFExtractor.LAYOUT_REGIONS 的区域对应
+"""
+import random
+from pathlib import Path
+from typing import List, Sequence, Tuple
+
+ITEM_NAMES = [
+    "Finanzleasingrate", "Servicerate", "Kfz Steuer", "Rundfunkbeitrag",
+    "Reifenersatz", "Wartung und Verschleiss", "Tankkarte", "Kraftstoff Diesel",
+]
+VEHICLES = ["ID.4 Pro Performance", "Tesla Model 3", "bmw i4 eDrive40", "Audi Q4 e-tron", "Cupra Born"]
+FIRST_NAMES = ["Max", "Anna", "Lukas", "Sophie", "Jonas", "Marie", "Felix", "Lea"]
+LAST_NAMES = ["Mustermann", "Schmidt", "Meyer", "Wagner", "Becker", "Hoffmann"]
+ADDRESS = [
+    "Leasing GmbH - Musterstrasse 1 - 82041 Oberhaching",
+    "Midea Europe GmbH",
+    "Kreditorenbuchhaltung",
+    "Ludwig-Erhard-Strasse 14",
+    "65760 Eschborn",
+]
+LETTER = [
+    "Sehr geehrte Damen und Herren,",
+    "vielen Dank fuer Ihr Vertrauen. Wir stellen Ihnen folgende Leistungen in Rechnung.",
+    "Die Abrechnung erfolgt gemaess den Bedingungen des Leasingvertrages.",
+    "Bitte ueberweisen Sie den Betrag innerhalb von 14 Tagen ohne Abzug.",
+    "Bei Lastschriftverfahren wird der Betrag zum Faelligkeitstermin eingezogen.",
+    "Rueckfragen richten Sie bitte an Ihren Kundenbetreuer.",
+    "Mit freundlichen Gruessen",
+    "Ihr Leasing Team",
+]
+FOOTER = [
+    "Leasing GmbH Sitz der Gesellschaft: Oberhaching Registergericht: Amtsgericht Muenchen HRB 000000",
+    "Geschaeftsfuehrer: Erika Musterfrau Max Beispiel USt-IdNr.: DE000000000 Steuer-Nr.: 000/000/00000",
+    "Bankverbindung: Musterbank IBAN DE00 0000 0000 0000 0000 00 BIC MUSTDEMMXXX",
+    "Telefon +49 89 000000-0 Telefax +49 89 000000-99 www.leasing.example",
+]
+CONTRACT_INFO = [
+    "Vertragsbeginn 01.04.2022 Vertragsende 31.03.2026 Laufzeit 48 Monate",
+    "Laufleistung 30.000 km p.a. Mehr-/Minderkilometer laut Vertrag",
+    "Leistungszeitraum laut Vertrag, Zahlungsweise monatlich im Voraus",
+]
+
+PAGE_WIDTH, PAGE_HEIGHT = 595, 842  # A4，单位 pt
+FONT_SIZE, LEADING = 9, 11
+ITEM_TABLE_HEADER = "Steuersatz Bezeichnung Netto MwSt."
+
+
+def _money(value: float) -> str:
+    return f"{value:.2f}".replace('.', ',')
+
+
+def invoice_pages(n: int, seed: int = 0) -> List[List[str]]:
+    """生成第 n 张合成账单的各页文本行（Rechnung 或 Gutschrift）"""
+    rnd = random.Random(seed * 1_000_003 + n)
+    credit = rnd.random() < 0.1
+    kind = "Gutschrift" if credit else "Rechnung"
+    salutation = rnd.choice(["Herr", "Frau"])
+    user = f"{rnd.choice(FIRST_NAMES)}{n % 97} {rnd.choice(LAST_NAMES)}"
+    date = f"{rnd.randint(1, 28):02d}.{rnd.randint(1, 12):02d}.{rnd.choice([2023, 2024, 2025])}"
+
+    first_page = ADDRESS + [
+        f"{kind}: {40000000 + n} / {rnd.randint(1, 9)}",
+        f"Oberhaching, {date}",
+        f"Kundennummer {rnd.randint(10000, 99999)} Debitor {rnd.randint(100000, 999999)}",
+        f"Ansprechpartner Kundenservice Durchwahl {rnd.randint(100, 999)}",
+    ] + LETTER + CONTRACT_INFO + FOOTER
+
+    second_page = [
+        f"Seite 2 zur {kind} {40000000 + n}",
+        rnd.choice(VEHICLES),
+        f"{salutation} {user}",
+        f"Vertragsnummer {rnd.randint(100000, 999999)}",
+        f"Kennzeichen M-AB {rnd.randint(100, 9999)} Fahrgestellnummer WVWZZZ{rnd.randint(10**10, 10**11 - 1)}",
+    ] + CONTRACT_INFO + [
+        ITEM_TABLE_HEADER,
+        "Gesamtsumme Gutschrift exkl. MwSt." if credit else "Rechnung exkl. MwSt.",
+    ]
+    total_tax = 0.0
+    for name in rnd.sample(ITEM_NAMES, rnd.randint(2, 8)):
+        amount = round(rnd.uniform(5, 900), 2)
+        tax = round(amount * 0.19, 2)
+        total_tax += tax
+        second_page.append(f"19% MwSt. {name} {_money(amount)} {_money(tax)}")
+    second_page += [f"Total MwSt. {_money(total_tax)}"] + LETTER[3:5] + FOOTER
+    return [first_page, second_page]
+
+
+def invoice_text(n: int, seed: int = 0) -> str:
+    """单张合成账单的完整文本（两页用换行连接，与 extract_bill_data 一致）"""
+    return '\n'.join('\n'.join(page) for page in invoice_pages(n, seed))
+
+
+def _pdf_string(text: str) -> str:
+    return text.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+
+
+def pdf_bytes(pages: Sequence[Sequence[Tuple[float, List[str]]]]) -> bytes:
+    """
+    生成只含文字的最小 PDF（Helvetica，无压缩）
+    每页为若干 (距页面顶部的比例, 文本行) 文字块
+    """
+    objects: List[bytes] = [b"<< /Type /Catalog /Pages 2 0 R >>", b"",
+                            b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>"]
+    kids = []
+    for blocks in pages:
+        stream = []
+        for top, lines in blocks:
+            y = PAGE_HEIGHT * (1 - top) - FONT_SIZE
+            stream.append(f"BT /F1 {FONT_SIZE} Tf {LEADING} TL 50 {y:.1f} Td")
+            stream += [f"({_pdf_string(line)}) Tj T*" for line in lines]
+            stream.append("ET")
+        content = '\n'.join(stream).encode('latin-1')
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(content), content))
+        objects.append(b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %d %d] /Resources << /Font << /F1 3 0 R >> >> "
+                       b"/Contents %d 0 R >>" % (PAGE_WIDTH, PAGE_HEIGHT, len(objects)))
+        kids.append(len(objects))
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (b" ".join(b"%d 0 R" % k for k in kids), len(kids))
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    return bytes(out)
+
+
+def invoice_pdf(n: int, seed: int = 0) -> Tuple[str, bytes]:
+    """第 n 张合成账单的 (文件名, PDF 内容)；第二页的明细表从页面 40% 处开始，位于版面模式的 items 区域内"""
+    first_page, second_page = invoice_pages(n, seed)
+    split = second_page.index(ITEM_TABLE_HEADER)
+    kind, number = first_page[len(ADDRESS)].split(':')[0], 40000000 + n
+    pdf = pdf_bytes([[(0.05, first_page)], [(0.05, second_page[:split]), (0.40, second_page[split:])]])
+    return f"{kind}_{number}.pdf", pdf
+
+
+def write_invoices(out_dir: Path, count: int, seed: int = 0) -> List[Path]:
+    """在 out_dir 中生成 count 张合成账单 PDF"""
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    paths = []
+    for n in range(count):
+        name, pdf = invoice_pdf(n, seed)
+        path = out_dir / name
+        path.write_bytes(pdf)
+        paths.append(path)
+    return paths
+
+
+EDGE_CASES = [
+    # 同一账单同时包含 Rechnung 与 Gutschrift 明细段
+    "Rechnung: 1 / 1\nOberhaching, 01.01.2024\nID.4\nHerr A B\nVertragsnummer 1\nRechnung exkl. MwSt.\n"
+    "19% MwSt. Servicerate 10,00 1,90\nTotal MwSt. 1,90\nGesamtsumme Gutschrift exkl. MwSt.\n"
+    "19% MwSt. Servicerate -5,00 -0,95\nTotal MwSt. -0,95",
+    # 第一个明细段缺少 Total MwSt.，第二段会被重复收集
+    "Gutschrift: 2/1\nOberhaching, 02.02.2024\nbmw x\nFrau C D\nVertragsnummer 2\nRechnung exkl. MwSt.\n"
+    "19% MwSt. A 1,00 0,19\nRechnung exkl. MwSt.\n19% MwSt. B 2,00 0,38\n7% C 3,00 0,21 x y\nTotal MwSt. 0,78",
+    # 无法解析的明细行与数字格式
+    "Rechnung: 3\nOberhaching, 03.03.2024\nTesla\nHerr E F\nVertragsnummer 3\nRechnung exkl. MwSt.\n"
+    "19% MwSt. Wartung 1.234,56 234,57\n%\n19%\nTotal MwSt. 0",
+    # 合同号前一行为空，解析中断
+    "Rechnung exkl. MwSt.\n19% MwSt. A 1,00 0,19\n\nVertragsnummer 4\nRechnung: 4\n19% MwSt. B 2,00 0,38",
+    # 合同号在第一行，取上方行时回绕到文本末尾
+    "Vertragsnummer 5\nRechnung: 5 Gutschrift: 6 / x Rechnung: 7\nOberhaching, 05.05.2024 Oberhaching, x\nHerr X",
+    "",
+]
+
+
+def corpus(count: int, seed: int = 0) -> List[str]:
+    """count 张合成账单文本加上边界用例"""
+    return [invoice_text(n, seed) for n in range(count)] + EDGE_CASES
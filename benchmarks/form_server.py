@@ -0,0 +1,167 @@
+"""
+本地的 IBOS 表单替身
+
+返回与真实表单相同元素 id 的 HTML 页面，记录收到的每一次提交，用于在没有 IBOS 的环境下测试和压测两种提交方式。
+和 IBOS 一样需要会话：第一次访问时发会话 Cookie，表单带隐藏的 CSRF token，提交时校验并换成新的 token；
+--login-cookie name=value 时没有这个 Cookie 的请求返回 403（模拟未登录）。
+支持 HTTP/1.1 保持连接，connections 记录建立过的 TCP 连接数；--delay 模拟服务器处理一次提交所需的时间；
+--reject-every N 时账单号能被 N 整除的提交按校验失败处理：HTTP 200，页面带错误提示，不计入 submissions
+用法: python benchmarks/form_server.py [--port 8765] [--delay 0.2] [--login-cookie ibos_session=secret] [--reject-every 5]
+"""
+import argparse
+import secrets
+import socket
+import threading
+import time
+from http.cookies import SimpleCookie
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+from urllib.parse import parse_qs
+
+FORM_PAGE = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>IBOS</title></head>
+<body>
+{result}
+<form method="post" action="/submit">
+  <input type="hidden" name="csrf_token" value="{token}">
+  <input id="bill_number_input_id" name="bill_number">
+  <input id="date_input_id" name="date">
+  <input id="user_input_id" name="user">
+  <input id="vehicle_input_id" name="vehicle">
+  <input id="department_input_id" name="department">
+  <input id="net_input_id" name="net">
+  <input id="tax_input_id" name="tax">
+  <input id="gross_input_id" name="gross">
+  <input id="leasing_service_net_input_id" name="leasing_service_net">
+  <input id="leasing_service_tax_input_id" name="leasing_service_tax">
+  <button id="submit_button_id" type="submit">Submit</button>
+</form>
+</body></html>
+"""
+
+
+class FormServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, delay: float = 0.0, login_cookie: Optional[str] = None, reject_every: int = 0):
+        super().__init__(address, FormHandler)
+        self.delay = delay
+        self.reject_every = reject_every
+        self.login_cookie = tuple(login_cookie.split("=", 1)) if login_cookie else None
+        self.submissions = []
+        self.tokens = {}  # 会话 id -> 当前的 CSRF token
+        self.connections = 0
+        self.lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/"
+
+    def start(self) -> threading.Thread:
+        """在后台线程中运行，返回该线程"""
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return thread
+
+    def reset(self):
+        with self.lock:
+            self.submissions.clear()
+            self.connections = 0
+
+
+class FormHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        # 响应头和正文分两次写出，不关闭 Nagle 时每个响应会多等一次延迟确认
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        with self.server.lock:
+            self.server.connections += 1
+
+    def _send(self, status: int, body: str, session_id: Optional[str] = None):
+        data = body.encode('utf-8')
+        self.send_response(status)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        if session_id:
+            self.send_header("Set-Cookie", f"sid={session_id}; Path=/; HttpOnly")
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _session(self):
+        """返回 (会话 id, 是否新建)；未登录时返回 (None, False)"""
+        cookies = SimpleCookie(self.headers.get("Cookie") or "")
+        if self.server.login_cookie:
+            name, value = self.server.login_cookie
+            if name not in cookies or cookies[name].value != value:
+                return None, False
+        if "sid" in cookies and cookies["sid"].value in self.server.tokens:
+            return cookies["sid"].value, False
+        session_id = secrets.token_hex(8)
+        with self.server.lock:
+            self.server.tokens[session_id] = secrets.token_hex(16)
+        return session_id, True
+
+    def _form(self, status: int, session_id: str, created: bool, result: str = ""):
+        self._send(status, FORM_PAGE.format(result=result, token=self.server.tokens[session_id]),
+                   session_id if created else None)
+
+    def do_GET(self):
+        session_id, created = self._session()
+        if session_id is None:
+            self._send(403, "<p>login required</p>")
+            return
+        self._form(200, session_id, created)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        fields = {key: values[0] for key, values in parse_qs(self.rfile.read(length).decode('utf-8')).items()}
+        session_id, created = self._session()
+        if session_id is None:
+            self._send(403, "<p>login required</p>")
+            return
+        if created or fields.get("csrf_token") != self.server.tokens[session_id]:
+            self._form(403, session_id, created, '<div id="result" class="error">invalid csrf token</div>')
+            return
+        if self.server.delay:
+            time.sleep(self.server.delay)
+        if not fields.get("bill_number"):
+            self._form(400, session_id, created, '<div id="result" class="error">missing bill_number</div>')
+            return
+        if self.server.reject_every and int(fields["bill_number"]) % self.server.reject_every == 0:
+            # 和很多表单一样，校验失败仍返回 200，只在页面上提示
+            self._form(200, session_id, created, '<div id="result" class="error">invalid vehicle</div>')
+            return
+        with self.server.lock:
+            self.server.submissions.append(fields)
+            self.server.tokens[session_id] = secrets.token_hex(16)
+        self._form(200, session_id, created, f'<div id="result">saved {fields["bill_number"]}</div>')
+
+    def log_message(self, format, *args):
+        pass
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="本地的 IBOS 表单替身")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--delay", type=float, default=0.0, help="每次提交的处理时间（秒）")
+    parser.add_argument("--login-cookie", help="要求请求带上这个 Cookie（name=value）")
+    parser.add_argument("--reject-every", type=int, default=0, help="拒绝账单号能被 N 整除的提交（默认不拒绝）")
+    args = parser.parse_args(argv)
+
+    server = FormServer((args.host, args.port), args.delay, args.login_cookie, args.reject_every)
+    print(f"表单地址: {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(f"共收到 {len(server.submissions)} 次提交，{server.connections} 个连接")
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
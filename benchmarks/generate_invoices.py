@@ -0,0 +1,31 @@
+"""
+生成合成 Oberhaching 账单 PDF（Rechnung / Gutschrift，含 Vertragsnummer 块和 MwSt 明细表）
+
+用法: python benchmarks/generate_invoices.py out_dir [--count 500] [--seed 0]
+同一 seed 生成的文件内容完全相同，可以用 main.py 直接导入
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.corpus import write_invoices  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description="生成合成账单 PDF")
+    parser.add_argument("out_dir", help="输出目录")
+    parser.add_argument("--count", type=int, default=500, help="账单数量 (默认: 500)")
+    parser.add_argument("--seed", type=int, default=0, help="随机种子 (默认: 0)")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    paths = write_invoices(Path(args.out_dir), args.count, args.seed)
+    size = sum(path.stat().st_size for path in paths)
+    print(f"已生成 {len(paths)} 个 PDF ({size / 1e6:.1f} MB)，用时 {time.perf_counter() - start:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
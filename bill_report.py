@@ -0,0 +1,156 @@
+"""
+高额账单报表
+
+按金额阈值、日期范围、部门、车型筛选 bill_totals 中的账单，可按账单、员工、部门、车型或月份汇总。
+结果通过游标逐批读取并直接写入 CSV 或 XLSX（openpyxl 只写模式），导出多年数据时内存占用不随行数增长
+"""
+import argparse
+import csv
+import logging
+import sqlite3
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterator, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# 账单日期以 dd.mm.yyyy 存储，转换为 yyyy-mm-dd 后才能按范围比较
+ISO_DATE = "(substr(bills.date, 7, 4) || '-' || substr(bills.date, 4, 2) || '-' || substr(bills.date, 1, 2))"
+
+# 汇总方式 -> (分组列, 表头)
+GROUPINGS = {
+    'employee': (["bills.user_name", "COALESCE(employees.department, 'Unknown')", "bills.vehicle_name"],
+                 ["name", "department", "vehicle_name"]),
+    'department': (["COALESCE(employees.department, 'Unknown')"], ["department"]),
+    'vehicle': (["bills.vehicle_name"], ["vehicle_name"]),
+    'month': (["substr(bills.date, 7, 4) || '-' || substr(bills.date, 4, 2)"], ["month"]),
+}
+
+
+@dataclass
+class ReportQuery:
+    threshold: float = 1000
+    date_from: Optional[str] = None  # yyyy-mm-dd，含当天
+    date_to: Optional[str] = None  # yyyy-mm-dd，含当天
+    department: Optional[str] = None
+    vehicle: Optional[str] = None
+    group_by: str = 'bill'  # bill / employee / department / vehicle / month
+
+    def build_sql(self) -> Tuple[List[str], str, List]:
+        """返回 (表头, SQL, 参数)"""
+        conditions = ["bill_totals.gross > ?"]
+        params: List = [self.threshold]
+        if self.date_from:
+            conditions.append(f"{ISO_DATE} >= ?")
+            params.append(self.date_from)
+        if self.date_to:
+            conditions.append(f"{ISO_DATE} <= ?")
+            params.append(self.date_to)
+        if self.department:
+            conditions.append("employees.department = ?")
+            params.append(self.department)
+        if self.vehicle:
+            conditions.append("bills.vehicle_name = ?")
+            params.append(self.vehicle)
+        where = " AND ".join(conditions)
+
+        if self.group_by == 'bill':
+            # 与原来的高额账单查询一致：按姓名关联员工，同名的每条员工记录各出一行
+            header = ["name", "department", "vehicle_name", "bill_number", "date", "net", "tax", "gross"]
+            sql = f"""
+                SELECT employees.name, employees.department, employees.vehicle_name, bills.bill_number, bills.date,
+                       bill_totals.net, bill_totals.tax, bill_totals.gross
+                FROM bill_totals
+                JOIN bills ON bills.id = bill_totals.bill_id
+                JOIN employees ON employees.name = bills.user_name
+                WHERE {where}
+                ORDER BY employees.name, employees.department, employees.vehicle_name, bills.bill_number
+            """
+            return header, sql, params
+
+        if self.group_by not in GROUPINGS:
+            raise ValueError(f"不支持的汇总方式: {self.group_by}")
+        columns, header = GROUPINGS[self.group_by]
+        # 汇总时按 (姓名, 车型) 关联员工，每张账单只计一次
+        sql = f"""
+            SELECT {', '.join(columns)}, COUNT(*), ROUND(SUM(bill_totals.net), 2), ROUND(SUM(bill_totals.tax), 2),
+                   ROUND(SUM(bill_totals.gross), 2)
+            FROM bill_totals
+            JOIN bills ON bills.id = bill_totals.bill_id
+            LEFT JOIN employees ON employees.name = bills.user_name AND employees.vehicle_name = bills.vehicle_name
+            WHERE {where}
+            GROUP BY {', '.join(columns)}
+            ORDER BY {', '.join(columns)}
+        """
+        return header + ["bills", "net", "tax", "gross"], sql, params
+
+
+def iter_report(conn: sqlite3.Connection, query: ReportQuery, batch_size: int = 1000) -> Iterator[Sequence]:
+    """先产出表头，再逐批从游标读取结果行"""
+    header, sql, params = query.build_sql()
+    yield header
+    cursor = conn.execute(sql, params)
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            return
+        yield from rows
+
+
+def write_csv(rows: Iterator[Sequence], path: Path) -> int:
+    """写入 CSV（utf-8-sig 便于 Excel 直接打开），返回数据行数"""
+    count = -1
+    with open(path, "w", newline="", encoding="utf-8-sig") as f:
+        writer = csv.writer(f)
+        for row in rows:
+            writer.writerow(row)
+            count += 1
+    return max(count, 0)
+
+
+def write_xlsx(rows: Iterator[Sequence], path: Path) -> int:
+    """用 openpyxl 只写模式逐行写入 XLSX，返回数据行数"""
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet("report")
+    count = -1
+    for row in rows:
+        sheet.append(list(row))
+        count += 1
+    workbook.save(path)
+    return max(count, 0)
+
+
+def export_report(db_path: str, query: ReportQuery, output: Path) -> int:
+    """按输出文件扩展名导出报表，返回数据行数"""
+    output = Path(output)
+    writer = write_xlsx if output.suffix.lower() == ".xlsx" else write_csv
+    conn = sqlite3.connect(db_path)
+    try:
+        count = writer(iter_report(conn, query), output)
+    finally:
+        conn.close()
+    logger.info(f"报表已导出: {output}，共 {count} 行")
+    return count
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="导出高额账单报表 (CSV / XLSX)")
+    parser.add_argument("output", help="输出文件路径，扩展名为 .xlsx 时导出 Excel，否则导出 CSV")
+    parser.add_argument("--db", default="bills.db", help="数据库路径 (默认: bills.db)")
+    parser.add_argument("--threshold", type=float, default=1000, help="账单含税总额阈值 (默认: 1000)")
+    parser.add_argument("--from", dest="date_from", help="开始日期 yyyy-mm-dd（含）")
+    parser.add_argument("--to", dest="date_to", help="结束日期 yyyy-mm-dd（含）")
+    parser.add_argument("--department", help="只包含该部门")
+    parser.add_argument("--vehicle", help="只包含该车型")
+    parser.add_argument("--group-by", default="bill", choices=["bill", *GROUPINGS], help="汇总方式 (默认: bill)")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    query = ReportQuery(args.threshold, args.date_from, args.date_to, args.department, args.vehicle, args.group_by)
+    export_report(args.db, query, Path(args.output))
+
+
+if __name__ == "__main__":
+    main()
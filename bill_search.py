@@ -0,0 +1,92 @@
+"""
+基于 FTS5 trigram 索引的账单查询与输入提示
+
+trigram 分词器可以直接用索引加速 LIKE '%词%'，输入提示只在 search_terms 中去重后的取值里查找（账单号直接用唯一索引）。
+trigram 只对至少三个字符的纯 ASCII 查询词给出与原来 LIKE 相同的结果：更短的词（例如 'Mü'）在索引中查不到，
+非 ASCII 字母的大小写折叠也与 LIKE 不同，这些查询词仍在原表上用 LIKE 查找；输入提示的短前缀用 B-tree 索引做范围查询
+"""
+import sqlite3
+from typing import List, Optional
+
+FIELDS = ('bill_number', 'user_name', 'vehicle_name', 'item_name')
+
+
+def trigram_usable(term: str) -> bool:
+    """查询词能否交给 trigram 索引（结果与在原表上 LIKE 相同）"""
+    return len(term) >= 3 and term.isascii()
+
+
+class BillSearch:
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+
+    def bill_ids_sql(self, field: str, term: Optional[str] = None) -> str:
+        """
+        返回 `SELECT 账单id ...` 子查询，参数为 LIKE 模式，可嵌入 `bills.id IN (...)`；
+        给出查询词且 trigram 索引不能处理时，返回在原表上 LIKE 的子查询
+        """
+        if field not in FIELDS:
+            raise ValueError(f"不支持的查询字段: {field}")
+        if term is not None and not trigram_usable(term):
+            if field == 'item_name':
+                return "SELECT bill_id FROM bill_items WHERE item_name LIKE ?"
+            return f"SELECT id FROM bills WHERE {field} LIKE ?"
+        if field == 'item_name':
+            # 先在去重后的明细名称中匹配，再找包含这些明细的账单
+            return (
+                "SELECT bill_id FROM bill_items WHERE item_name IN ("
+                "SELECT value FROM search_terms WHERE field = 'item_name' "
+                "AND id IN (SELECT rowid FROM search_terms_fts WHERE value LIKE ?))"
+            )
+        return f"SELECT rowid FROM bills_fts WHERE {field} LIKE ?"
+
+    def bill_ids(self, term: str, field: str = 'user_name') -> List[int]:
+        """字段包含 term 的账单id"""
+        return [row[0] for row in self.conn.execute(self.bill_ids_sql(field, term), (f"%{term}%",))]
+
+    def suggest(self, term: str, field: str = 'user_name', limit: int = 10) -> List[str]:
+        """输入提示：先给以 term 开头的值，不足 limit 个时再补充包含 term 的值"""
+        if field not in FIELDS:
+            raise ValueError(f"不支持的查询字段: {field}")
+        term = term.strip()
+        if not term:
+            return []
+        if field == 'bill_number':
+            # 账单号有唯一索引，前缀直接做范围查询
+            results = [row[0] for row in self.conn.execute(
+                "SELECT bill_number FROM bills WHERE bill_number >= ? AND bill_number < ? ORDER BY bill_number LIMIT ?",
+                (term, term + '\U0010ffff', limit)
+            )]
+            if len(results) < limit and len(term) >= 3:
+                source = "bills_fts" if trigram_usable(term) else "bills"
+                results += [row[0] for row in self.conn.execute(
+                    f"SELECT bill_number FROM {source} WHERE bill_number LIKE ? AND bill_number NOT LIKE ? LIMIT ?",
+                    (f"%{term}%", f"{term}%", limit - len(results))
+                )]
+            return results
+
+        if len(term) < 3:
+            # trigram 索引至少需要三个字符，短前缀走 search_terms 的唯一索引
+            return [row[0] for row in self.conn.execute(
+                "SELECT value FROM search_terms WHERE field = ? AND value >= ? AND value < ? ORDER BY value LIMIT ?",
+                (field, term, term + '\U0010ffff', limit)
+            )]
+
+        # 与原来的查询一样不转义 % 和 _；带 ESCAPE 的 LIKE 不会交给 FTS 索引处理
+        if trigram_usable(term):
+            query = (
+                "SELECT value FROM search_terms WHERE field = ? "
+                "AND id IN (SELECT rowid FROM search_terms_fts WHERE value LIKE ?) ORDER BY value LIMIT ?"
+            )
+        else:
+            query = "SELECT value FROM search_terms WHERE field = ? AND value LIKE ? ORDER BY value LIMIT ?"
+        results = [row[0] for row in self.conn.execute(query, (field, f"{term}%", limit))]
+        if len(results) < limit:
+            seen = set(results)
+            for (value,) in self.conn.execute(query, (field, f"%{term}%", limit + len(results))):
+                if value not in seen:
+                    seen.add(value)
+                    results.append(value)
+                    if len(results) >= limit:
+                        break
+        return results
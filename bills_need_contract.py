@@ -1,57 +1,74 @@
 import sqlite3
+import logging
 import os
-import shutil
+from dataclasses import replace
 from datetime import datetime
+from pathlib import Path
+from bill_report import ReportQuery, export_report, iter_report
+from copy_engine import JOURNAL_NAME, CopyEngine
+from file_index import FileIndex
 
-def get_employees_with_high_bills(db_path):
+def get_employees_with_high_bills(db_path, query=None):
+    """高额账单的 (姓名, 部门, 车辆, 账单号)，筛选条件见 bill_report.ReportQuery，默认含税总额大于1000"""
+    query = replace(query or ReportQuery(), group_by='bill')
     conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-    
-    query = """
-    SELECT employees.name, employees.department, employees.vehicle_name, bills.bill_number
-    FROM employees
-    JOIN bills ON employees.name = bills.user_name
-    JOIN bill_items ON bills.id = bill_items.bill_id
-    GROUP BY employees.name, employees.department, employees.vehicle_name, bills.bill_number
-    HAVING SUM(bill_items.total_amount) > 1000
-    ORDER BY employees.name;
-    """
-    
-    cursor.execute(query)
-    results = cursor.fetchall()
-    
-    conn.close()
-    
-    return results
+    try:
+        rows = iter_report(conn, query)
+        next(rows)  # 表头
+        return [row[:4] for row in rows]
+    finally:
+        conn.close()
 
-def copy_files_for_employees(employees, source_dir, target_base_dir):
+def copy_files_for_employees(employees, source_dir, target_base_dir, db_path="bills.db", workers=4,
+                             journal_path=None):
     today_str = datetime.today().strftime('%Y-%m-%d')
     target_dir = os.path.join(target_base_dir, today_str)
     os.makedirs(target_dir, exist_ok=True)
 
-    for name, department, vehicle_name, bill_number in employees:
-        # 假设文件名包含员工姓名
-        for file_name in os.listdir(source_dir):
-            if name in file_name:
-                source_file = os.path.join(source_dir, file_name)
-                target_file = os.path.join(target_dir, file_name)
-                shutil.copy2(source_file, target_file)
-                print(f"复制文件 {source_file} 到 {target_file}")
+    # 源目录只在修改时间变化时重新扫描，每个员工的查找都在内存索引中完成
+    # 查询结果每张账单一行，同一员工的合同由复制引擎按目标路径去重
+    tasks = []
+    with FileIndex(source_dir, db_path) as index:
+        for name in dict.fromkeys(row[0] for row in employees):
+            # 假设文件名包含员工姓名
+            for source_path in index.find_containing(name):
+                tasks.append((source_path, Path(target_dir) / source_path.name))
+
+    # 复制日志默认放在数据库旁边，不写进 OneDrive 上按日期命名的目标目录
+    journal_path = journal_path or Path(db_path).with_name(JOURNAL_NAME)
+    stats = CopyEngine(workers=workers, journal_path=journal_path).run(tasks)
+    for source_file, target_file in stats.copied:
+        print(f"复制文件 {source_file} 到 {target_file}")
+    print(stats.summary())
+    return stats
 
 if __name__ == "__main__":
     import argparse
-    parser = argparse.ArgumentParser(description="查询所有账单总金额大于1000的员工信息并复制相关文件")
+    parser = argparse.ArgumentParser(description="查询账单总金额超过阈值的员工信息并复制相关文件")
     parser.add_argument("--db", default="bills.db", help="数据库路径 (默认: bills.db)")
     parser.add_argument("--source-dir", default=r"C:\Users\zhiqianyu\OneDrive - MIDEA INTERNATIONAL CORPORATION COMPANY LIMITED\Rechnungen\00 Vertrags der Mitarbeitern Autos", help="源文件夹路径")
     parser.add_argument("--target-dir", default=r"C:\Users\zhiqianyu\OneDrive - MIDEA INTERNATIONAL CORPORATION COMPANY LIMITED\Rechnungen", help="目标文件夹路径")
+    parser.add_argument("-w", "--workers", type=int, default=4, help="并行复制的线程数 (默认: 4)")
+    parser.add_argument("--journal", help=f"复制日志路径 (默认: 数据库所在目录下的 {JOURNAL_NAME})")
+    parser.add_argument("--threshold", type=float, default=1000, help="账单含税总额阈值 (默认: 1000)")
+    parser.add_argument("--from", dest="date_from", help="开始日期 yyyy-mm-dd（含）")
+    parser.add_argument("--to", dest="date_to", help="结束日期 yyyy-mm-dd（含）")
+    parser.add_argument("--department", help="只包含该部门")
+    parser.add_argument("--vehicle", help="只包含该车型")
+    parser.add_argument("--report", help="同时把账单明细导出到该文件 (.csv / .xlsx)")
     args = parser.parse_args()
 
-    employees = get_employees_with_high_bills(args.db)
+    logging.basicConfig(level=logging.INFO)
+
+    query = ReportQuery(args.threshold, args.date_from, args.date_to, args.department, args.vehicle)
+    if args.report:
+        export_report(args.db, query, Path(args.report))
+    employees = get_employees_with_high_bills(args.db, query)
     
     # 打印排序后的员工姓名
-    print("账单总金额大于1000的员工信息（按字母排序）：")
+    print(f"账单总金额大于{args.threshold:g}的员工信息（按字母排序）：")
     for row in employees:
         name, department, vehicle_name, bill_number = row
         print(f"姓名: {name}, 部门: {department}, 车辆: {vehicle_name}, 账单号: {bill_number}")
     
-    copy_files_for_employees(employees, args.source_dir, args.target_dir)
\ No newline at end of file
+    copy_files_for_employees(employees, args.source_dir, args.target_dir, args.db, args.workers, args.journal)
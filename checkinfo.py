@@ -1,16 +1,30 @@
 import sqlite3
 import tkinter as tk
-import pyperclip
 from tkinter import messagebox
 from tkinter import ttk
 from datetime import datetime
 import os
 import subprocess
+import logging
+from file_index import FileIndex
+from bill_search import BillSearch
+from db_manager import DBManager
+from query_worker import DataVersionCache, QueryWorker
 
 class BillViewer:
     def __init__(self, root, db_path):
         self.root = root
         self.db_path = db_path
+        self.file_index = None  # 第一次打开PDF时创建
+        self._suggest_job = None
+        self._request_id = 0
+        # 数据库查询都在后台线程执行；最近显示过的账单按查询条件缓存
+        self.worker = QueryWorker(root, db_path)
+        # 结构迁移（可能要重建全文索引）也交给工作线程，排在所有查询之前，不阻塞界面
+        self.worker.submit(lambda conn: DBManager(db_path).close(), lambda _: None,
+                           lambda error: messagebox.showerror("数据库错误", f"数据库结构迁移失败: {error}"))
+        self.bill_cache = DataVersionCache(maxsize=256)
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
         self.root.title("Bill Info")
         self.root.minsize(600, 400)
 
@@ -132,6 +146,10 @@ class BillViewer:
                                            value="employee", font=("Arial", 10),
                                            command=self.on_search_type_change)
         self.employee_radio.pack(side="left", padx=5)
+        self.item_radio = tk.Radiobutton(self.input_frame, text="项目", variable=self.search_type,
+                                         value="item", font=("Arial", 10),
+                                         command=self.on_search_type_change)
+        self.item_radio.pack(side="left", padx=5)
 
         self.entry = tk.Entry(self.input_frame, font=("Arial", 12))
         self.entry.pack(side="left", padx=5, expand=True, fill="x")
@@ -139,6 +157,11 @@ class BillViewer:
         self.search_button = tk.Button(self.input_frame, text="查询", font=("Arial", 10), height=1, command=self.fetch_and_display)
         self.search_button.pack(side="right", padx=5)
         self.entry.bind("<Return>", lambda event: self.fetch_and_display())
+        self.entry.bind("<KeyRelease>", self.on_entry_key)
+
+        # 输入提示列表（输入框下方，有提示时才显示）
+        self.suggest_listbox = tk.Listbox(root, font=("Arial", 11), height=5)
+        self.suggest_listbox.bind("<<ListboxSelect>>", self.on_select_suggestion)
 
         self.open_pdf_button = tk.Button(self.input_frame, text="打开", font=("Arial", 10), height=1, command=self.open_pdf)
         self.open_pdf_button.pack(side="right", padx=5)
@@ -146,10 +169,17 @@ class BillViewer:
         # 绑定点击复制事件
         self.tree.bind("<ButtonRelease-1>", self.copy_to_clipboard)
 
+    def on_close(self):
+        self.worker.stop()
+        if self.file_index is not None:
+            self.file_index.close()
+        self.root.destroy()
+
     def on_search_type_change(self):
         """Handle search type change"""
         # Clear the input field when switching search types
         self.entry.delete(0, tk.END)
+        self.hide_suggestions()
         
         if self.search_type.get() == "bill":
             self.invoice_list_frame.pack_forget()  # Hide invoice list frame when searching by bill number
@@ -160,22 +190,71 @@ class BillViewer:
 
     def toggle_invoice_list(self):
         """Toggle visibility of invoice list based on search type"""
-        if self.search_type.get() == "employee":
+        if self.search_type.get() in ("employee", "item"):
             self.invoice_list_frame.pack(fill="x", padx=10, pady=5, after=self.input_frame)
         else:
             self.invoice_list_frame.pack_forget()
 
-    def fetch_user_bills(self, username):
-        """Fetch all bills for a given username"""
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            cursor.execute("""
-                SELECT DISTINCT bills.bill_number
-                FROM bills
-                WHERE bills.user_name LIKE ?
-                ORDER BY bills.date DESC
-            """, (f"%{username}%",))
-            return [row[0] for row in cursor.fetchall()]
+    # 搜索类型 -> 全文索引中的字段
+    SEARCH_FIELDS = {"bill": "bill_number", "employee": "user_name", "item": "item_name"}
+    # 显示 Related Bills 列表后在后台预读的账单数
+    PREFETCH_BILLS = 20
+
+    def on_entry_key(self, event):
+        """输入时延迟刷新输入提示，连续输入只查询一次"""
+        if event.keysym in ("Return", "Up", "Down", "Escape"):
+            if event.keysym == "Escape":
+                self.hide_suggestions()
+            return
+        if self._suggest_job is not None:
+            self.root.after_cancel(self._suggest_job)
+        self._suggest_job = self.root.after(150, self.update_suggestions)
+
+    def update_suggestions(self):
+        self._suggest_job = None
+        term = self.entry.get().strip()
+        if not term:
+            self.hide_suggestions()
+            return
+        field = self.SEARCH_FIELDS[self.search_type.get()]
+        self.worker.submit(
+            lambda conn: BillSearch(conn).suggest(term, field),
+            lambda suggestions: self.show_suggestions(term, suggestions)
+        )
+
+    def show_suggestions(self, term, suggestions):
+        if term != self.entry.get().strip():
+            return  # 输入已经变了，丢弃过期的提示
+        if not suggestions or suggestions == [term]:
+            self.hide_suggestions()
+            return
+        self.suggest_listbox.delete(0, tk.END)
+        for value in suggestions:
+            self.suggest_listbox.insert(tk.END, value)
+        self.suggest_listbox.pack(fill="x", padx=10, after=self.input_frame)
+
+    def hide_suggestions(self):
+        self.suggest_listbox.pack_forget()
+
+    def on_select_suggestion(self, event):
+        if not self.suggest_listbox.curselection():
+            return
+        value = self.suggest_listbox.get(self.suggest_listbox.curselection())
+        self.entry.delete(0, tk.END)
+        self.entry.insert(0, value)
+        self.hide_suggestions()
+        self.fetch_and_display()
+
+    def fetch_user_bills(self, conn, username, field="user_name"):
+        """Fetch all bills for a given username (or item name)"""
+        cursor = conn.cursor()
+        cursor.execute(f"""
+            SELECT DISTINCT bills.bill_number
+            FROM bills
+            WHERE bills.id IN ({BillSearch(conn).bill_ids_sql(field, username)})
+            ORDER BY bills.date DESC
+        """, (f"%{username}%",))
+        return [row[0] for row in cursor.fetchall()]
         
     def on_select_invoice(self, event):
         """Handle invoice selection from listbox"""
@@ -187,52 +266,62 @@ class BillViewer:
         self.search_type.set("bill")  # 切换到账单号查询模式
         self.fetch_and_display()  # 直接查询详细信息
 
-    def fetch_bill_data(self, search_term):
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-
-            if self.search_type.get() == "bill":
-                # Original bill number search
-                cursor.execute("""
-                    SELECT bills.bill_number, bills.date, employees.name, employees.vehicle_name, employees.department, bills.vehicle_name
-                    FROM bills
-                    LEFT JOIN employees ON bills.user_name = employees.name AND bills.vehicle_name = employees.vehicle_name
-                    WHERE bills.bill_number LIKE ?
-                """, (f"%{search_term}%",))
-            else:
-                # Employee name search - modified to actually find bills
-                cursor.execute("""
-                    SELECT bills.bill_number, bills.date, bills.user_name, employees.vehicle_name, employees.department, bills.vehicle_name
-                    FROM bills
-                    LEFT JOIN employees ON bills.user_name = employees.name
-                    WHERE bills.user_name LIKE ?
-                    ORDER BY bills.date DESC
-                    LIMIT 1
-                """, (f"%{search_term}%",))
-
-            bill_info = cursor.fetchone()
-
-            if not bill_info:
-                if self.search_type.get() == "bill":
-                    messagebox.showerror("查询失败", f"未找到账单号 {search_term} 对应的记录")
-                else:
-                    messagebox.showerror("查询失败", f"未找到用户名 {search_term} 对应的记录")
-                return None, None
-
-            bill_number, date, user, vehicle, department, vehicle_model = bill_info
-
-            # Only fetch bill items if we have a valid bill number
-            if bill_number:
-                cursor.execute("""
-                    SELECT item_name, amount, tax, total_amount
-                    FROM bill_items
-                    WHERE bill_id = (SELECT id FROM bills WHERE bill_number = ?)
-                """, (bill_number,))
-                items = cursor.fetchall()
-            else:
-                items = []
-
-            return (bill_number, date, user, vehicle, department, vehicle_model), items
+    def fetch_bill_data(self, conn, search_term, search_type="bill"):
+        """在工作线程中执行，结果（账单信息和明细）按查询条件缓存，数据库有写入时失效"""
+        return self.bill_cache.get(
+            conn, (search_type, search_term),
+            lambda: self._query_bill_data(conn, search_term, search_type)
+        )
+
+    def _query_bill_data(self, conn, search_term, search_type):
+        cursor = conn.cursor()
+
+        if search_type == "bill":
+            # Original bill number search
+            cursor.execute(f"""
+                SELECT bills.bill_number, bills.date, employees.name, employees.vehicle_name, employees.department, bills.vehicle_name
+                FROM bills
+                LEFT JOIN employees ON bills.user_name = employees.name AND bills.vehicle_name = employees.vehicle_name
+                WHERE bills.id IN ({BillSearch(conn).bill_ids_sql("bill_number", search_term)})
+            """, (f"%{search_term}%",))
+        else:
+            # Employee name search - modified to actually find bills
+            cursor.execute(f"""
+                SELECT bills.bill_number, bills.date, bills.user_name, employees.vehicle_name, employees.department, bills.vehicle_name
+                FROM bills
+                LEFT JOIN employees ON bills.user_name = employees.name
+                WHERE bills.id IN ({BillSearch(conn).bill_ids_sql("user_name", search_term)})
+                ORDER BY bills.date DESC
+                LIMIT 1
+            """, (f"%{search_term}%",))
+
+        bill_info = cursor.fetchone()
+
+        if not bill_info:
+            return None, None, None
+
+        bill_number, date, user, vehicle, department, vehicle_model = bill_info
+
+        # Only fetch bill items if we have a valid bill number
+        totals = None
+        if bill_number:
+            cursor.execute("""
+                SELECT item_name, amount, tax, total_amount
+                FROM bill_items
+                WHERE bill_id = (SELECT id FROM bills WHERE bill_number = ?)
+            """, (bill_number,))
+            items = cursor.fetchall()
+            # 金额汇总由 DBManager 写入时维护
+            cursor.execute("""
+                SELECT net, tax, gross, leasing_service_net, leasing_service_tax
+                FROM bill_totals
+                WHERE bill_id = (SELECT id FROM bills WHERE bill_number = ?)
+            """, (bill_number,))
+            totals = cursor.fetchone()
+        else:
+            items = []
+
+        return (bill_number, date, user, vehicle, department, vehicle_model), items, totals
 
     def fetch_and_display(self):
         search_term = self.entry.get().strip()
@@ -240,44 +329,91 @@ class BillViewer:
             messagebox.showwarning("Wrong Data", "请输入查询内容")
             return
 
-        if self.search_type.get() == "employee":
-            # Username search
-            bills = self.fetch_user_bills(search_term)
-            if not bills:
-                messagebox.showwarning("未找到记录", f"未找到用户名 {search_term} 的账单记录")
-                return
-            
-            if len(bills) == 1:
-                # If only one bill is found, automatically switch to bill number search
-                self.invoice_list_frame.pack_forget()
-                self.search_type.set("bill")  # Switch to bill number search mode
-                self.bill_radio.select()  # Select the bill radio button
-                
-                # Use the bill number to search
-                self.entry.delete(0, tk.END)
-                self.entry.insert(0, bills[0])
-                
-                # Fetch and display this bill
-                bill_info, items = self.fetch_bill_data(bills[0])
-                if bill_info is not None:
-                    self.update_display(bill_info, items)
-            else:
-                # If multiple bills, show the list
-                self.invoice_listbox.delete(0, tk.END)
-                for bill in bills:
-                    self.invoice_listbox.insert(tk.END, bill)
-                
-                # Show the invoice list frame
-                self.invoice_list_frame.pack(fill="x", padx=10, pady=5, after=self.input_frame)
-                # Clear current display until user selects a specific bill
-                self.clear_display()
+        self.hide_suggestions()
+        # 只显示最后一次查询的结果，先发出的慢查询晚返回时直接丢弃
+        self._request_id += 1
+        request_id = self._request_id
+        search_type = self.search_type.get()
+        self.status_label.config(text="查询中...")
+
+        if search_type in ("employee", "item"):
+            field = self.SEARCH_FIELDS[search_type]
+
+            def job(conn):
+                # Username / item name search
+                bills = self.fetch_user_bills(conn, search_term, field)
+                # 只有一张账单时直接一起取出详细信息
+                data = self.fetch_bill_data(conn, bills[0]) if len(bills) == 1 else None
+                return bills, data
+
+            self.worker.submit(
+                job,
+                lambda result: self.show_bill_list(request_id, search_type, search_term, *result),
+                lambda error: self.show_query_error(request_id, error)
+            )
             return
-        
+
         # Bill number search
         self.invoice_list_frame.pack_forget()  # Hide invoice list frame
-        bill_info, items = self.fetch_bill_data(search_term)
-        if bill_info is not None:
-            self.update_display(bill_info, items)
+        self.worker.submit(
+            lambda conn: self.fetch_bill_data(conn, search_term),
+            lambda result: self.show_bill(request_id, search_term, *result),
+            lambda error: self.show_query_error(request_id, error)
+        )
+
+    def show_query_error(self, request_id, error):
+        if request_id != self._request_id:
+            return
+        self.status_label.config(text="")
+        messagebox.showerror("查询失败", f"数据库查询出错: {error}")
+
+    def show_bill(self, request_id, search_term, bill_info, items, totals):
+        """主线程：显示账单号查询结果"""
+        if request_id != self._request_id:
+            return
+        self.status_label.config(text="")
+        if bill_info is None:
+            messagebox.showerror("查询失败", f"未找到账单号 {search_term} 对应的记录")
+            return
+        self.update_display(bill_info, items, totals)
+
+    def show_bill_list(self, request_id, search_type, search_term, bills, data):
+        """主线程：显示用户名/项目查询结果"""
+        if request_id != self._request_id:
+            return
+        self.status_label.config(text="")
+        if not bills:
+            label = "用户名" if search_type == "employee" else "项目"
+            messagebox.showwarning("未找到记录", f"未找到{label} {search_term} 的账单记录")
+            return
+
+        if len(bills) == 1:
+            # If only one bill is found, automatically switch to bill number search
+            self.invoice_list_frame.pack_forget()
+            self.search_type.set("bill")  # Switch to bill number search mode
+            self.bill_radio.select()  # Select the bill radio button
+
+            # Use the bill number to search
+            self.entry.delete(0, tk.END)
+            self.entry.insert(0, bills[0])
+
+            # Display this bill
+            bill_info, items, totals = data
+            if bill_info is not None:
+                self.update_display(bill_info, items, totals)
+        else:
+            # If multiple bills, show the list
+            self.invoice_listbox.delete(0, tk.END)
+            for bill in bills:
+                self.invoice_listbox.insert(tk.END, bill)
+
+            # Show the invoice list frame
+            self.invoice_list_frame.pack(fill="x", padx=10, pady=5, after=self.input_frame)
+            # Clear current display until user selects a specific bill
+            self.clear_display()
+            # 后台预先读取列表中的账单，切换时直接命中缓存
+            prefetch = bills[:self.PREFETCH_BILLS]
+            self.worker.submit(lambda conn: [self.fetch_bill_data(conn, bill) for bill in prefetch], lambda _: None)
     
     def clear_display(self):
         """Clear all display fields"""
@@ -311,7 +447,7 @@ class BillViewer:
         # 直接调用查询方法
         self.fetch_and_display()
 
-    def update_display(self, bill_info, items):
+    def update_display(self, bill_info, items, totals=None):
         """Update the display with bill information"""
         bill_number, date, user, vehicle, department, vehicle_model = bill_info
 
@@ -334,16 +470,9 @@ class BillViewer:
         # Clear and update the tree
         self.tree.delete(*self.tree.get_children())
 
-        if items:
-            # Calculate and display financial information
-            total_tax_included = sum(item[1] + item[2] for item in items)
-            total_tax = sum(item[2] for item in items)
-            total_tax_excluded = total_tax_included - total_tax
-
-            leasing_rate = sum(item[1] for item in items if item[0] == "Finanzleasingrate")
-            service_rate = sum(item[1] for item in items if item[0] == "Servicerate")
-            leasing_service_total = leasing_rate + service_rate
-            leasing_tax = sum(item[2] for item in items if item[0] in ["Finanzleasingrate", "Servicerate"])
+        if items and totals:
+            # 汇总金额直接读取 bill_totals
+            total_tax_excluded, total_tax, total_tax_included, leasing_service_total, leasing_tax = totals
 
             # Update financial labels
             self.sum_tax_excluded_label.config(text=f"Sum ohne Tax: {total_tax_excluded:.2f}")
@@ -365,6 +494,8 @@ class BillViewer:
             self.leasing_tax_label.config(text="Leasing Tax: 0.00")
 
     def copy_to_clipboard(self, event, data_type=None):
+        import pyperclip
+
         if data_type:
             # 复制账单信息或金额信息
             widget = event.widget
@@ -394,16 +525,17 @@ class BillViewer:
             messagebox.showwarning("错误", "请输入账单号")
             return
 
-        # 在 Bills 文件夹中查找包含账单号的 PDF 文件
-        bills_folder = "Bills"
-        pdf_files = [f for f in os.listdir(bills_folder) if f.endswith(".pdf") and bill_number in f]
+        # 在 Bills 文件夹的文件索引中查找包含账单号的 PDF 文件（目录未变化时不重新列目录）
+        if self.file_index is None:
+            self.file_index = FileIndex("Bills", self.db_path)
+        pdf_files = self.file_index.find_bill(bill_number)
 
         if not pdf_files:
             messagebox.showwarning("未找到文件", f"未找到包含账单号 {bill_number} 的 PDF 文件")
             return
 
         # 打开第一个匹配的 PDF 文件
-        pdf_path = os.path.join(bills_folder, pdf_files[0])
+        pdf_path = str(pdf_files[0])
         try:
             if os.name == "nt":  # Windows
                 os.startfile(pdf_path)
@@ -412,12 +544,16 @@ class BillViewer:
         except Exception as e:
             messagebox.showerror("打开文件失败", f"无法打开 PDF 文件: {e}")
 
-if __name__ == "__main__":
+def main(argv=None):
     import argparse
     parser = argparse.ArgumentParser(description="查询账单信息")
     parser.add_argument("--db", default="bills.db", help="数据库路径 (默认: bills.db)")
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
 
+    logging.basicConfig(level=logging.INFO)
     root = tk.Tk()
     app = BillViewer(root, args.db)
-    root.mainloop()
\ No newline at end of file
+    root.mainloop()
+
+if __name__ == "__main__":
+    main()
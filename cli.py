@@ -0,0 +1,45 @@
+"""
+统一入口
+
+    python cli.py ingest [Bills] [...]            导入PDF账单（main.py）
+    python cli.py import-employees file.xlsx [...] 从 Excel 导入员工部门（import_employees.py）
+    python cli.py report out.xlsx [...]            导出高额账单报表（bill_report.py）
+    python cli.py view [--db bills.db]             打开账单查询界面（checkinfo.py）
+    python cli.py submit URL [-n 4] [...]          把账单批量提交到 IBOS 表单（submission_engine.py）
+    python cli.py analytics {export,report} OUT    Parquet 导出和按月/年汇总报表（analytics.py）
+
+每个子命令只在执行时才导入对应模块，pdfplumber、pandas、pyarrow、tkinter、selenium 等只有需要它们的子命令才会加载；
+子命令后面的参数原样交给对应模块的 main，`python cli.py report -h` 查看各自的参数
+"""
+import argparse
+import importlib
+import sys
+
+# 子命令 -> (模块, 说明)
+COMMANDS = {
+    'ingest': ('main', '导入PDF账单'),
+    'import-employees': ('import_employees', '从 Excel 导入员工部门'),
+    'report': ('bill_report', '导出高额账单报表 (CSV / XLSX)'),
+    'view': ('checkinfo', '打开账单查询界面'),
+    'submit': ('submission_engine', '把账单批量提交到 IBOS 表单'),
+    'analytics': ('analytics', 'Parquet 导出和按月/年汇总报表'),
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="IBOS 账单工具",
+        epilog='\n'.join(f"  {name:18s}{help_text}" for name, (_, help_text) in COMMANDS.items()),
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument('command', choices=COMMANDS, metavar='command', help='子命令，见下方列表')
+    parser.add_argument('args', nargs=argparse.REMAINDER, help='子命令的参数')
+    args = parser.parse_args(argv)
+
+    module = importlib.import_module(COMMANDS[args.command][0])
+    sys.argv[0] = f"{parser.prog} {args.command}"
+    return module.main(args.args)
+
+
+if __name__ == "__main__":
+    main()
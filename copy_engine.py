@@ -0,0 +1,125 @@
+"""
+并行、可续传、去重的文件复制
+
+- 目标路径相同的任务只复制一次
+- 目标文件大小和修改时间与源文件一致时跳过（copy2 会保留修改时间）
+- 先复制到 .part 临时文件再改名，中断时不会留下不完整的目标文件
+- 每完成一个文件就追加写入复制日志（默认是当前目录下的 .copy_journal.jsonl，与默认的 bills.db 放在一起，
+  不写进用户看到的目标目录），重新运行时日志中已完成且源文件未变的直接跳过
+"""
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+JOURNAL_NAME = ".copy_journal.jsonl"
+
+
+@dataclass
+class CopyStats:
+    copied: List[Tuple[Path, Path]] = field(default_factory=list)
+    skipped: int = 0
+    duplicates: int = 0
+    failed: List[Tuple[Path, str]] = field(default_factory=list)
+    bytes_copied: int = 0
+    seconds: float = 0.0
+
+    def summary(self) -> str:
+        seconds = self.seconds or 1e-9
+        return (f"复制 {len(self.copied)} 个文件 ({self.bytes_copied / 1e6:.1f} MB)，跳过 {self.skipped} 个，"
+                f"重复 {self.duplicates} 个，失败 {len(self.failed)} 个，用时 {self.seconds:.2f}s，"
+                f"{self.bytes_copied / 1e6 / seconds:.1f} MB/s，{len(self.copied) / seconds:.1f} 文件/s")
+
+
+class CopyEngine:
+    def __init__(self, workers: int = 4, journal_path: Optional[Path] = None):
+        self.workers = workers
+        self.journal_path = Path(journal_path) if journal_path else Path(JOURNAL_NAME)
+        self._lock = threading.Lock()
+
+    def _load_journal(self, journal_path: Path) -> Dict[str, Tuple[str, int, int]]:
+        """读取已完成的复制记录: 目标路径 -> (源路径, 大小, 修改时间ns)"""
+        done = {}
+        if not journal_path.exists():
+            return done
+        with open(journal_path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                    done[entry["dst"]] = (entry["src"], entry["size"], entry["mtime_ns"])
+                except (ValueError, KeyError):
+                    continue  # 中断时写了一半的最后一行
+        return done
+
+    def _needs_copy(self, src: Path, dst: Path, src_stat: os.stat_result, done: Dict) -> bool:
+        entry = done.get(str(dst))
+        if entry == (str(src), src_stat.st_size, src_stat.st_mtime_ns) and dst.exists():
+            return False
+        try:
+            dst_stat = dst.stat()
+        except FileNotFoundError:
+            return True
+        return not (dst_stat.st_size == src_stat.st_size and dst_stat.st_mtime_ns == src_stat.st_mtime_ns)
+
+    def _copy_one(self, src: Path, dst: Path, done: Dict, journal) -> Optional[int]:
+        """复制单个文件，返回复制的字节数；无需复制时返回 None"""
+        src_stat = src.stat()
+        if not self._needs_copy(src, dst, src_stat, done):
+            return None
+        part = dst.with_name(dst.name + ".part")
+        shutil.copy2(src, part)
+        os.replace(part, dst)
+        with self._lock:
+            journal.write(json.dumps({
+                "src": str(src), "dst": str(dst), "size": src_stat.st_size, "mtime_ns": src_stat.st_mtime_ns
+            }, ensure_ascii=False) + "\n")
+            journal.flush()
+        return src_stat.st_size
+
+    def run(self, tasks: Iterable[Tuple[Path, Path]]) -> CopyStats:
+        """执行 (源文件, 目标文件) 复制任务"""
+        stats = CopyStats()
+        start = time.perf_counter()
+        unique: Dict[Path, Path] = {}
+        for src, dst in tasks:
+            src, dst = Path(src), Path(dst)
+            if dst in unique:
+                stats.duplicates += 1
+                if unique[dst] != src:
+                    logger.warning(f"多个源文件对应同一目标，只复制第一个: {dst}")
+                continue
+            unique[dst] = src
+        if not unique:
+            return stats
+
+        done = self._load_journal(self.journal_path)
+        for dst in unique:
+            dst.parent.mkdir(parents=True, exist_ok=True)
+        self.journal_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.journal_path, "a", encoding="utf-8") as journal, \
+                ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="copy") as pool:
+            futures = {pool.submit(self._copy_one, src, dst, done, journal): (src, dst) for dst, src in unique.items()}
+            for future in as_completed(futures):
+                src, dst = futures[future]
+                try:
+                    size = future.result()
+                except OSError as e:
+                    logger.error(f"复制失败: {src} -> {dst}, 错误: {str(e)}")
+                    stats.failed.append((src, str(e)))
+                    continue
+                if size is None:
+                    stats.skipped += 1
+                else:
+                    stats.copied.append((src, dst))
+                    stats.bytes_copied += size
+        stats.copied.sort()
+        stats.seconds = time.perf_counter() - start
+        return stats
@@ -1,19 +1,154 @@
 import sqlite3
 import logging
-from typing import Dict, List, Optional
+import metrics
+from typing import Dict, Iterable, List, Optional, Set, Tuple
 
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# 按账单汇总明细金额；租赁费与服务费（Finanzleasingrate / Servicerate）单独汇总
+BILL_TOTALS_SELECT = """
+    SELECT bill_id, SUM(amount), SUM(tax), SUM(total_amount),
+           TOTAL(CASE WHEN item_name IN ('Finanzleasingrate', 'Servicerate') THEN amount END),
+           TOTAL(CASE WHEN item_name IN ('Finanzleasingrate', 'Servicerate') THEN tax END)
+    FROM bill_items
+"""
+
+# 按顺序执行的结构迁移，已执行到的版本号记录在 PRAGMA user_version
+MIGRATIONS = [
+    # 1: 明细自然键唯一约束（先清理历史重复行）及联表查询所需索引
+    """
+    DELETE FROM bill_items WHERE id NOT IN (
+        SELECT MIN(id) FROM bill_items
+        GROUP BY bill_id, item_name, amount, tax, tax_rate, total_amount
+    );
+    CREATE UNIQUE INDEX IF NOT EXISTS ux_bill_items_natural_key
+        ON bill_items (bill_id, item_name, amount, tax, tax_rate, total_amount);
+    CREATE INDEX IF NOT EXISTS ix_bills_user_vehicle ON bills (user_name, vehicle_name);
+    """,
+    # 2: 员工 Excel 增量导入状态：每个姓名的行指纹汇总，以及上次导入时的员工最大 id
+    """
+    CREATE TABLE IF NOT EXISTS employee_import_state (
+        name TEXT PRIMARY KEY,
+        fingerprint TEXT NOT NULL,
+        row_count INTEGER NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS import_meta (
+        key TEXT PRIMARY KEY,
+        value TEXT NOT NULL
+    );
+    """,
+    # 3: 账单/合同文件目录索引，目录修改时间没变时不再重新列目录
+    """
+    CREATE TABLE IF NOT EXISTS file_index_dirs (
+        directory TEXT PRIMARY KEY,
+        mtime_ns INTEGER NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS file_index (
+        directory TEXT NOT NULL,
+        file_name TEXT NOT NULL,
+        file_size INTEGER NOT NULL,
+        mtime_ns INTEGER NOT NULL,
+        PRIMARY KEY (directory, file_name)
+    );
+    """,
+    # 4: 查询界面用的 FTS5 trigram 全文索引
+    # bills_fts 是 bills 的外部内容索引，用于按账单号/用户名/车型查账单；
+    # 输入提示只需要去重后的取值，search_terms 收集各字段出现过的值，search_terms_fts 再对这些值建 trigram 索引，
+    # 提示查询的开销与账单数量无关。新行由 DBManager 写入时按批同步（见 _index_new_rows）
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS bills_fts USING fts5(
+        bill_number, user_name, vehicle_name, content='bills', content_rowid='id', tokenize='trigram'
+    );
+    CREATE TABLE IF NOT EXISTS search_terms (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        field TEXT NOT NULL,
+        value TEXT NOT NULL,
+        UNIQUE(field, value)
+    );
+    CREATE VIRTUAL TABLE IF NOT EXISTS search_terms_fts USING fts5(
+        value, content='search_terms', content_rowid='id', tokenize='trigram'
+    );
+
+    INSERT OR IGNORE INTO search_terms (field, value)
+        SELECT 'user_name', user_name FROM bills
+        UNION SELECT 'vehicle_name', vehicle_name FROM bills
+        UNION SELECT 'item_name', item_name FROM bill_items;
+    INSERT INTO bills_fts (bills_fts) VALUES ('rebuild');
+    INSERT INTO search_terms_fts (search_terms_fts) VALUES ('rebuild');
+    """,
+    # 5: 每张账单的金额汇总，写入明细时由 DBManager 更新（见 _refresh_totals）
+    """
+    CREATE TABLE IF NOT EXISTS bill_totals (
+        bill_id INTEGER PRIMARY KEY,
+        net REAL NOT NULL,
+        tax REAL NOT NULL,
+        gross REAL NOT NULL,
+        leasing_service_net REAL NOT NULL,
+        leasing_service_tax REAL NOT NULL,
+        FOREIGN KEY (bill_id) REFERENCES bills(id)
+    );
+    CREATE INDEX IF NOT EXISTS ix_bill_totals_gross ON bill_totals (gross);
+    INSERT OR REPLACE INTO bill_totals
+    """ + BILL_TOTALS_SELECT + """
+    GROUP BY bill_id;
+    """,
+    # 6: 按PDF内容哈希缓存的提取文本（zlib 压缩），解析规则变化后可直接重新解析，见 text_cache.py
+    """
+    CREATE TABLE IF NOT EXISTS text_cache (
+        content_hash TEXT PRIMARY KEY,
+        mode TEXT NOT NULL,
+        data BLOB NOT NULL,
+        raw_size INTEGER NOT NULL,
+        stored_size INTEGER NOT NULL,
+        last_used INTEGER NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS ix_text_cache_last_used ON text_cache (last_used);
+    CREATE INDEX IF NOT EXISTS ix_ingest_manifest_hash ON ingest_manifest (content_hash);
+    """,
+    # 7: 每张账单向 IBOS 的提交状态，按账单号记录（重新解析后账单ID会变），见 submission_queue.py
+    # next_attempt_at: pending 时为最早重试时间，in_flight 时为租约到期时间（进程中断后到期的会被重新领取）
+    """
+    CREATE TABLE IF NOT EXISTS submissions (
+        bill_number TEXT PRIMARY KEY,
+        status TEXT NOT NULL DEFAULT 'pending' CHECK (status IN ('pending', 'in_flight', 'done', 'failed')),
+        attempts INTEGER NOT NULL DEFAULT 0,
+        last_error TEXT,
+        next_attempt_at REAL NOT NULL DEFAULT 0,
+        updated_at REAL
+    );
+    CREATE INDEX IF NOT EXISTS ix_submissions_due ON submissions (status, next_attempt_at);
+    """,
+]
+
 class DBManager:
-    def __init__(self, db_path="bills.db"):
+    def __init__(self, db_path="bills.db", commit_size: int = 500, journal_mode: str = "WAL"):
         self.db_path = db_path
+        self.commit_size = commit_size
+        # 整个生命周期复用同一个连接，避免每次读写都重新打开数据库
+        self.conn = sqlite3.connect(self.db_path)
+        self.conn.execute(f"PRAGMA journal_mode={journal_mode}")
+        if journal_mode.upper() == "WAL":
+            # WAL 模式下 NORMAL 只在检查点时 fsync，提交仍然是原子的
+            self.conn.execute("PRAGMA synchronous=NORMAL")
         self._create_tables()
+        self._migrate()
+
+    def close(self):
+        """关闭数据库连接"""
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
 
     def _create_tables(self):
         """创建数据库表"""
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
+        with self.conn:
+            cursor = self.conn.cursor()
             cursor.executescript("""
                 CREATE TABLE IF NOT EXISTS employees (
                     id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -42,100 +177,422 @@ class DBManager:
                     total_amount REAL NOT NULL,
                     FOREIGN KEY (bill_id) REFERENCES bills(id)
                 );
+
+                CREATE TABLE IF NOT EXISTS ingest_manifest (
+                    file_path TEXT PRIMARY KEY,
+                    file_size INTEGER NOT NULL,
+                    mtime_ns INTEGER NOT NULL,
+                    content_hash TEXT NOT NULL,
+                    bill_id INTEGER,
+                    ingested_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                    FOREIGN KEY (bill_id) REFERENCES bills(id)
+                );
             """)
-            conn.commit()
             logger.debug("数据库表已初始化")
 
+    def _migrate(self):
+        """执行尚未应用的结构迁移，每个版本在单独的事务中完成"""
+        version = self.conn.execute("PRAGMA user_version").fetchone()[0]
+        for target in range(version + 1, len(MIGRATIONS) + 1):
+            try:
+                self.conn.executescript(f"BEGIN; {MIGRATIONS[target - 1]} PRAGMA user_version = {target}; COMMIT;")
+            except sqlite3.Error:
+                self.conn.rollback()
+                raise
+            logger.info(f"数据库已迁移到版本 {target}")
+
     def add_employee(self, name: str, department: str, vehicle_name: str) -> int:
         """添加员工信息"""
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
+        with self.conn:
+            cursor = self.conn.cursor()
             cursor.execute(
-                "SELECT id FROM employees WHERE name = ? AND vehicle_name = ?",
-                (name, vehicle_name)
+                """
+                INSERT INTO employees (name, department, vehicle_name) VALUES (?, ?, ?)
+                ON CONFLICT (name, vehicle_name) DO NOTHING
+                """,
+                (name, department, vehicle_name)
             )
-            result = cursor.fetchone()
-            if result:
-                logger.info(f"员工信息已存在: {name}, {vehicle_name}")
-                return result[0]
-            else:
-                cursor.execute(
-                    "INSERT INTO employees (name, department, vehicle_name) VALUES (?, ?, ?)",
-                    (name, department, vehicle_name)
-                )
-                conn.commit()
+            if cursor.rowcount:
                 logger.debug(f"员工信息已添加: {name}, {vehicle_name}")
                 return cursor.lastrowid
+            logger.info(f"员工信息已存在: {name}, {vehicle_name}")
+            return self.get_employee_id(name, vehicle_name)
 
     def get_employee_id(self, name: str, vehicle_name: str) -> Optional[int]:
         """获取员工ID"""
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            cursor.execute("SELECT id FROM employees WHERE name = ? AND vehicle_name = ?", (name, vehicle_name))
-            result = cursor.fetchone()
-            return result[0] if result else None
+        cursor = self.conn.cursor()
+        cursor.execute("SELECT id FROM employees WHERE name = ? AND vehicle_name = ?", (name, vehicle_name))
+        result = cursor.fetchone()
+        return result[0] if result else None
 
+    @metrics.timed('add_bill')
     def add_bill(self, bill_data: Dict, pdf_filename: str) -> int:
         """添加账单信息，并在日志中显示文件名"""
         employee_id = self.add_employee(bill_data["user_name"], "Unknown", bill_data["vehicle_name"])
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
+        with self.conn:
+            cursor = self.conn.cursor()
             cursor.execute(
-                "SELECT id FROM bills WHERE bill_number = ?",
-                (bill_data["bill_number"],)
+                """
+                INSERT INTO bills (bill_number, date, user_name, vehicle_name) VALUES (?, ?, ?, ?)
+                ON CONFLICT (bill_number) DO NOTHING
+                """,
+                (bill_data["bill_number"], bill_data["date"], bill_data["user_name"], bill_data["vehicle_name"])
             )
-            result = cursor.fetchone()
-            if result:
-                logger.info(f"账单信息已存在: {bill_data['bill_number']}")
-                return result[0]
-            else:
-                cursor.execute(
-                    "INSERT INTO bills (bill_number, date, user_name, vehicle_name) VALUES (?, ?, ?, ?)",
-                    (bill_data["bill_number"], bill_data["date"], bill_data["user_name"], bill_data["vehicle_name"])
-                )
-                conn.commit()
+            if cursor.rowcount:
                 bill_id = cursor.lastrowid
+                self._index_new_rows(cursor, bill_id - 1, ())
                 logger.info(f"账单 {bill_data['bill_number']} ({pdf_filename}) 已存入数据库")
                 return bill_id
+            logger.info(f"账单信息已存在: {bill_data['bill_number']}")
+            return self.get_bill_id(bill_data["bill_number"])
 
     def get_bill_id(self, bill_number: str) -> Optional[int]:
         """获取账单ID"""
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            cursor.execute("SELECT id FROM bills WHERE bill_number = ?", (bill_number,))
-            result = cursor.fetchone()
-            return result[0] if result else None
+        cursor = self.conn.cursor()
+        cursor.execute("SELECT id FROM bills WHERE bill_number = ?", (bill_number,))
+        result = cursor.fetchone()
+        return result[0] if result else None
 
+    @metrics.timed('add_bill_item', check_result=False)
     def add_bill_item(self, bill_id: int, item: Dict):
         """添加账单详细信息"""
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
+        with self.conn:
+            cursor = self.conn.cursor()
             cursor.execute(
                 """
-                SELECT 1 FROM bill_items
-                WHERE bill_id = ? AND item_name = ? AND amount = ? AND tax = ? AND tax_rate = ? AND total_amount = ?
+                INSERT INTO bill_items (bill_id, item_name, amount, tax, tax_rate, total_amount)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT (bill_id, item_name, amount, tax, tax_rate, total_amount) DO NOTHING
                 """,
                 (bill_id, item['item_name'], item['amount'], item['tax'], item['tax_rate'], item['total_amount'])
             )
-            if cursor.fetchone() is None:
-                cursor.execute(
-                    """
-                    INSERT INTO bill_items (bill_id, item_name, amount, tax, tax_rate, total_amount)
-                    VALUES (?, ?, ?, ?, ?, ?)
-                    """,
-                    (bill_id, item['item_name'], item['amount'], item['tax'], item['tax_rate'], item['total_amount'])
-                )
-                conn.commit()
+            if cursor.rowcount:
+                self._index_terms(cursor, [('item_name', item['item_name'])])
+                self._refresh_totals(cursor, [bill_id])
                 logger.debug(f"账单详细信息已添加: {item}")
             else:
                 logger.info(f"详细信息已存在: {item}")
 
+    @metrics.timed('bulk_ingest')
+    def bulk_ingest(self, bills: Iterable[Tuple[Dict, str]], commit_size: Optional[int] = None) -> List[int]:
+        """
+        批量写入账单及其明细
+        bills 为 (bill_data, pdf_filename) 序列，每 commit_size 张账单提交一次事务；
+        去重规则与 add_bill / add_bill_item 相同。返回与输入顺序一致的账单ID列表
+        """
+        commit_size = commit_size or self.commit_size
+        bill_ids = []
+        batch = []
+        for entry in bills:
+            batch.append(entry)
+            if len(batch) >= commit_size:
+                bill_ids.extend(self._write_batch(batch))
+                batch = []
+        if batch:
+            bill_ids.extend(self._write_batch(batch))
+        return bill_ids
+
+    def _index_new_rows(self, cursor: sqlite3.Cursor, after_bill_id: int, item_names: Iterable[str]):
+        """把 id 大于 after_bill_id 的新账单及新出现的字段取值加入全文索引（在调用方的事务中执行）"""
+        cursor.execute(
+            """
+            INSERT INTO bills_fts (rowid, bill_number, user_name, vehicle_name)
+            SELECT id, bill_number, user_name, vehicle_name FROM bills WHERE id > ?
+            """,
+            (after_bill_id,)
+        )
+        terms = set(cursor.execute(
+            """
+            SELECT 'user_name', user_name FROM bills WHERE id > ?1
+            UNION SELECT 'vehicle_name', vehicle_name FROM bills WHERE id > ?1
+            """,
+            (after_bill_id,)
+        ))
+        terms.update(('item_name', name) for name in item_names)
+        self._index_terms(cursor, terms)
+
+    def _index_terms(self, cursor: sqlite3.Cursor, terms: Iterable[Tuple[str, str]]):
+        """记录新出现的 (字段, 取值)，只有新插入的取值需要进入 search_terms_fts"""
+        terms = list(terms)
+        if len(terms) == 1:
+            cursor.execute("INSERT OR IGNORE INTO search_terms (field, value) VALUES (?, ?)", terms[0])
+            if cursor.rowcount > 0:
+                cursor.execute("INSERT INTO search_terms_fts (rowid, value) VALUES (?, ?)", (cursor.lastrowid, terms[0][1]))
+            return
+        after_term_id = cursor.execute("SELECT COALESCE(MAX(id), 0) FROM search_terms").fetchone()[0]
+        cursor.executemany("INSERT OR IGNORE INTO search_terms (field, value) VALUES (?, ?)", terms)
+        if cursor.rowcount > 0:
+            cursor.execute(
+                "INSERT INTO search_terms_fts (rowid, value) SELECT id, value FROM search_terms WHERE id > ?",
+                (after_term_id,)
+            )
+
+    def _refresh_totals(self, cursor: sqlite3.Cursor, bill_ids: Iterable[int]):
+        """重新汇总指定账单的金额（在调用方的事务中执行，明细按 bill_id 有索引）"""
+        bill_ids = list(set(bill_ids))
+        for start in range(0, len(bill_ids), 500):  # 受 SQLite 参数个数上限约束
+            chunk = bill_ids[start:start + 500]
+            cursor.execute(
+                f"INSERT OR REPLACE INTO bill_totals {BILL_TOTALS_SELECT} "
+                f"WHERE bill_id IN ({','.join('?' * len(chunk))}) GROUP BY bill_id",
+                chunk
+            )
+
+    def _max_bill_id(self, cursor: sqlite3.Cursor) -> int:
+        return cursor.execute("SELECT COALESCE(MAX(id), 0) FROM bills").fetchone()[0]
+
+    def _write_batch(self, batch: List[Tuple[Dict, str]]) -> List[int]:
+        """在一个事务中写入一批账单"""
+        with self.conn:
+            bill_ids, item_count = self._insert_batch(self.conn.cursor(), batch)
+        logger.info(f"批量写入 {len(batch)} 张账单, {item_count} 条明细")
+        return bill_ids
+
+    def _insert_batch(self, cursor: sqlite3.Cursor, batch: List[Tuple[Dict, str]]) -> Tuple[List[int], int]:
+        """写入一批账单及明细并更新索引和金额汇总（在调用方的事务中执行），返回 (账单ID列表, 明细条数)"""
+        after_bill_id = self._max_bill_id(cursor)
+        cursor.executemany(
+            """
+            INSERT INTO employees (name, department, vehicle_name) VALUES (?, 'Unknown', ?)
+            ON CONFLICT (name, vehicle_name) DO NOTHING
+            """,
+            [(bill_data["user_name"], bill_data["vehicle_name"]) for bill_data, _ in batch]
+        )
+        cursor.executemany(
+            """
+            INSERT INTO bills (bill_number, date, user_name, vehicle_name) VALUES (?, ?, ?, ?)
+            ON CONFLICT (bill_number) DO NOTHING
+            """,
+            [(bill_data["bill_number"], bill_data["date"], bill_data["user_name"], bill_data["vehicle_name"])
+             for bill_data, _ in batch]
+        )
+        id_by_number = {}
+        numbers = list({bill_data["bill_number"] for bill_data, _ in batch})
+        for start in range(0, len(numbers), 500):  # 受 SQLite 参数个数上限约束
+            chunk = numbers[start:start + 500]
+            cursor.execute(
+                f"SELECT bill_number, id FROM bills WHERE bill_number IN ({','.join('?' * len(chunk))})",
+                chunk
+            )
+            id_by_number.update(cursor.fetchall())
+
+        bill_ids = [id_by_number[bill_data["bill_number"]] for bill_data, _ in batch]
+        item_rows = []
+        for (bill_data, _), bill_id in zip(batch, bill_ids):
+            for item in bill_data["items"]:
+                item_rows.append(
+                    (bill_id, item['item_name'], item['amount'], item['tax'], item['tax_rate'], item['total_amount'])
+                )
+        cursor.executemany(
+            """
+            INSERT INTO bill_items (bill_id, item_name, amount, tax, tax_rate, total_amount)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT (bill_id, item_name, amount, tax, tax_rate, total_amount) DO NOTHING
+            """,
+            item_rows
+        )
+        self._index_new_rows(cursor, after_bill_id, (row[1] for row in item_rows))
+        self._refresh_totals(cursor, (row[0] for row in item_rows))
+        return bill_ids, len(item_rows)
+
+    def replace_bills(self, content_hashes: List[str], bills: List[Tuple[Dict, str]],
+                      claimed: Optional[Set[int]] = None) -> List[int]:
+        """
+        用重新解析的结果更新账单（一个事务）
+        导入清单中内容哈希对应的账单（清单中没有时按账单号找）原地更新，账单ID不变：账单字段和全文索引改为新值，
+        明细和金额汇总整体替换；找不到原账单的作为新账单写入。解析失败的原账单被删除，清单中改为 NULL。
+        改正后的账单号与另一张已有账单相同时，更新那一张并删除原来的。
+        同一批中有多项对应同一张账单时只有第一项原地更新，其余的按新账单写入，清单改指写入的账单；
+        分批调用时传入同一个 claimed 集合，已写入过的账单在后面的批次中也不会再被原地覆盖。
+        bills 与 content_hashes 一一对应，解析失败的位置为 None；返回解析成功的账单ID（顺序同输入）。
+        不再出现的输入提示取值由 prune_search_terms 清理
+        """
+        with self.conn:
+            cursor = self.conn.cursor()
+            old_ids = {}
+            for start in range(0, len(content_hashes), 500):  # 受 SQLite 参数个数上限约束
+                chunk = content_hashes[start:start + 500]
+                cursor.execute(
+                    f"""
+                    SELECT ingest_manifest.content_hash, bills.id FROM ingest_manifest
+                    JOIN bills ON bills.id = ingest_manifest.bill_id
+                    WHERE ingest_manifest.content_hash IN ({','.join('?' * len(chunk))})
+                    """,
+                    chunk
+                )
+                old_ids.update(cursor.fetchall())
+            numbers = list({entry[0]["bill_number"] for entry in bills if entry is not None})
+            id_by_number = {}
+            for start in range(0, len(numbers), 500):
+                chunk = numbers[start:start + 500]
+                cursor.execute(
+                    f"SELECT bill_number, id FROM bills WHERE bill_number IN ({','.join('?' * len(chunk))})",
+                    chunk
+                )
+                id_by_number.update(cursor.fetchall())
+
+            targets = []  # 与 content_hashes 对应：要原地更新的账单ID，新账单或解析失败为 None
+            claimed = set() if claimed is None else claimed
+            dropped = set()
+            for content_hash, entry in zip(content_hashes, bills):
+                old_id = old_ids.get(content_hash)
+                target = None
+                if entry is not None:
+                    number_id = id_by_number.get(entry[0]["bill_number"])
+                    target = number_id if number_id is not None else old_id
+                    if target in claimed:
+                        # 每张账单每批只原地更新一次（例如旧解析把几个文件合成了同一个账单号），
+                        # 其余的按新账单写入：账单号相同时与导入时一样并入那一张，不同时成为新账单
+                        target = None
+                    elif target is not None:
+                        claimed.add(target)
+                        id_by_number[entry[0]["bill_number"]] = target
+                if old_id is not None and old_id != target:
+                    dropped.add(old_id)
+                targets.append(target)
+            dropped -= claimed
+            updates = {bill_id: entry for bill_id, entry in zip(targets, bills) if bill_id is not None}
+
+            self._delete_bills(cursor, dropped)
+            item_count = self._update_bills(cursor, updates)
+            new = [entry for bill_id, entry in zip(targets, bills) if bill_id is None and entry is not None]
+            new_ids, new_items = self._insert_batch(cursor, new) if new else ([], 0)
+            new_ids = iter(new_ids)
+            bill_ids = [bill_id if bill_id is not None else next(new_ids) if entry is not None else None
+                        for bill_id, entry in zip(targets, bills)]
+            cursor.executemany(
+                "UPDATE ingest_manifest SET bill_id = ? WHERE content_hash = ?",
+                list(zip(bill_ids, content_hashes))
+            )
+            claimed.update(bill_id for bill_id in bill_ids if bill_id is not None)
+        logger.info(f"重新写入 {len(updates) + len(new)} 张账单（新增 {len(new)} 张，删除 {len(dropped)} 张）, "
+                    f"{item_count + new_items} 条明细")
+        return [bill_id for bill_id in bill_ids if bill_id is not None]
+
+    def _delete_bills(self, cursor: sqlite3.Cursor, bill_ids: Iterable[int]):
+        """删除账单及其明细、金额汇总和全文索引（在调用方的事务中执行）"""
+        cursor.execute("CREATE TEMP TABLE IF NOT EXISTS replaced_bills (id INTEGER PRIMARY KEY)")
+        cursor.execute("DELETE FROM temp.replaced_bills")
+        cursor.executemany("INSERT OR IGNORE INTO temp.replaced_bills VALUES (?)", [(bill_id,) for bill_id in bill_ids])
+        cursor.execute(
+            """
+            INSERT INTO bills_fts (bills_fts, rowid, bill_number, user_name, vehicle_name)
+            SELECT 'delete', id, bill_number, user_name, vehicle_name FROM bills
+            WHERE id IN (SELECT id FROM temp.replaced_bills)
+            """
+        )
+        for table, column in (("bill_items", "bill_id"), ("bill_totals", "bill_id"), ("bills", "id")):
+            cursor.execute(f"DELETE FROM {table} WHERE {column} IN (SELECT id FROM temp.replaced_bills)")
+
+    def _update_bills(self, cursor: sqlite3.Cursor, updates: Dict[int, Tuple[Dict, str]]) -> int:
+        """按账单ID原地更新账单字段和全文索引，整体替换明细和金额汇总（在调用方的事务中执行），返回明细条数"""
+        if not updates:
+            return 0
+        cursor.execute("CREATE TEMP TABLE IF NOT EXISTS replaced_bills (id INTEGER PRIMARY KEY)")
+        cursor.execute("DELETE FROM temp.replaced_bills")
+        cursor.executemany("INSERT INTO temp.replaced_bills VALUES (?)", [(bill_id,) for bill_id in updates])
+        cursor.execute(
+            """
+            INSERT INTO bills_fts (bills_fts, rowid, bill_number, user_name, vehicle_name)
+            SELECT 'delete', id, bill_number, user_name, vehicle_name FROM bills
+            WHERE id IN (SELECT id FROM temp.replaced_bills)
+            """
+        )
+        for table in ("bill_items", "bill_totals"):
+            cursor.execute(f"DELETE FROM {table} WHERE bill_id IN (SELECT id FROM temp.replaced_bills)")
+
+        cursor.executemany(
+            """
+            INSERT INTO employees (name, department, vehicle_name) VALUES (?, 'Unknown', ?)
+            ON CONFLICT (name, vehicle_name) DO NOTHING
+            """,
+            [(bill_data["user_name"], bill_data["vehicle_name"]) for bill_data, _ in updates.values()]
+        )
+        cursor.executemany(
+            "UPDATE bills SET bill_number = ?, date = ?, user_name = ?, vehicle_name = ? WHERE id = ?",
+            [(bill_data["bill_number"], bill_data["date"], bill_data["user_name"], bill_data["vehicle_name"], bill_id)
+             for bill_id, (bill_data, _) in updates.items()]
+        )
+        cursor.execute(
+            """
+            INSERT INTO bills_fts (rowid, bill_number, user_name, vehicle_name)
+            SELECT id, bill_number, user_name, vehicle_name FROM bills
+            WHERE id IN (SELECT id FROM temp.replaced_bills)
+            """
+        )
+        item_rows = [
+            (bill_id, item['item_name'], item['amount'], item['tax'], item['tax_rate'], item['total_amount'])
+            for bill_id, (bill_data, _) in updates.items() for item in bill_data["items"]
+        ]
+        cursor.executemany(
+            """
+            INSERT INTO bill_items (bill_id, item_name, amount, tax, tax_rate, total_amount)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT (bill_id, item_name, amount, tax, tax_rate, total_amount) DO NOTHING
+            """,
+            item_rows
+        )
+        terms = {('item_name', row[1]) for row in item_rows}
+        for bill_data, _ in updates.values():
+            terms.add(('user_name', bill_data["user_name"]))
+            terms.add(('vehicle_name', bill_data["vehicle_name"]))
+        self._index_terms(cursor, terms)
+        self._refresh_totals(cursor, updates)
+        return len(item_rows)
+
+    def prune_search_terms(self) -> int:
+        """删除 bills / bill_items 中已不再出现的输入提示取值（例如重新解析改正了的姓名、车型），返回删除数"""
+        with self.conn:
+            cursor = self.conn.cursor()
+            cursor.execute("CREATE TEMP TABLE IF NOT EXISTS stale_terms (id INTEGER PRIMARY KEY, value TEXT)")
+            cursor.execute("DELETE FROM temp.stale_terms")
+            cursor.execute(
+                """
+                INSERT INTO temp.stale_terms
+                SELECT id, value FROM search_terms WHERE (field, value) NOT IN (
+                    SELECT 'user_name', user_name FROM bills
+                    UNION SELECT 'vehicle_name', vehicle_name FROM bills
+                    UNION SELECT 'item_name', item_name FROM bill_items
+                )
+                """
+            )
+            cursor.execute(
+                "INSERT INTO search_terms_fts (search_terms_fts, rowid, value) "
+                "SELECT 'delete', id, value FROM temp.stale_terms"
+            )
+            cursor.execute("DELETE FROM search_terms WHERE id IN (SELECT id FROM temp.stale_terms)")
+            removed = cursor.rowcount
+        if removed:
+            logger.info(f"已删除 {removed} 个不再出现的输入提示取值")
+        return removed
+
     def get_all_bills(self):
         """获取所有账单"""
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            cursor.execute("""
-                SELECT b.id, b.bill_number, b.date, b.user_name, b.vehicle_name
-                FROM bills b
-            """)
-            return cursor.fetchall()
\ No newline at end of file
+        cursor = self.conn.cursor()
+        cursor.execute("""
+            SELECT b.id, b.bill_number, b.date, b.user_name, b.vehicle_name
+            FROM bills b
+        """)
+        return cursor.fetchall()
+
+    def get_manifest(self) -> Dict[str, Tuple[int, int, str, Optional[int]]]:
+        """获取已导入文件清单: file_path -> (file_size, mtime_ns, content_hash, bill_id)"""
+        cursor = self.conn.cursor()
+        cursor.execute("SELECT file_path, file_size, mtime_ns, content_hash, bill_id FROM ingest_manifest")
+        return {row[0]: tuple(row[1:]) for row in cursor.fetchall()}
+
+    def record_manifest(self, file_path: str, file_size: int, mtime_ns: int, content_hash: str, bill_id: Optional[int]):
+        """记录文件已导入及其对应的账单"""
+        self.record_manifest_many([(file_path, file_size, mtime_ns, content_hash, bill_id)])
+
+    def record_manifest_many(self, rows: List[Tuple[str, int, int, str, Optional[int]]]):
+        """批量记录导入清单: (file_path, file_size, mtime_ns, content_hash, bill_id)"""
+        with self.conn:
+            self.conn.executemany(
+                """
+                INSERT OR REPLACE INTO ingest_manifest (file_path, file_size, mtime_ns, content_hash, bill_id, ingested_at)
+                VALUES (?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+                """,
+                rows
+            )
+            logger.debug(f"文件清单已更新: {len(rows)} 条")
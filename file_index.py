@@ -0,0 +1,118 @@
+"""
+账单/合同文件目录的持久化索引
+
+目录列表保存在数据库的 file_index 表中，只有目录的修改时间变化时才重新扫描并增量更新表；
+查询在内存中完成：子串查询的结果按查询词缓存，账单号查询再用文件名里的数字串把完整匹配的文件排在前面
+"""
+import logging
+import os
+import re
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from db_manager import DBManager
+
+logger = logging.getLogger(__name__)
+
+_NUMBER = re.compile(r'\d+')
+
+
+class FileIndex:
+    def __init__(self, directory, db_path: str = "bills.db", db: Optional[DBManager] = None):
+        self.directory = Path(directory)
+        self.key = str(self.directory.resolve())
+        self.db = db or DBManager(db_path)
+        self._owns_db = db is None
+        self._mtime_ns: Optional[int] = None
+        self._names: List[str] = []
+        self._by_number: Dict[str, List[str]] = {}
+        self._by_text: Dict[str, List[str]] = {}
+        self._load()
+
+    def close(self):
+        if self._owns_db:
+            self.db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def _load(self):
+        """从数据库读取上次保存的目录列表"""
+        row = self.db.conn.execute(
+            "SELECT mtime_ns FROM file_index_dirs WHERE directory = ?", (self.key,)
+        ).fetchone()
+        self._mtime_ns = row[0] if row else None
+        names = [name for (name,) in self.db.conn.execute(
+            "SELECT file_name FROM file_index WHERE directory = ? ORDER BY file_name", (self.key,)
+        )]
+        self._set_names(names)
+
+    def _set_names(self, names: List[str]):
+        self._names = names
+        self._by_number = {}
+        for name in names:
+            for number in set(_NUMBER.findall(name)):
+                self._by_number.setdefault(number, []).append(name)
+        self._by_text = {}
+
+    def refresh(self, force: bool = False) -> bool:
+        """目录修改时间变化（或 force）时重新扫描，返回是否有更新"""
+        try:
+            mtime_ns = self.directory.stat().st_mtime_ns
+        except OSError as e:
+            logger.error(f"无法访问目录: {self.directory}, 错误: {str(e)}")
+            return False
+        if not force and mtime_ns == self._mtime_ns:
+            return False
+
+        current = {}
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                if entry.is_file():
+                    stat = entry.stat()
+                    current[entry.name] = (stat.st_size, stat.st_mtime_ns)
+        stored = {name: (size, mtime) for name, size, mtime in self.db.conn.execute(
+            "SELECT file_name, file_size, mtime_ns FROM file_index WHERE directory = ?", (self.key,)
+        )}
+        removed = [(self.key, name) for name in stored.keys() - current.keys()]
+        changed = [(self.key, name, *meta) for name, meta in current.items() if stored.get(name) != meta]
+        with self.db.conn:
+            self.db.conn.executemany("DELETE FROM file_index WHERE directory = ? AND file_name = ?", removed)
+            self.db.conn.executemany(
+                "INSERT OR REPLACE INTO file_index (directory, file_name, file_size, mtime_ns) VALUES (?, ?, ?, ?)",
+                changed
+            )
+            self.db.conn.execute(
+                "INSERT OR REPLACE INTO file_index_dirs (directory, mtime_ns) VALUES (?, ?)", (self.key, mtime_ns)
+            )
+        self._mtime_ns = mtime_ns
+        self._set_names(sorted(current))
+        logger.info(f"文件索引已更新: {self.directory}，共 {len(current)} 个文件，"
+                    f"新增/修改 {len(changed)} 个，删除 {len(removed)} 个")
+        return True
+
+    def _containing(self, text: str) -> List[str]:
+        if text not in self._by_text:
+            self._by_text[text] = [name for name in self._names if text in name]
+        return self._by_text[text]
+
+    def find_containing(self, text: str, suffix: str = "") -> List[Path]:
+        """文件名包含 text（且以 suffix 结尾）的所有文件，按文件名排序"""
+        self.refresh()
+        return [self.directory / name for name in self._containing(text) if name.endswith(suffix)]
+
+    def find_bill(self, bill_number: str, suffix: str = ".pdf") -> List[Path]:
+        """
+        文件名包含账单号的文件，与原来 os.listdir 加子串判断找到的文件相同；
+        账单号作为完整数字串出现的排在前面（查 1234 时先给 Rechnung_1234.pdf 而不是 Rechnung_12345.pdf），其余按文件名排序
+        """
+        self.refresh()
+        names = self._containing(bill_number)
+        exact = self._by_number.get(bill_number)
+        if exact:
+            seen = set(exact)
+            names = exact + [name for name in names if name not in seen]
+        return [self.directory / name for name in names if name.endswith(suffix)]
@@ -0,0 +1,281 @@
+"""
+IBOS 表单提交方式的公共接口
+
+FormSubmitter: start() 建立会话，submit(bill_info) 提交一张账单并返回是否成功（失败原因在 last_error），close() 结束会话。
+- WebFormFiller（WebFormFiller.py）：用 Selenium 驱动 Chrome 填写页面
+- HttpFormSubmitter：不开浏览器，在一个保持连接的 HTTP 会话上直接重放表单 POST。
+  登录状态来自一次浏览器登录导出的 Cookie（见 submission_engine.py --save-cookies），
+  隐藏字段（CSRF token 等）从表单页面读取，每次提交后从返回的页面更新
+两种方式都用 submit_error 按提交后的页面判断账单是否被接受，不只看页面有没有刷新
+"""
+import http.client
+import json
+import logging
+import socket
+from abc import ABC, abstractmethod
+from html.parser import HTMLParser
+from http.cookies import SimpleCookie
+from typing import Dict, Optional
+from urllib.parse import urlencode, urljoin, urlsplit
+
+logger = logging.getLogger(__name__)
+
+BACKENDS = ("browser", "http")
+
+# bill_info 的键 -> 表单输入框的 id
+FIELD_IDS = {
+    "bill_number": "bill_number_input_id",
+    "date": "date_input_id",
+    "user": "user_input_id",
+    "vehicle": "vehicle_input_id",
+    "department": "department_input_id",
+}
+# 金额（EA/EC）输入框，表单中有这些输入框且 bill_info 带有金额（见 ibos_payload.py）时才填写
+AMOUNT_FIELD_IDS = {
+    "net": "net_input_id",
+    "tax": "tax_input_id",
+    "gross": "gross_input_id",
+    "leasing_service_net": "leasing_service_net_input_id",
+    "leasing_service_tax": "leasing_service_tax_input_id",
+}
+SUBMIT_BUTTON_ID = "submit_button_id"
+# 提交后的结果提示元素 id；带有 ERROR_CLASS 类名的元素是错误提示
+RESULT_ID = "result"
+ERROR_CLASS = "error"
+# 跳转地址的路径中含有这个词时认为是登录页
+LOGIN_PATH_HINT = "login"
+
+
+class FormSubmitter(ABC):
+    last_error: Optional[str] = None  # 最近一次提交失败的原因
+
+    @abstractmethod
+    def start(self):
+        """建立会话；同一个实例可以连续提交多张账单"""
+
+    @abstractmethod
+    def submit(self, bill_info: Dict) -> bool:
+        """提交一张账单，返回是否成功"""
+
+    @abstractmethod
+    def close(self):
+        """结束会话"""
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+def load_cookies(path: str) -> Dict[str, str]:
+    """读取 Cookie 文件：Selenium get_cookies() 的列表，或 {名称: 值}"""
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    if isinstance(data, list):
+        return {cookie["name"]: cookie["value"] for cookie in data}
+    return dict(data)
+
+
+class _FormParser(HTMLParser):
+    """
+    找出包含提交按钮的表单：action、method、各输入框 id -> name / 值，以及隐藏字段的值；
+    同时记下结果提示、错误提示的文字和页面上有没有密码框（登录页）
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.forms = []
+        self.result = None
+        self.errors = []
+        self.login = False
+        self._form = None
+        self._capture = None  # 正在收集文字的提示元素 (标签, 文字片段, 是否错误, 是否结果)
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if self._capture is None:
+            is_error = ERROR_CLASS in (attrs.get("class") or "").split()
+            is_result = attrs.get("id") == RESULT_ID
+            if is_error or is_result:
+                self._capture = (tag, [], is_error, is_result)
+        if tag == "form":
+            self._form = {"action": attrs.get("action") or "", "method": (attrs.get("method") or "get").lower(),
+                          "names": {}, "values": {}, "hidden": {}, "has_submit": False}
+            self.forms.append(self._form)
+        elif tag == "input" and (attrs.get("type") or "").lower() == "password":
+            self.login = True
+        if self._form is not None and tag in ("input", "button", "select", "textarea"):
+            if attrs.get("id") == SUBMIT_BUTTON_ID:
+                self._form["has_submit"] = True
+            if attrs.get("id"):
+                self._form["values"][attrs["id"]] = attrs.get("value") or ""
+            if not attrs.get("name"):
+                return
+            if (attrs.get("type") or "").lower() == "hidden":
+                self._form["hidden"][attrs["name"]] = attrs.get("value") or ""
+            elif attrs.get("id"):
+                self._form["names"][attrs["id"]] = attrs["name"]
+
+    def handle_data(self, data):
+        if self._capture is not None:
+            self._capture[1].append(data)
+
+    def handle_endtag(self, tag):
+        if tag == "form":
+            self._form = None
+        if self._capture is not None and tag == self._capture[0]:
+            tag, parts, is_error, is_result = self._capture
+            text = " ".join("".join(parts).split())
+            if is_error:
+                self.errors.append(text or ERROR_CLASS)
+            if is_result:
+                self.result = text
+            self._capture = None
+
+
+def parse_page(html: str) -> Dict:
+    """解析页面: {form: 包含提交按钮的表单或 None, result: 结果提示文字或 None, errors: [错误提示], login: 是否登录页}"""
+    parser = _FormParser()
+    parser.feed(html)
+    form = next((form for form in parser.forms if form["has_submit"]), None)
+    return {"form": form, "result": parser.result, "errors": parser.errors, "login": parser.login}
+
+
+def parse_form(html: str) -> Optional[Dict]:
+    return parse_page(html)["form"]
+
+
+def submit_error(page: Dict, bill_number: str) -> Optional[str]:
+    """
+    根据提交后的页面（parse_page 的结果）判断账单是否被接受，返回失败原因，成功时为 None。
+    有结果提示且不是错误算成功；没有结果提示时要回到空白表单才算成功——
+    表单仍保留刚提交的账单号说明没有通过校验，既不是表单也没有结果（例如登录页）说明没有提交上
+    """
+    if page["errors"]:
+        return f"页面提示错误: {page['errors'][0]}"
+    if page["login"]:
+        return "跳转到了登录页，需要重新登录导出 Cookie"
+    if page["result"] is not None:
+        return None
+    form = page["form"]
+    if form is None:
+        return "提交后的页面既没有结果提示也不是表单"
+    if bill_number and form["values"].get(FIELD_IDS["bill_number"]) == bill_number:
+        return "表单没有被接受（仍保留提交的账单号）"
+    return None
+
+
+class HttpFormSubmitter(FormSubmitter):
+    def __init__(self, url: str, cookies: Optional[Dict[str, str]] = None, timeout: float = 10):
+        self.url = url
+        self.cookies = dict(cookies or {})
+        self.timeout = timeout
+        self.conn = None
+        self.form = None
+        self.last_error = None
+
+    def start(self):
+        if self.conn is not None:
+            return
+        parts = urlsplit(self.url)
+        connection_class = http.client.HTTPSConnection if parts.scheme == "https" else http.client.HTTPConnection
+        self.conn = connection_class(parts.netloc, timeout=self.timeout)
+        self.open_form()
+
+    def _request(self, method: str, url: str, body: Optional[str] = None):
+        """在保持的连接上发送请求，返回 (状态码, 响应头, 页面)；记录服务器设置的 Cookie"""
+        parts = urlsplit(url)
+        path = parts.path or "/"
+        if parts.query:
+            path += "?" + parts.query
+        headers = {"Connection": "keep-alive"}
+        if self.cookies:
+            headers["Cookie"] = "; ".join(f"{name}={value}" for name, value in self.cookies.items())
+        if body is not None:
+            headers["Content-Type"] = "application/x-www-form-urlencoded"
+        if self.conn.sock is None:
+            self.conn.connect()
+            # 请求很小，关闭 Nagle 算法，避免和服务器的延迟确认叠加出每次约 40ms 的等待
+            self.conn.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.conn.request(method, path, body=body, headers=headers)
+        response = self.conn.getresponse()
+        page = response.read().decode("utf-8", errors="replace")
+        for header in response.headers.get_all("Set-Cookie") or []:
+            cookie = SimpleCookie()
+            cookie.load(header)
+            self.cookies.update({name: morsel.value for name, morsel in cookie.items()})
+        return response.status, response.headers, page
+
+    def open_form(self):
+        """读取表单页面，取得提交地址、字段名和隐藏字段"""
+        status, _, page = self._request("GET", self.url)
+        form = parse_form(page) if status == 200 else None
+        if form is None:
+            raise ConnectionError(f"表单页面不可用（HTTP {status}），可能需要重新登录导出 Cookie")
+        self.form = form
+
+    def _check_response(self, action: str, status: int, headers, page: str, bill_number: str) -> Optional[str]:
+        """判断提交的响应，返回失败原因（成功时为 None），同时更新下次提交用的表单"""
+        self.form = None
+        if 300 <= status < 400:
+            # 提交后跳转（post/redirect/get）：跳到登录页说明登录已失效，否则读取跳转后的页面再判断
+            location = urljoin(action, headers.get("Location") or "")
+            if LOGIN_PATH_HINT in urlsplit(location).path.lower():
+                return f"跳转到了登录页 {location}，需要重新登录导出 Cookie"
+            status, _, page = self._request("GET", location)
+        result = parse_page(page)
+        if status >= 400:
+            # 隐藏字段可能已失效（例如 CSRF token 过期），下次提交前重新读取表单
+            return f"HTTP {status}" + (f": {result['errors'][0]}" if result["errors"] else "")
+        # 返回的页面通常还是表单，直接用其中新的隐藏字段，省去一次 GET；不是表单时下次提交前重新读取
+        self.form = result["form"]
+        return submit_error(result, bill_number)
+
+    def submit(self, bill_info: Dict) -> bool:
+        self.last_error = None
+        try:
+            if self.form is None:
+                self.open_form()
+            fields = dict(self.form["hidden"])
+            for key, element_id in FIELD_IDS.items():
+                fields[self.form["names"].get(element_id, key)] = bill_info[key]
+            for key, element_id in AMOUNT_FIELD_IDS.items():
+                if element_id in self.form["names"] and key in bill_info:
+                    fields[self.form["names"][element_id]] = f"{bill_info[key]:.2f}"
+            action = urljoin(self.url, self.form["action"])
+            if self.form["method"] == "post":
+                status, headers, page = self._request("POST", action, urlencode(fields))
+            else:
+                status, headers, page = self._request("GET", f"{action}?{urlencode(fields)}")
+
+            self.last_error = self._check_response(action, status, headers, page, bill_info["bill_number"])
+        except (OSError, http.client.HTTPException) as e:
+            self.last_error = str(e) or type(e).__name__
+            # 连接已断开（例如服务器关闭了空闲连接），下次提交时重新连接；这一张交给提交队列重试，不在这里重发
+            if self.conn is not None:
+                self.conn.close()
+            self.form = None
+
+        if self.last_error:
+            logger.error(f"提交账单 {bill_info.get('bill_number')} 失败: {self.last_error}")
+            return False
+        return True
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+
+def create_submitter(backend: str, url: str, timeout: float = 10, driver_path: str = "chromedriver",
+                     headless: bool = True, cookies: Optional[Dict[str, str]] = None) -> FormSubmitter:
+    """按名称创建提交方式：'browser'（Selenium）或 'http'"""
+    if backend == "http":
+        return HttpFormSubmitter(url, cookies=cookies, timeout=timeout)
+    if backend == "browser":
+        from WebFormFiller import WebFormFiller  # 只有真正用浏览器提交时才加载 selenium
+
+        return WebFormFiller(driver_path, url, timeout=timeout, headless=headless, cookies=cookies)
+    raise ValueError(f"未知的提交方式: {backend}")
@@ -0,0 +1,53 @@
+"""
+IBOS 提交内容
+
+一条 SQL 按集合取出账单、员工部门和金额汇总（bill_totals），每行直接是一份提交内容（payload），不再逐张查询。
+金额与查询界面（checkinfo.update_display）显示的一致：净额/税额/总额，以及租赁费和服务费的净额/税额（EA/EC）。
+日期转换为 YYYY-MM-DD
+"""
+import sqlite3
+from typing import Dict, Iterator, Sequence
+
+from bill_report import ISO_DATE
+
+# 提交内容的键，顺序与 PAYLOAD_SELECT 的列一致
+PAYLOAD_KEYS = ("bill_number", "date", "user", "vehicle", "department",
+                "net", "tax", "gross", "leasing_service_net", "leasing_service_tax")
+
+# 部门按姓名和车辆从员工表取；没有明细的账单金额为 0
+PAYLOAD_SELECT = f"""
+    SELECT bills.bill_number, {ISO_DATE}, bills.user_name, bills.vehicle_name,
+           COALESCE(employees.department, 'Unknown'),
+           ROUND(COALESCE(bill_totals.net, 0), 2), ROUND(COALESCE(bill_totals.tax, 0), 2),
+           ROUND(COALESCE(bill_totals.gross, 0), 2),
+           ROUND(COALESCE(bill_totals.leasing_service_net, 0), 2),
+           ROUND(COALESCE(bill_totals.leasing_service_tax, 0), 2)
+    FROM bills
+    LEFT JOIN employees ON employees.name = bills.user_name AND employees.vehicle_name = bills.vehicle_name
+    LEFT JOIN bill_totals ON bill_totals.bill_id = bills.id
+"""
+
+
+def payload(row: Sequence) -> Dict:
+    return dict(zip(PAYLOAD_KEYS, row))
+
+
+def iter_payloads(conn: sqlite3.Connection, statuses: Sequence[str] = ("pending",),
+                  batch_size: int = 1000) -> Iterator[Dict]:
+    """按提交状态逐批读出全部提交内容（一次查询，fetchmany 流式读取），按账单ID排序"""
+    placeholders = ", ".join("?" * len(statuses))
+    cursor = conn.execute(
+        f"""
+        {PAYLOAD_SELECT}
+        JOIN submissions ON submissions.bill_number = bills.bill_number
+        WHERE submissions.status IN ({placeholders})
+        ORDER BY bills.id
+        """,
+        tuple(statuses)
+    )
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            return
+        for row in rows:
+            yield payload(row)
@@ -1,13 +1,22 @@
-import pandas as pd
+from __future__ import annotations
+
 import sqlite3
 import argparse
+import hashlib
 import logging
 import re
 from pathlib import Path
+from typing import TYPE_CHECKING, Dict, Iterator, List, Tuple
+
+from db_manager import DBManager
+
+if TYPE_CHECKING:
+    import pandas as pd
 
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+COLUMNS = ["Namen", "Cost Center", "Vehicle Name"]
+
 
 class EmployeeImporter:
     def __init__(self, db_path="bills.db"):
@@ -17,8 +26,185 @@ class EmployeeImporter:
         """去掉部门信息中的数字"""
         return re.sub(r'\d+', '', str(department)).strip()
 
+    def prepare_rows(self, df: pd.DataFrame) -> pd.DataFrame:
+        """读取所需列并清洗"""
+        df = df[COLUMNS].copy()
+        df.dropna(subset=["Namen"], inplace=True)  # 移除空的姓名行
+        df["Cost Center"] = df["Cost Center"].apply(self.clean_department)
+        df["Vehicle Name"] = df["Vehicle Name"].fillna("")  # 填充空的车辆名称
+        return df
+
+    def file_digest(self, path: Path) -> str:
+        """计算文件内容的 SHA-256"""
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def iter_excel_chunks(self, excel_path: Path, chunk_size: int = 5000) -> Iterator[pd.DataFrame]:
+        """以只读模式逐行读取第一个工作表，每 chunk_size 行产出一个清洗后的 DataFrame"""
+        import pandas as pd
+        from openpyxl import load_workbook
+
+        workbook = load_workbook(excel_path, read_only=True, data_only=True)
+        try:
+            rows = workbook.worksheets[0].iter_rows(values_only=True)
+            header = list(next(rows, ()))
+            logger.info(f"Excel 文件列名: {header}")
+            missing = [column for column in COLUMNS if column not in header]
+            if missing:
+                raise KeyError(f"缺少列: {missing}")
+            positions = [header.index(column) for column in COLUMNS]
+            chunk = []
+            for row in rows:
+                chunk.append([row[i] if i < len(row) else None for i in positions])
+                if len(chunk) >= chunk_size:
+                    yield self.prepare_rows(pd.DataFrame(chunk, columns=COLUMNS))
+                    chunk = []
+            if chunk:
+                yield self.prepare_rows(pd.DataFrame(chunk, columns=COLUMNS))
+        finally:
+            workbook.close()
+
+    def import_incremental(self, excel_path: str, chunk_size: int = 5000):
+        """
+        增量导入：流式读取 Excel，只重新匹配自上次导入以来发生变化的姓名
+        匹配规则按姓名分组（是否唯一、该姓名的所有车辆），因此以姓名为单位记录指纹：
+        该姓名所有行指纹之和与行数。姓名的行有增删改，或数据库里新增了该姓名的员工时才重新匹配；
+        另外只有仍为 'Unknown' 的员工会被更新，所以读取时只保留这些姓名的行，内存与表格大小无关
+        """
+        import pandas as pd
+
+        excel_path = Path(excel_path)
+        if not excel_path.exists():
+            logger.error(f"Excel 文件不存在: {excel_path}")
+            return
+
+        try:
+            with DBManager(self.db_path) as db:
+                conn = db.conn
+                meta = dict(conn.execute("SELECT key, value FROM import_meta"))
+                last_max_id = int(meta.get("employees_max_id", 0))
+                max_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM employees").fetchone()[0]
+                file_hash = self.file_digest(excel_path)
+                if meta.get("employees_file_hash") == file_hash and max_id == last_max_id:
+                    logger.info("Excel 文件和员工表都没有变化，跳过导入")
+                    return
+
+                state = dict(conn.execute("SELECT name, fingerprint || ':' || row_count FROM employee_import_state"))
+                unknown_names = {name for (name,) in conn.execute(
+                    "SELECT DISTINCT name FROM employees WHERE department = 'Unknown'"
+                )}
+                new_employee_names = {name for (name,) in conn.execute(
+                    "SELECT DISTINCT name FROM employees WHERE id > ?", (last_max_id,)
+                )}
+
+                sums: Dict[str, int] = {}
+                counts: Dict[str, int] = {}
+                pending = []  # 姓名下仍有 'Unknown' 员工的行
+                for chunk in self.iter_excel_chunks(excel_path, chunk_size):
+                    keys = chunk["Namen"].astype(str)
+                    hashes = pd.util.hash_pandas_object(chunk.astype(str), index=False)
+                    for name, value in hashes.groupby(keys.values).sum().items():
+                        sums[name] = (sums.get(name, 0) + int(value)) % (1 << 64)
+                    for name, value in keys.value_counts().items():
+                        counts[name] = counts.get(name, 0) + int(value)
+                    pending.append(chunk[chunk["Namen"].isin(unknown_names)])
+
+                current = {name: f"{sums[name]:016x}:{counts[name]}" for name in sums}
+                changed = {name for name, fingerprint in current.items() if state.get(name) != fingerprint}
+                removed = set(state) - set(current)
+                dirty = changed | {str(name) for name in new_employee_names}
+                logger.info(f"共 {len(current)} 个姓名，变化 {len(changed)} 个，删除 {len(removed)} 个，"
+                            f"新增员工涉及 {len(new_employee_names)} 个")
+
+                df = pd.concat(pending) if pending else pd.DataFrame(columns=COLUMNS)
+                df = df[df["Namen"].astype(str).isin(dirty)]
+                names = df["Namen"].unique().tolist()
+                # 完整匹配要看该姓名的所有车辆（包括已有部门的），所以这里不按部门过滤
+                employees = pd.read_sql_query("SELECT id, name, vehicle_name FROM employees ORDER BY id", conn)
+                updates = self.match_departments(df, employees[employees["name"].isin(names)])
+
+                # 更新与导入状态在同一个事务中提交，中途失败时下次会完整重试
+                with conn:
+                    cursor = conn.cursor()
+                    cursor.executemany("""
+                        UPDATE employees
+                        SET department = ?
+                        WHERE id = ?
+                        AND department = 'Unknown'
+                    """, updates)
+                    update_count = cursor.rowcount
+                    cursor.executemany(
+                        "INSERT OR REPLACE INTO employee_import_state (name, fingerprint, row_count) VALUES (?, ?, ?)",
+                        [(name, *current[name].split(':')) for name in changed]
+                    )
+                    cursor.executemany("DELETE FROM employee_import_state WHERE name = ?", [(name,) for name in removed])
+                    cursor.executemany(
+                        "INSERT OR REPLACE INTO import_meta (key, value) VALUES (?, ?)",
+                        [("employees_max_id", str(max_id)), ("employees_file_hash", file_hash)]
+                    )
+                logger.info(f"增量更新完成，重新匹配 {len(df)} 行，共更新了 {update_count} 条记录")
+
+        except Exception as e:
+            logger.error(f"导入失败: {str(e)}")
+
+    def match_departments(self, df: pd.DataFrame, employees: pd.DataFrame) -> List[Tuple[str, int]]:
+        """
+        按 Excel 行计算要更新的员工，返回按 Excel 行顺序排列的 (department, employee_id)
+        df: Namen / Cost Center / Vehicle Name 三列；employees: 数据库中的 id / name / vehicle_name
+        规则：
+        1. Excel 里 name 只出现一次：该姓名的所有员工
+        2. 否则按车辆匹配，依次尝试：完整匹配 -> 数据库 vehicle_name 是 Excel name 的一部分
+           -> Excel vehicle_name 是数据库 vehicle_name 的一部分，后两种只取第一个候选
+        """
+        import pandas as pd
+
+        df = df.reset_index(drop=True)
+        df["row"] = df.index
+        unique = df.groupby("Namen")["Namen"].transform("size") == 1
+
+        # **Excel 里 name 只出现一次（唯一）**
+        unique_pairs = df[unique].merge(employees, left_on="Namen", right_on="name")
+        logger.debug(f"唯一姓名匹配: {len(unique_pairs)} 条")
+
+        # **Excel 里 name 不是唯一的，需要使用 vehicle_name 匹配**
+        cand = df[~unique].merge(employees, left_on="Namen", right_on="name")
+        excel_vehicles = cand["Vehicle Name"].tolist()
+        db_vehicles = cand["vehicle_name"].tolist()
+
+        # **情况 1：完整匹配**
+        exact = cand["Vehicle Name"] == cand["vehicle_name"]
+        has_exact = exact.groupby(cand["row"]).transform("any")
+
+        # **情况 2：数据库 vehicle_name 是 Excel name 的一部分**
+        in_name = pd.Series(
+            [isinstance(v, str) and v in str(n) for v, n in zip(db_vehicles, cand["Namen"].tolist())],
+            index=cand.index, dtype=bool
+        ) & ~has_exact
+        has_in_name = in_name.groupby(cand["row"]).transform("any")
+
+        # **情况 3：Excel vehicle_name 是数据库 name 的一部分**
+        in_vehicle = pd.Series(
+            [isinstance(d, str) and bool(v) and str(v) in d for v, d in zip(excel_vehicles, db_vehicles)],
+            index=cand.index, dtype=bool
+        ) & ~has_exact & ~has_in_name
+
+        vehicle_pairs = pd.concat([
+            cand[exact],
+            cand[in_name].drop_duplicates("row"),  # 只更新一次
+            cand[in_vehicle].drop_duplicates("row"),
+        ])
+        logger.debug(f"车辆匹配: {len(vehicle_pairs)} 条")
+
+        pairs = pd.concat([unique_pairs, vehicle_pairs]).sort_values(["row", "id"], kind="stable")
+        return list(zip(pairs["Cost Center"].tolist(), pairs["id"].astype(int).tolist()))
+
     def import_from_excel(self, excel_path: str):
         """从 Excel 读取 name 和 cost center，并存入 employees 表"""
+        import pandas as pd
+
         excel_path = Path(excel_path)
         if not excel_path.exists():
             logger.error(f"Excel 文件不存在: {excel_path}")
@@ -30,111 +216,44 @@ class EmployeeImporter:
             # 打印所有列名，帮助调试
             logger.info(f"Excel 文件列名: {df.columns.tolist()}")
 
-            # 读取所需列
-            df = df[["Namen", "Cost Center", "Vehicle Name"]].copy()
-            df.dropna(subset=["Namen"], inplace=True)  # 移除空的姓名行
-            df["Cost Center"] = df["Cost Center"].apply(self.clean_department)
-            df["Vehicle Name"] = df["Vehicle Name"].fillna("")  # 填充空的车辆名称
-
-            # 统计 Excel 里每个 name 出现的次数
-            name_counts = df["Namen"].value_counts().to_dict()
+            df = self.prepare_rows(df)
 
             with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-
-                # **获取数据库中的所有员工和车辆信息**
-                cursor.execute("""
-                    SELECT name, vehicle_name FROM employees
-                """)
-                db_employee_vehicles = cursor.fetchall()  
-                
-                # 构建字典：name -> 可能的 vehicle_name
-                db_employee_dict = {}  
-                for name, vehicle in db_employee_vehicles:
-                    if name not in db_employee_dict:
-                        db_employee_dict[name] = set()
-                    db_employee_dict[name].add(vehicle)
-
-                update_count = 0
-                for _, row in df.iterrows():
-                    name = row["Namen"]
-                    department = row["Cost Center"]
-                    vehicle_name = row["Vehicle Name"]
-
-                    # **Excel 里 name 只出现一次（唯一）**
-                    if name_counts[name] == 1:
-                        cursor.execute("""
-                            UPDATE employees 
-                            SET department = ? 
-                            WHERE name = ? 
-                            AND department = 'Unknown'
-                        """, (department, name))
-                        update_count += cursor.rowcount
-                        logger.info(f"唯一姓名更新: {name} -> {department}")
-
-                    else:
-                        # **Excel 里 name 不是唯一的，需要使用 vehicle_name 匹配**
-                        possible_vehicles = db_employee_dict.get(name, set())
-                        updated = False
-
-                        # **情况 1：完整匹配**
-                        if vehicle_name in possible_vehicles:
-                            cursor.execute("""
-                                UPDATE employees 
-                                SET department = ? 
-                                WHERE name = ? 
-                                AND vehicle_name = ? 
-                                AND department = 'Unknown'
-                            """, (department, name, vehicle_name))
-                            update_count += cursor.rowcount
-                            updated = True
-
-                        else:
-                            # **情况 2：数据库 vehicle_name 是 Excel name 的一部分**
-                            for db_vehicle in possible_vehicles:
-                                if isinstance(db_vehicle, str) and db_vehicle in str(name):
-                                    cursor.execute("""
-                                        UPDATE employees 
-                                        SET department = ? 
-                                        WHERE name = ? 
-                                        AND vehicle_name = ? 
-                                        AND department = 'Unknown'
-                                    """, (department, name, db_vehicle))
-                                    update_count += cursor.rowcount
-                                    updated = True
-                                    break  # 只更新一次
-
-                            # **情况 3：Excel vehicle_name 是数据库 name 的一部分**
-                            if not updated:
-                                for db_vehicle in possible_vehicles:
-                                    if isinstance(db_vehicle, str) and vehicle_name and str(vehicle_name) in db_vehicle:
-                                        cursor.execute("""
-                                            UPDATE employees 
-                                            SET department = ? 
-                                            WHERE name = ? 
-                                            AND vehicle_name = ? 
-                                            AND department = 'Unknown'
-                                        """, (department, name, db_vehicle))
-                                        update_count += cursor.rowcount
-                                        updated = True
-                                        break  # 只更新一次
-
-                        if updated:
-                            logger.info(f"匹配车辆更新: {name} ({vehicle_name}) -> {department}")
+                # **获取数据库中的所有员工和车辆信息**（按 id 排序，多个候选车辆时取最早录入的）
+                employees = pd.read_sql_query(
+                    "SELECT id, name, vehicle_name FROM employees ORDER BY id", conn
+                )
+                updates = self.match_departments(df, employees)
 
+                # 按 Excel 行顺序在一个事务中执行，与逐行 UPDATE 相同：同一员工只有第一次匹配生效
+                cursor = conn.cursor()
+                cursor.executemany("""
+                    UPDATE employees
+                    SET department = ?
+                    WHERE id = ?
+                    AND department = 'Unknown'
+                """, updates)
+                update_count = cursor.rowcount
                 conn.commit()
                 logger.info(f"更新完成，共更新了 {update_count} 条记录")
+            conn.close()
 
         except Exception as e:
             logger.error(f"导入失败: {str(e)}")
 
-def main():
+def main(argv=None):
     parser = argparse.ArgumentParser(description="从 Excel 导入员工信息到数据库")
     parser.add_argument("excel_path", help="Excel 文件路径")
-    args = parser.parse_args()
+    parser.add_argument("-i", "--incremental", action="store_true", help="流式读取并只处理上次导入以来变化的行")
+    parser.add_argument("--chunk-size", type=int, default=5000, help="增量模式每次读取的行数 (默认: 5000)")
+    args = parser.parse_args(argv)
 
+    logging.basicConfig(level=logging.INFO)
     importer = EmployeeImporter()
-    importer.import_from_excel(args.excel_path)
+    if args.incremental:
+        importer.import_incremental(args.excel_path, args.chunk_size)
+    else:
+        importer.import_from_excel(args.excel_path)
 
 if __name__ == "__main__":
     main()
@@ -1,51 +1,110 @@
 from pdf_extractor import PDFExtractor
 from db_manager import DBManager
+from pipeline import BillRecord, build_ingest_pipeline
+from text_cache import DEFAULT_MAX_BYTES, TextCache, reparse
+import metrics
 import logging
 import argparse
 from pathlib import Path
+from typing import Dict
 
 def setup_argparser() -> argparse.ArgumentParser:
     parser = argparse.ArgumentParser(description='PDF账单数据提取工具')
     parser.add_argument('bills_path', nargs='?', default='Bills', help='账单文件夹路径 (默认: Bills)')
     parser.add_argument('-v', '--verbose', action='store_true', help='显示详细日志')
     parser.add_argument('-d', '--details', action='store_true', help='显示详细提取信息')
+    parser.add_argument('-w', '--workers', type=int, default=1, help='并行提取的进程数 (默认: 1, 即串行处理)')
+    parser.add_argument('--commit-size', type=int, default=500, help='每个事务写入的账单数 (默认: 500)')
+    parser.add_argument('--buffer', type=int, default=0, help='流水线阶段间有界队列长度，>0 时各阶段在独立线程中并行 (默认: 0)')
+    parser.add_argument('--async', dest='use_async', action='store_true', help='用 asyncio 并发预读文件，读取与解析重叠进行（适合网络共享目录）')
+    parser.add_argument('--prefetch', type=int, default=8, help='--async 时同时读入内存的文件数上限 (默认: 8)')
+    parser.add_argument('--layout', action='store_true', help='只读取版面中已知区域的文本，缺少锚点时回退到整页文本')
+    parser.add_argument('-t', '--timings', action='store_true', help='显示每个文件的提取耗时明细')
+    parser.add_argument('-s', '--stats', action='store_true', help='结束时显示流水线各阶段的吞吐量')
+    parser.add_argument('-f', '--force', action='store_true', help='忽略导入清单，重新处理所有文件')
+    parser.add_argument('--reparse', action='store_true', help='不打开PDF，用文本缓存和当前解析规则重建账单和明细')
+    parser.add_argument('--text-cache-mb', type=int, default=DEFAULT_MAX_BYTES // (1024 * 1024), help='提取文本缓存的压缩后大小上限，0 表示不缓存 (默认: 256)')
+    parser.add_argument('-m', '--metrics', choices=['table', 'prometheus'], help='记录提取/解析/验证/写库的调用次数与耗时直方图，结束时按所选格式输出')
+    parser.add_argument('--metrics-file', help='把 --metrics 的结果写入该文件而不是标准输出')
+    parser.add_argument('--profile', metavar='FILE', help='用 cProfile 运行并把统计结果写入 FILE（python -m pstats FILE 查看）')
     return parser
 
-def process_pdf(pdf_path: Path, extractor: PDFExtractor, db: DBManager, show_details: bool, verbose: bool):
-    """ 处理单个 PDF 账单 """
-    logging.debug(f"处理文件: {pdf_path.name}...")
-    bill_data = extractor.extract_bill_data(str(pdf_path))
+def format_timings(timings: Dict) -> str:
+    """ 格式化提取耗时明细（毫秒） """
+    parts = [f"{key}={value * 1000:.1f}ms" for key, value in timings.items() if key != 'mode']
+    return f"[{timings.get('mode')}] " + ' '.join(parts)
 
-    if bill_data and extractor.validate_data(bill_data):
-        bill_id = db.add_bill(bill_data, pdf_path.name)
-        for item in bill_data["items"]:
-            db.add_bill_item(bill_id, item)
-        logging.debug(f"账单 {bill_data['bill_number']} ({pdf_path.name}) 已存入数据库")
+def report_result(record: BillRecord, show_details: bool, verbose: bool, show_timings: bool):
+    """ 输出单个文件的处理结果 """
+    if record.known_bill_id is not None:
+        logging.info(f"{record.pdf_path.name} 内容已导入过，跳过")
+        return
+    if show_timings:
+        print(f"{record.pdf_path.name}: {format_timings(record.timings)}")
+    if record.valid:
+        logging.debug(f"账单 {record.bill_data['bill_number']} ({record.pdf_path.name}) 已存入数据库")
         if show_details:
-            print(f"\n{pdf_path.name} 提取成功:\n{bill_data}\n")
+            print(f"\n{record.pdf_path.name} 提取成功:\n{record.bill_data}\n")
         elif verbose:
-            print(f"\n{bill_data['bill_number']} {pdf_path.name} 提取成功\n")
+            print(f"\n{record.bill_data['bill_number']} {record.pdf_path.name} 提取成功\n")
     else:
-        logging.error(f"账单提取失败: {pdf_path.name}")
+        logging.error(f"账单提取失败: {record.pdf_path.name}")
 
-def main():
+def main(argv=None):
     parser = setup_argparser()
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
 
     logging.basicConfig(level=logging.WARNING)  # 默认日志级别
     if args.verbose:
         logging.getLogger().setLevel(logging.INFO)
 
-    extractor = PDFExtractor()
-    db = DBManager()
-
     bills_path = Path(args.bills_path)
-    if not bills_path.exists() or not bills_path.is_dir():
+    if not args.reparse and (not bills_path.exists() or not bills_path.is_dir()):
         logging.error(f"账单文件夹路径无效: {bills_path}")
         return
 
-    for pdf_file in bills_path.glob("*.pdf"):
-        process_pdf(pdf_file, extractor, db, args.details, args.verbose)
+    if args.metrics:
+        metrics.enable()
+    try:
+        if args.profile:
+            import cProfile
+            profiler = cProfile.Profile()
+            try:
+                profiler.runcall(run, args, bills_path)
+            finally:
+                profiler.dump_stats(args.profile)
+                logging.info(f"性能分析结果已写入 {args.profile}")
+        else:
+            run(args, bills_path)
+    finally:
+        if args.metrics:
+            metrics.dump(args.metrics, args.metrics_file)
+
+def run(args, bills_path: Path):
+    with DBManager(commit_size=args.commit_size) as db:
+        text_cache = TextCache(db, args.text_cache_mb * 1024 * 1024) if args.text_cache_mb > 0 or args.reparse else None
+        if args.reparse:
+            succeeded, failed = reparse(db, text_cache, PDFExtractor(), args.commit_size)
+            print(f"从文本缓存重新解析: 成功 {succeeded} 张, 失败 {failed} 张")
+            return
+        if args.use_async:
+            import asyncio
+            from async_ingest import ingest_async
+            asyncio.run(ingest_async(
+                bills_path, db, PDFExtractor(layout_mode=args.layout),
+                workers=args.workers, prefetch=args.prefetch, force=args.force,
+                on_record=lambda record: report_result(record, args.details, args.verbose, args.timings),
+                text_cache=text_cache
+            ))
+            return
+        pipeline = build_ingest_pipeline(
+            bills_path, db, PDFExtractor(layout_mode=args.layout),
+            workers=args.workers, force=args.force, buffer_size=args.buffer, text_cache=text_cache
+        )
+        for record in pipeline:
+            report_result(record, args.details, args.verbose, args.timings)
+        if args.stats:
+            print(pipeline.format_stats())
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,137 @@
+"""
+导入流程的轻量计时与计数
+
+用 @timed("名称") 包装的函数在启用后记录调用次数（按结果分为 ok / empty / error）和耗时直方图；
+未启用时包装函数只多一次属性判断。结果可以输出为表格或 Prometheus 文本格式
+"""
+import bisect
+import functools
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+# 直方图桶上限（秒）
+BUCKETS = (0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)  # 最后一个为 +Inf
+        self.sum = 0.0
+        self.max = 0.0
+
+    @property
+    def count(self) -> int:
+        return sum(self.counts)
+
+    def observe(self, seconds: float):
+        self.counts[bisect.bisect_left(BUCKETS, seconds)] += 1
+        self.sum += seconds
+        self.max = max(self.max, seconds)
+
+    def quantile(self, q: float) -> float:
+        """按桶上限估计分位数（不超过实际最大值）"""
+        target = q * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if count and seen >= target:
+                return min(BUCKETS[index], self.max) if index < len(BUCKETS) else self.max
+        return 0.0
+
+
+class Registry:
+    def __init__(self):
+        self.enabled = False
+        self._lock = threading.Lock()
+        self._histograms: Dict[str, Histogram] = {}
+        self._outcomes: Dict[Tuple[str, str], int] = {}
+
+    def record(self, name: str, seconds: float, outcome: str = 'ok'):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._histograms.setdefault(name, Histogram()).observe(seconds)
+            self._outcomes[(name, outcome)] = self._outcomes.get((name, outcome), 0) + 1
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+            self._outcomes.clear()
+
+    def format_table(self) -> str:
+        header = (f"{'operation':20s} {'calls':>8s} {'empty':>6s} {'error':>6s} {'total s':>9s} "
+                  f"{'mean ms':>9s} {'p50 ms':>8s} {'p95 ms':>8s} {'max ms':>8s}")
+        lines = [header, '-' * len(header)]
+        with self._lock:
+            for name, hist in sorted(self._histograms.items()):
+                lines.append(
+                    f"{name:20s} {hist.count:8d} {self._outcomes.get((name, 'empty'), 0):6d} "
+                    f"{self._outcomes.get((name, 'error'), 0):6d} {hist.sum:9.3f} "
+                    f"{hist.sum / hist.count * 1000:9.3f} {hist.quantile(0.5) * 1000:8.2f} "
+                    f"{hist.quantile(0.95) * 1000:8.2f} {hist.max * 1000:8.2f}"
+                )
+        return '\n'.join(lines)
+
+    def format_prometheus(self, prefix: str = 'ibos') -> str:
+        lines = [
+            f"# HELP {prefix}_operation_calls_total Calls by outcome (empty: returned None/False).",
+            f"# TYPE {prefix}_operation_calls_total counter",
+        ]
+        with self._lock:
+            for (name, outcome), count in sorted(self._outcomes.items()):
+                lines.append(f'{prefix}_operation_calls_total{{operation="{name}",outcome="{outcome}"}} {count}')
+            lines += [
+                f"# HELP {prefix}_operation_duration_seconds Call latency.",
+                f"# TYPE {prefix}_operation_duration_seconds histogram",
+            ]
+            for name, hist in sorted(self._histograms.items()):
+                cumulative = 0
+                for bound, count in zip(BUCKETS + ('+Inf',), hist.counts):
+                    cumulative += count
+                    lines.append(f'{prefix}_operation_duration_seconds_bucket'
+                                 f'{{operation="{name}",le="{bound}"}} {cumulative}')
+                lines.append(f'{prefix}_operation_duration_seconds_sum{{operation="{name}"}} {hist.sum}')
+                lines.append(f'{prefix}_operation_duration_seconds_count{{operation="{name}"}} {hist.count}')
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+
+def enable():
+    REGISTRY.enabled = True
+
+
+def record(name: str, seconds: float, outcome: str = 'ok'):
+    """直接记录一次耗时，用于无法包装的调用（例如子进程中完成、只返回了耗时的提取）"""
+    REGISTRY.record(name, seconds, outcome)
+
+
+def timed(name: str, check_result: bool = True):
+    """装饰器：启用后记录被包装函数的耗时和结果；check_result 为 False 时不把返回 None 记为 empty"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not REGISTRY.enabled:
+                return func(*args, **kwargs)
+            start = time.perf_counter()
+            outcome = 'error'
+            try:
+                result = func(*args, **kwargs)
+                outcome = 'empty' if check_result and (result is None or result is False) else 'ok'
+                return result
+            finally:
+                REGISTRY.record(name, time.perf_counter() - start, outcome)
+        return wrapper
+    return decorator
+
+
+def dump(fmt: str = 'table', path: Optional[str] = None):
+    """输出到文件（path）或标准输出"""
+    text = REGISTRY.format_prometheus() if fmt == 'prometheus' else REGISTRY.format_table()
+    if path:
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(text)
+    else:
+        print(text)
@@ -1,44 +1,169 @@
-import pdfplumber
+import io
 import logging
-from typing import Dict, Optional
+import time
+import metrics
+from typing import Dict, List, Optional, Tuple
 from pathlib import Path
 
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+def _page_chars(pdf, page) -> List[Tuple[float, float, float, float, str]]:
+    """用 pdfminer 解释页面，返回字符 (x0, top, x1, bottom, text)，坐标与 pdfplumber 一致"""
+    from pdfminer.converter import PDFPageAggregator
+    from pdfminer.layout import LTChar, LTContainer
+    from pdfminer.pdfinterp import PDFPageInterpreter
+
+    device = PDFPageAggregator(pdf.rsrcmgr, laparams=None)
+    PDFPageInterpreter(pdf.rsrcmgr, device).process_page(page.page_obj)
+    chars = []
+    stack = [device.get_result()]
+    while stack:
+        for obj in stack.pop():
+            if isinstance(obj, LTChar):
+                chars.append((obj.x0, page.height - obj.y1, obj.x1, page.height - obj.y0, obj.get_text()))
+            elif isinstance(obj, LTContainer):
+                stack.append(obj)
+    return chars
+
+def _center_in(char: Tuple, bbox) -> bool:
+    """字符的中心点是否落在 bbox (x0, top, x1, bottom) 内"""
+    x = (char[0] + char[2]) / 2
+    y = (char[1] + char[3]) / 2
+    return bbox[0] <= x < bbox[2] and bbox[1] <= y < bbox[3]
+
+def _chars_to_text(chars: List[Tuple], x_tolerance: float = 3, y_tolerance: float = 3) -> str:
+    """按 pdfplumber extract_text 的默认规则把字符拼成文本: top 相近的归为一行，间距超过 x_tolerance 插入空格"""
+    lines = []
+    for char in sorted(chars, key=lambda c: c[1]):
+        if lines and char[1] - lines[-1][-1][1] <= y_tolerance:
+            lines[-1].append(char)
+        else:
+            lines.append([char])
+    text_lines = []
+    for line in lines:
+        words = []
+        last = None
+        for char in sorted(line, key=lambda c: c[0]):
+            if char[4].isspace():
+                last = None
+                continue
+            if last is None or char[0] > last[2] + x_tolerance:
+                words.append(char[4])
+            else:
+                words[-1] += char[4]
+            last = char
+        text_lines.append(' '.join(words))
+    return '\n'.join(text_lines)
+
 class PDFExtractor:
+    # Oberhaching 账单版面中需要读取的区域: (名称, 页码, (x0, top, x1, bottom) 占页面宽高的比例, 锚点)
+    # 锚点为若干组候选文字，每组至少出现一个才认为该区域裁剪正确，否则回退到整页文本
+    LAYOUT_REGIONS = [
+        ('header', 0, (0.0, 0.0, 1.0, 0.35), (('Rechnung:', 'Gutschrift:'), ('Oberhaching,',))),
+        ('contract', 1, (0.0, 0.0, 1.0, 0.35), (('Vertragsnummer',),)),
+        ('items', 1, (0.0, 0.35, 1.0, 0.90), (('Rechnung exkl. MwSt.', 'Gesamtsumme Gutschrift exkl. MwSt.'), ('Total MwSt.',))),
+    ]
+
+    def __init__(self, layout_mode: bool = False, regions: Optional[List] = None):
+        self.layout_mode = layout_mode
+        self.regions = regions or self.LAYOUT_REGIONS
+        self.last_timings: Dict = {}  # 最近一次提取的耗时明细（秒）
+        self.last_text: Optional[str] = None  # 最近一次从PDF取出的文本（提取失败时为 None），供文本缓存使用
+
+    @metrics.timed('extract_bill_data')
     def extract_bill_data(self, pdf_path: str) -> Optional[Dict]:
         """
         从PDF账单中提取关键信息
         """
-        try:
-            pdf_path = Path(pdf_path)
-            if not pdf_path.exists():
-                logger.error(f"PDF文件不存在: {pdf_path}")
-                return None
+        pdf_path = Path(pdf_path)
+        if not pdf_path.exists():
+            self.last_timings = {'mode': 'full'}
+            self.last_text = None
+            logger.error(f"PDF文件不存在: {pdf_path}")
+            return None
+        return self._extract(pdf_path)
+
+    @metrics.timed('extract_bill_data')
+    def extract_bill_data_from_bytes(self, data: bytes) -> Optional[Dict]:
+        """
+        从已读入内存的PDF内容中提取账单信息，文件读取可以由调用方提前并发完成
+        """
+        return self._extract(io.BytesIO(data))
 
-            with pdfplumber.open(pdf_path) as pdf:
-                text = '\n'.join(page.extract_text() for page in pdf.pages[:2])
-                logger.debug(f"提取的文本内容: {text[:500]}")  # 记录前500个字符的文本内容
-                extracted_data = self._parse_bill_text(text)
-                if not extracted_data:
-                    logger.error("解析账单文本失败")
-                    return None
-
-                bill_data = {
-                    'bill_number': extracted_data['bill_number'],
-                    'date': extracted_data['date'],
-                    'user_name': extracted_data['driver_name'],
-                    'vehicle_name': extracted_data['vehicle_name'],
-                    'items': extracted_data['items']
-                }
-                logger.debug(f"提取的账单数据: {bill_data}")
+    def _extract(self, source) -> Optional[Dict]:
+        """打开 source（路径或二进制流）并解析账单，耗时明细记录在 last_timings"""
+        import pdfplumber  # 只在真正打开PDF时加载，只解析缓存文本或查询时不需要
+
+        timings = {'mode': 'full'}
+        self.last_timings = timings
+        self.last_text = None
+        start = time.perf_counter()
+        try:
+            with pdfplumber.open(source) as pdf:
+                timings['open'] = time.perf_counter() - start
+                text = None
+                if self.layout_mode:
+                    text = self._extract_layout_text(pdf, timings)
+                    timings['mode'] = 'layout' if text is not None else 'fallback'
+                if text is None:
+                    text_start = time.perf_counter()
+                    text = '\n'.join(page.extract_text() for page in pdf.pages[:2])
+                    timings['full_text'] = time.perf_counter() - text_start
+                self.last_text = text
+                parse_start = time.perf_counter()
+                bill_data = self.extract_from_text(text)
+                timings['parse'] = time.perf_counter() - parse_start
                 return bill_data
 
         except Exception as e:
             logger.error(f"处理PDF时出错: {str(e)}")
             return None
+        finally:
+            timings['total'] = time.perf_counter() - start
+
+    def extract_from_text(self, text: str) -> Optional[Dict]:
+        """从已取出的账单文本（例如文本缓存中的）解析账单信息，不需要打开PDF"""
+        logger.debug(f"提取的文本内容: {text[:500]}")  # 记录前500个字符的文本内容
+        extracted_data = self._parse_bill_text(text)
+        if not extracted_data:
+            logger.error("解析账单文本失败")
+            return None
+
+        bill_data = {
+            'bill_number': extracted_data['bill_number'],
+            'date': extracted_data['date'],
+            'user_name': extracted_data['driver_name'],
+            'vehicle_name': extracted_data['vehicle_name'],
+            'items': extracted_data['items']
+        }
+        logger.debug(f"提取的账单数据: {bill_data}")
+        return bill_data
+
+    def _extract_layout_text(self, pdf, timings: Dict) -> Optional[str]:
+        """
+        只读取版面中已知区域内的字符，跳过 pdfplumber 对整页字符的对象转换和文本布局
+        直接用 pdfminer 解释页面，按字符中心点归入区域后再按行拼接；任一区域缺少锚点时返回 None
+        """
+        page_chars = {}
+        texts = []
+        for name, page_index, (x0, top, x1, bottom), anchors in self.regions:
+            region_start = time.perf_counter()
+            if page_index >= len(pdf.pages):
+                logger.debug(f"区域 {name} 所在页不存在，回退到整页文本")
+                return None
+            page = pdf.pages[page_index]
+            if page_index not in page_chars:
+                page_chars[page_index] = _page_chars(pdf, page)
+            bbox = (x0 * page.width, top * page.height, x1 * page.width, bottom * page.height)
+            text = _chars_to_text([c for c in page_chars[page_index] if _center_in(c, bbox)])
+            timings[f'region_{name}'] = time.perf_counter() - region_start
+            if not all(any(anchor in text for anchor in group) for group in anchors):
+                logger.debug(f"区域 {name} 缺少锚点，回退到整页文本")
+                return None
+            texts.append(text)
+        return '\n'.join(texts)
 
+    @metrics.timed('parse_bill_text')
     def _parse_bill_text(self, text: str) -> Dict:
         """
         解析账单文本内容
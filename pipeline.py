@@ -0,0 +1,348 @@
+"""
+账单导入流水线: discover -> extract -> validate -> normalize -> write
+
+每个阶段都是生成器函数（输入记录迭代器，输出记录迭代器），逐条拉取处理，内存占用与目录大小无关；
+阶段可以按名称替换（例如换成多进程提取或测试用的假实现），buffer_size > 0 时相邻阶段之间
+通过有界队列在独立线程中并行运行。数据库只在最后的 write 阶段（调用方线程）中写入
+"""
+import hashlib
+import logging
+import queue
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import metrics
+from db_manager import DBManager
+from pdf_extractor import PDFExtractor
+from text_cache import TextCache
+
+logger = logging.getLogger(__name__)
+
+# 文件指纹: (文件大小, 修改时间ns, 内容哈希)
+Fingerprint = Tuple[int, int, str]
+
+# 子进程中复用的提取器实例（由 _init_worker 创建）
+_worker_extractor: Optional[PDFExtractor] = None
+
+
+@dataclass
+class BillRecord:
+    """流水线中流动的单个账单文件"""
+    pdf_path: Path
+    fingerprint: Optional[Fingerprint] = None
+    known_bill_id: Optional[int] = None  # 内容已以其他路径导入过，只需更新导入清单
+    bill_data: Optional[Dict] = None
+    timings: Dict = field(default_factory=dict)
+    text: Optional[str] = None  # 提取出的原始文本，写入文本缓存
+    valid: bool = False
+    bill_id: Optional[int] = None
+
+
+Stage = Callable[[Iterator[BillRecord]], Iterator[BillRecord]]
+
+
+class StageStats:
+    """单个阶段的计数器: 输出条数与阶段自身耗时（不含等待上游的时间）"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.count = 0
+        self.seconds = 0.0
+
+    @property
+    def rate(self) -> float:
+        return self.count / self.seconds if self.seconds > 0 else 0.0
+
+    def __repr__(self):
+        return f"{self.name}: {self.count} 条, {self.seconds:.3f}s, {self.rate:.1f} 条/s"
+
+
+class _Meter:
+    """包装迭代器，累计 next() 的耗时与产出条数"""
+
+    def __init__(self, iterator: Iterable):
+        self.iterator = iter(iterator)
+        self.count = 0
+        self.seconds = 0.0
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        start = time.perf_counter()
+        try:
+            item = next(self.iterator)
+        finally:
+            self.seconds += time.perf_counter() - start
+        self.count += 1
+        return item
+
+
+_DONE = object()
+
+
+def _buffered(iterator: Iterable, maxsize: int) -> Iterator:
+    """在后台线程中运行上游，通过有界队列交给下游；上游异常会在下游重新抛出"""
+    items = queue.Queue(maxsize=maxsize)
+    stopped = threading.Event()
+
+    def produce():
+        try:
+            for item in iterator:
+                while not stopped.is_set():
+                    try:
+                        items.put(item, timeout=0.1)
+                        break
+                    except queue.Full:
+                        continue
+                if stopped.is_set():
+                    return
+            items.put(_DONE)
+        except BaseException as e:
+            items.put(e)
+
+    threading.Thread(target=produce, daemon=True).start()
+    try:
+        while True:
+            item = items.get()
+            if item is _DONE:
+                return
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+    finally:
+        stopped.set()
+
+
+class IngestPipeline:
+    """由数据源和若干命名阶段组成的流式流水线"""
+
+    def __init__(self, source: Iterable[BillRecord], stages: List[Tuple[str, Stage]], buffer_size: int = 0):
+        self.source = source
+        self.stages = list(stages)
+        self.buffer_size = buffer_size
+        self.stats: Dict[str, StageStats] = {}
+
+    def replace(self, name: str, stage: Stage):
+        """按名称替换阶段"""
+        for index, (stage_name, _) in enumerate(self.stages):
+            if stage_name == name:
+                self.stages[index] = (name, stage)
+                return
+        raise KeyError(f"未知的流水线阶段: {name}")
+
+    def __iter__(self) -> Iterator[BillRecord]:
+        self.stats = {'discover': StageStats('discover')}
+        meters = [('discover', None, _Meter(self.source))]
+        stream = meters[0][2]
+        for name, stage in self.stages:
+            self.stats[name] = StageStats(name)
+            upstream = _Meter(_buffered(stream, self.buffer_size) if self.buffer_size > 0 else stream)
+            stream = _Meter(stage(upstream))
+            meters.append((name, upstream, stream))
+        try:
+            yield from stream
+        finally:
+            for name, upstream, output in meters:
+                self.stats[name].count = output.count
+                self.stats[name].seconds = output.seconds - (upstream.seconds if upstream else 0.0)
+
+    def run(self) -> Dict[str, StageStats]:
+        """运行到结束，返回各阶段计数器"""
+        for _ in self:
+            pass
+        return self.stats
+
+    def format_stats(self) -> str:
+        return '\n'.join(repr(stats) for stats in self.stats.values())
+
+
+def file_digest(pdf_path: Path) -> str:
+    """ 计算文件内容的 SHA-256 """
+    digest = hashlib.sha256()
+    with open(pdf_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def discover(pdf_files: Iterable[Path], manifest: Optional[Dict] = None) -> Iterator[BillRecord]:
+    """
+    对照导入清单筛选需要处理的文件
+    大小和修改时间都没变的文件直接跳过，不会被打开；
+    只有元数据变化时才计算内容哈希，内容未变（或已以其他路径导入）的文件只更新清单
+    """
+    manifest = manifest or {}
+    known_hashes = {entry[2]: entry[3] for entry in manifest.values()}
+    selected = 0
+    skipped = 0
+    for pdf_path in pdf_files:
+        stat = pdf_path.stat()
+        entry = manifest.get(str(pdf_path.resolve()))
+        if entry and entry[0] == stat.st_size and entry[1] == stat.st_mtime_ns:
+            skipped += 1
+            continue
+        content_hash = file_digest(pdf_path)
+        record = BillRecord(pdf_path, (stat.st_size, stat.st_mtime_ns, content_hash))
+        if content_hash in known_hashes:
+            record.known_bill_id = known_hashes[content_hash]
+            skipped += 1
+        else:
+            selected += 1
+        yield record
+    logger.info(f"共 {selected + skipped} 个文件，跳过未变化的 {skipped} 个，待处理 {selected} 个")
+
+
+def extract(records: Iterator[BillRecord], extractor: PDFExtractor) -> Iterator[BillRecord]:
+    """单进程逐个提取"""
+    for record in records:
+        if record.known_bill_id is None:
+            logger.debug(f"处理文件: {record.pdf_path.name}...")
+            record.bill_data = extractor.extract_bill_data(str(record.pdf_path))
+            record.timings = extractor.last_timings
+            record.text = extractor.last_text
+        yield record
+
+
+def _init_worker(layout_mode: bool = False):
+    """ 子进程初始化：每个进程只创建一次提取器 """
+    global _worker_extractor
+    _worker_extractor = PDFExtractor(layout_mode=layout_mode)
+
+
+def _extract_in_worker(pdf_path: Path) -> Tuple[Optional[Dict], Dict, Optional[str]]:
+    """ 在子进程中提取账单，不接触数据库 """
+    logger.debug(f"处理文件: {pdf_path.name}...")
+    bill_data = _worker_extractor.extract_bill_data(str(pdf_path))
+    return bill_data, _worker_extractor.last_timings, _worker_extractor.last_text
+
+
+def _extract_bytes_in_worker(data: bytes) -> Tuple[Optional[Dict], Dict, Optional[str]]:
+    """ 在子进程中从内存中的PDF内容提取账单 """
+    bill_data = _worker_extractor.extract_bill_data_from_bytes(data)
+    return bill_data, _worker_extractor.last_timings, _worker_extractor.last_text
+
+
+def parallel_extract(records: Iterator[BillRecord], workers: int, layout_mode: bool = False,
+                     window: Optional[int] = None) -> Iterator[BillRecord]:
+    """
+    多进程提取，按输入顺序产出结果，因此写入顺序与串行处理完全一致
+    同时在途的文件数不超过 window，避免一次性提交整个目录
+    """
+    from concurrent.futures import ProcessPoolExecutor  # 只有多进程模式才加载 multiprocessing
+
+    window = window or workers * 4
+    pending = deque()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(layout_mode,)) as pool:
+        for record in records:
+            future = pool.submit(_extract_in_worker, record.pdf_path) if record.known_bill_id is None else None
+            pending.append((record, future))
+            while len(pending) >= window:
+                yield _collect(*pending.popleft())
+        while pending:
+            yield _collect(*pending.popleft())
+
+
+def _collect(record: BillRecord, future) -> BillRecord:
+    if future is not None:
+        record.bill_data, record.timings, record.text = future.result()
+        record_worker_timings(record)
+    return record
+
+
+def record_worker_timings(record: BillRecord):
+    """子进程中的计时不会回到主进程，按返回的耗时明细补记提取和解析"""
+    if 'total' in record.timings:
+        metrics.record('extract_bill_data', record.timings['total'], 'ok' if record.bill_data else 'empty')
+    if 'parse' in record.timings:
+        metrics.record('parse_bill_text', record.timings['parse'])
+
+
+def validate(records: Iterator[BillRecord], extractor: PDFExtractor) -> Iterator[BillRecord]:
+    """验证提取结果"""
+    for record in records:
+        record.valid = bool(record.bill_data) and extractor.validate_data(record.bill_data)
+        yield record
+
+
+def normalize(records: Iterator[BillRecord]) -> Iterator[BillRecord]:
+    """只保留写库所需的字段，替换后的提取阶段带出的额外字段不会进入写入阶段"""
+    for record in records:
+        if record.valid:
+            bill_data = record.bill_data
+            record.bill_data = {
+                'bill_number': bill_data['bill_number'],
+                'date': bill_data['date'],
+                'user_name': bill_data['user_name'],
+                'vehicle_name': bill_data['vehicle_name'],
+                'items': [
+                    {key: item[key] for key in ('tax_rate', 'item_name', 'amount', 'tax', 'total_amount')}
+                    for item in bill_data['items']
+                ]
+            }
+        yield record
+
+
+def write_batch(db: DBManager, batch: List[BillRecord], text_cache: Optional[TextCache] = None):
+    """在一个事务中写入一批记录的账单并更新导入清单，回填每条记录的 bill_id；提取出的文本写入文本缓存"""
+    valid = [record for record in batch if record.valid]
+    bill_ids = db.bulk_ingest([(record.bill_data, record.pdf_path.name) for record in valid], commit_size=len(valid) or None)
+    for record, bill_id in zip(valid, bill_ids):
+        record.bill_id = bill_id
+    for record in batch:
+        if record.known_bill_id is not None:
+            record.bill_id = record.known_bill_id
+    db.record_manifest_many([
+        (str(record.pdf_path.resolve()), *record.fingerprint, record.bill_id)
+        for record in batch if record.fingerprint and record.bill_id is not None
+    ])
+    if text_cache is not None:
+        # 解析失败的文本也缓存，修正解析规则后可以直接重新解析
+        text_cache.put_many([
+            (record.fingerprint[2], record.timings.get('mode', 'full'), record.text)
+            for record in batch if record.fingerprint and record.text is not None
+        ])
+        for record in batch:
+            record.text = None
+
+
+def write(records: Iterator[BillRecord], db: DBManager, commit_size: Optional[int] = None,
+          text_cache: Optional[TextCache] = None) -> Iterator[BillRecord]:
+    """
+    按批写入数据库并记录导入清单，每批提交后再依次产出该批的记录
+    未通过验证的记录不写库，原样向下游产出
+    """
+    commit_size = commit_size or db.commit_size
+    batch = []
+    for record in records:
+        batch.append(record)
+        if len(batch) >= commit_size:
+            write_batch(db, batch, text_cache)
+            yield from batch
+            batch = []
+    if batch:
+        write_batch(db, batch, text_cache)
+        yield from batch
+
+
+def build_ingest_pipeline(bills_path: Path, db: DBManager, extractor: Optional[PDFExtractor] = None,
+                          workers: int = 1, force: bool = False, buffer_size: int = 0,
+                          commit_size: Optional[int] = None, text_cache: Optional[TextCache] = None) -> IngestPipeline:
+    """按默认阶段组装导入流水线；workers > 1 时使用多进程提取阶段"""
+    extractor = extractor or PDFExtractor()
+    manifest = None if force else db.get_manifest()
+    source = discover(Path(bills_path).glob("*.pdf"), manifest)
+    if workers > 1:
+        extract_stage = lambda records: parallel_extract(records, workers, extractor.layout_mode)
+    else:
+        extract_stage = lambda records: extract(records, extractor)
+    return IngestPipeline(source, [
+        ('extract', extract_stage),
+        ('validate', lambda records: validate(records, extractor)),
+        ('normalize', normalize),
+        ('write', lambda records: write(records, db, commit_size, text_cache)),
+    ], buffer_size=buffer_size)
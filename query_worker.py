@@ -0,0 +1,100 @@
+"""
+Tk 界面的后台数据库查询
+
+查询在单独的工作线程中用它自己的长连接执行，结果放入队列，由主线程通过 root.after 定时取回并回调，
+主线程不再直接访问数据库，慢查询时窗口不会卡住
+"""
+import logging
+import queue
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+logger = logging.getLogger(__name__)
+
+# 有未完成的查询时，主线程检查结果队列的间隔（毫秒）
+POLL_INTERVAL_MS = 10
+
+
+class QueryWorker:
+    def __init__(self, root, db_path: str):
+        self.root = root
+        self.db_path = db_path
+        self._jobs: queue.Queue = queue.Queue()
+        self._results: queue.Queue = queue.Queue()
+        self._pending = 0
+        self._polling = False
+        self._thread = threading.Thread(target=self._run, name="db-query", daemon=True)
+        self._thread.start()
+
+    def submit(self, job: Callable[[sqlite3.Connection], Any], on_done: Callable[[Any], None],
+               on_error: Optional[Callable[[Exception], None]] = None):
+        """在工作线程中执行 job(conn)，完成后在主线程中调用 on_done(结果) 或 on_error(异常)"""
+        self._pending += 1
+        self._jobs.put((job, on_done, on_error))
+        if not self._polling:
+            self._polling = True
+            self.root.after(POLL_INTERVAL_MS, self._poll)
+
+    def stop(self):
+        self._jobs.put(None)
+
+    def _run(self):
+        conn = sqlite3.connect(self.db_path)
+        try:
+            while True:
+                task = self._jobs.get()
+                if task is None:
+                    return
+                job, on_done, on_error = task
+                try:
+                    self._results.put((on_done, job(conn), None, on_error))
+                except Exception as e:
+                    logger.exception(f"后台查询失败: {e}")
+                    self._results.put((on_done, None, e, on_error))
+        finally:
+            conn.close()
+
+    def _poll(self):
+        """在主线程中取回已完成的查询结果并回调"""
+        while True:
+            try:
+                on_done, result, error, on_error = self._results.get_nowait()
+            except queue.Empty:
+                break
+            self._pending -= 1
+            if error is None:
+                on_done(result)
+            elif on_error is not None:
+                on_error(error)
+        if self._pending > 0:
+            self.root.after(POLL_INTERVAL_MS, self._poll)
+        else:
+            self._polling = False
+
+
+class DataVersionCache:
+    """
+    LRU 缓存，只在工作线程中使用
+    PRAGMA data_version 在其他连接提交写入后会变化，此时整个缓存失效
+    """
+
+    def __init__(self, maxsize: int = 128):
+        self.maxsize = maxsize
+        self._items: OrderedDict = OrderedDict()
+        self._version = None
+
+    def get(self, conn: sqlite3.Connection, key: Hashable, loader: Callable[[], Any]) -> Any:
+        version = conn.execute("PRAGMA data_version").fetchone()[0]
+        if version != self._version:
+            self._items.clear()
+            self._version = version
+        if key in self._items:
+            self._items.move_to_end(key)
+            return self._items[key]
+        value = loader()
+        self._items[key] = value
+        if len(self._items) > self.maxsize:
+            self._items.popitem(last=False)
+        return value
@@ -0,0 +1,258 @@
+"""
+并行的 IBOS 表单批量提交
+
+N 个工作线程各自持有一个长期存在的提交会话，依次从队列取账单提交。提交方式见 form_submitter.py：
+browser 每个会话一个浏览器（WebFormFiller），只在线程开始时启动一次，提交后等待页面条件而不是固定等待；
+http 每个会话一条保持的 HTTP 连接，直接提交表单。
+run_queue 从 submissions 表（见 submission_queue.py）按批领取待提交的账单并记录结果，
+只有主线程读写数据库，中断后重新运行只会提交尚未完成的账单
+"""
+import logging
+import queue
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+
+from form_submitter import BACKENDS, FormSubmitter, create_submitter, load_cookies
+from ibos_payload import PAYLOAD_SELECT, iter_payloads, payload
+from submission_queue import SubmissionQueue
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class SubmitStats:
+    submitted: List[str] = field(default_factory=list)
+    failed: List[str] = field(default_factory=list)
+    retried: int = 0
+    sessions: int = 0
+    seconds: float = 0.0
+
+    def summary(self) -> str:
+        seconds = self.seconds or 1e-9
+        return (f"提交 {len(self.submitted)} 张账单，失败 {len(self.failed)} 张，重试 {self.retried} 次，"
+                f"{self.sessions} 个会话，用时 {self.seconds:.2f}s，{len(self.submitted) / seconds:.2f} 张/s")
+
+
+def iter_bills(db_path: str, bill_numbers: Optional[Iterable[str]] = None) -> Iterator[Dict]:
+    """从数据库逐条读取账单的提交内容（不看提交状态），可以只取指定账单号"""
+    conn = sqlite3.connect(db_path)
+    try:
+        sql = PAYLOAD_SELECT
+        if bill_numbers is not None:
+            conn.execute("CREATE TEMP TABLE wanted (bill_number TEXT PRIMARY KEY)")
+            conn.executemany("INSERT OR IGNORE INTO temp.wanted VALUES (?)", ((n,) for n in bill_numbers))
+            sql += " WHERE bills.bill_number IN (SELECT bill_number FROM temp.wanted)"
+        for row in conn.execute(sql + " ORDER BY bills.id"):
+            yield payload(row)
+    finally:
+        conn.close()
+
+
+class SubmissionEngine:
+    def __init__(self, url: str, sessions: int = 4, backend: str = "browser", timeout: float = 10,
+                 driver_path: str = "chromedriver", headless: bool = True, cookies: Optional[Dict[str, str]] = None,
+                 submitter_factory: Optional[Callable[[], FormSubmitter]] = None):
+        self.url = url
+        self.sessions = sessions
+        # 每个会话调用一次，创建自己的 FormSubmitter
+        self.submitter_factory = submitter_factory or (
+            lambda: create_submitter(backend, url, timeout=timeout, driver_path=driver_path,
+                                     headless=headless, cookies=cookies)
+        )
+
+    def _worker(self, work: queue.Queue, results: queue.Queue):
+        """从 work 取账单提交，把 (账单号, 错误或 None) 放入 results；取到 None 时结束"""
+        submitter = self.submitter_factory()
+        try:
+            submitter.start()
+        except Exception as e:
+            logger.error(f"启动提交会话失败: {e}")
+            submitter.close()
+            return
+        try:
+            while True:
+                bill_info = work.get()
+                if bill_info is None:
+                    return
+                try:
+                    ok = submitter.submit(bill_info)
+                    error = None if ok else (submitter.last_error or "提交失败")
+                except Exception as e:
+                    error = str(e) or type(e).__name__
+                results.put((bill_info["bill_number"], error))
+        finally:
+            submitter.close()
+
+    def _start(self, count: int, work: queue.Queue, results: queue.Queue) -> List[threading.Thread]:
+        threads = [threading.Thread(target=self._worker, args=(work, results), name=f"ibos-{n}")
+                   for n in range(count)]
+        for thread in threads:
+            thread.start()
+        return threads
+
+    def run(self, bills: Iterable[Dict]) -> SubmitStats:
+        """并行提交一组账单（不记录提交状态）；会话启动失败时，剩余账单由其他会话继续提交"""
+        stats = SubmitStats()
+        start = time.perf_counter()
+        work: queue.Queue = queue.Queue()
+        results: queue.Queue = queue.Queue()
+        for bill_info in bills:
+            work.put(bill_info)
+        stats.sessions = min(self.sessions, work.qsize())
+        for _ in range(stats.sessions):
+            work.put(None)
+        for thread in self._start(stats.sessions, work, results):
+            thread.join()
+        while not results.empty():
+            bill_number, error = results.get_nowait()
+            (stats.failed if error else stats.submitted).append(bill_number)
+        # 所有会话都没能启动时，队列中剩下的账单记为失败
+        while not work.empty():
+            bill_info = work.get_nowait()
+            if bill_info is not None:
+                stats.failed.append(bill_info["bill_number"])
+        stats.seconds = time.perf_counter() - start
+        return stats
+
+    @staticmethod
+    def _record(submissions: SubmissionQueue, stats: SubmitStats, bill_number: str, error: Optional[str]):
+        if error is None:
+            submissions.mark_done([bill_number])
+            stats.submitted.append(bill_number)
+        elif submissions.mark_failed(bill_number, error):
+            stats.retried += 1
+        else:
+            stats.failed.append(bill_number)
+
+    def run_queue(self, submissions: SubmissionQueue, batch_size: Optional[int] = None,
+                  wait_retries: bool = True) -> SubmitStats:
+        """
+        从提交队列领取账单并行提交，结果逐张写回；领取的账单保持在 batch_size 张左右，会话不会空等。
+        wait_retries 为 True 时等到退避中的账单也处理完（成功或达到最大次数）才返回
+        """
+        batch_size = batch_size or self.sessions * 4
+        stats = SubmitStats(sessions=self.sessions)
+        start = time.perf_counter()
+        work: queue.Queue = queue.Queue()
+        results: queue.Queue = queue.Queue()
+        threads = self._start(self.sessions, work, results)
+        outstanding = 0
+        try:
+            while True:
+                if outstanding < batch_size:
+                    for bill_info in submissions.claim(batch_size - outstanding):
+                        work.put(bill_info)
+                        outstanding += 1
+                if outstanding == 0:
+                    due_in = submissions.next_due_in() if wait_retries else None
+                    if due_in is None:
+                        break
+                    time.sleep(min(due_in, 1.0))
+                    continue
+                try:
+                    bill_number, error = results.get(timeout=1.0)
+                except queue.Empty:
+                    if not any(thread.is_alive() for thread in threads):
+                        logger.error("没有可用的提交会话，停止提交")
+                        break
+                    continue
+                outstanding -= 1
+                self._record(submissions, stats, bill_number, error)
+        finally:
+            # 领取后还没开始提交的放回队列（例如 Ctrl+C 中断时），各会话只完成手上正在提交的一张
+            unsent = []
+            while not work.empty():
+                unsent.append(work.get_nowait()["bill_number"])
+            submissions.release(unsent)
+            for _ in threads:
+                work.put(None)
+            for thread in threads:
+                thread.join()
+            while not results.empty():
+                self._record(submissions, stats, *results.get_nowait())
+        stats.seconds = time.perf_counter() - start
+        return stats
+
+
+def save_cookies(driver_path: str, url: str, path: str):
+    """在可见的浏览器中打开表单页，等用户登录后导出 Cookie"""
+    import json
+
+    from selenium import webdriver
+    from selenium.webdriver.chrome.service import Service
+
+    driver = webdriver.Chrome(service=Service(driver_path))
+    try:
+        driver.get(url)
+        input("请在浏览器中登录，打开表单页面后按回车...")
+        cookies = driver.get_cookies()
+    finally:
+        driver.quit()
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(cookies, f, ensure_ascii=False, indent=2)
+    print(f"已保存 {len(cookies)} 个 Cookie 到 {path}")
+
+
+def main(argv=None):
+    import argparse
+
+    from db_manager import DBManager
+
+    parser = argparse.ArgumentParser(description="把数据库中尚未提交的账单批量提交到 IBOS 表单")
+    parser.add_argument("url", nargs="?", help="表单页面地址")
+    parser.add_argument("--backend", choices=BACKENDS, default="browser",
+                        help="提交方式：browser 用 Chrome 填写页面，http 直接提交表单 (默认: browser)")
+    parser.add_argument("--cookies", help="登录后导出的 Cookie 文件（JSON），两种提交方式都会带上")
+    parser.add_argument("--save-cookies", metavar="FILE",
+                        help="打开浏览器，手动登录后按回车，把 Cookie 保存到 FILE 后退出")
+    parser.add_argument("--driver", default="chromedriver", help="chromedriver 路径 (默认: chromedriver)")
+    parser.add_argument("--db", default="bills.db", help="数据库路径 (默认: bills.db)")
+    parser.add_argument("-n", "--sessions", type=int, default=4, help="并行的提交会话数 (默认: 4)")
+    parser.add_argument("--timeout", type=float, default=10, help="等待页面条件的超时秒数 (默认: 10)")
+    parser.add_argument("--show-browser", action="store_true", help="显示浏览器窗口（默认无头模式）")
+    parser.add_argument("--max-attempts", type=int, default=5, help="每张账单最多提交次数 (默认: 5)")
+    parser.add_argument("--retry-delay", type=float, default=2.0, help="第一次重试前等待的秒数，之后每次翻倍 (默认: 2)")
+    parser.add_argument("--no-wait", action="store_true", help="不等待退避中的重试，留到下次运行")
+    parser.add_argument("--retry-failed", action="store_true", help="把已达到最大次数的账单重新排队")
+    parser.add_argument("--recover", action="store_true",
+                        help="上次运行中断时正在提交的账单立即重新排队（默认等租约到期，确认没有其他进程在提交时使用）")
+    parser.add_argument("--status", action="store_true", help="只显示提交状态")
+    parser.add_argument("--payloads", action="store_true", help="把待提交账单的提交内容按行输出为 JSON，不提交")
+    args = parser.parse_args(argv)
+    if not (args.status or args.payloads) and not args.url:
+        parser.error("需要表单页面地址")
+
+    logging.basicConfig(level=logging.INFO)
+    if args.save_cookies:
+        save_cookies(args.driver, args.url, args.save_cookies)
+        return
+    cookies = load_cookies(args.cookies) if args.cookies else None
+    with DBManager(args.db) as db:
+        submissions = SubmissionQueue(db, max_attempts=args.max_attempts, base_delay=args.retry_delay)
+        added = submissions.enqueue_new()
+        if added:
+            logger.info(f"新加入提交队列 {added} 张账单")
+        if args.recover:
+            logger.info(f"重新排队 {submissions.recover()} 张中断时正在提交的账单")
+        if args.retry_failed:
+            logger.info(f"重新排队 {submissions.retry_failed()} 张失败的账单")
+        if args.payloads:
+            import json
+
+            for bill_info in iter_payloads(db.conn):
+                print(json.dumps(bill_info, ensure_ascii=False))
+            return
+        if not args.status:
+            engine = SubmissionEngine(args.url, args.sessions, args.backend, args.timeout, driver_path=args.driver,
+                                      headless=not args.show_browser, cookies=cookies)
+            print(engine.run_queue(submissions, wait_retries=not args.no_wait).summary())
+        print("  ".join(f"{status}: {count}" for status, count in submissions.counts().items()))
+        for bill_number, attempts, error in submissions.failures():
+            print(f"失败 {bill_number}（{attempts} 次）: {error}")
+
+
+if __name__ == "__main__":
+    main()
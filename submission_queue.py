@@ -0,0 +1,159 @@
+"""
+IBOS 提交状态和待提交队列
+
+每张账单在 submissions 表中有一行状态：pending（待提交）-> in_flight（已领取，正在提交）-> done / failed。
+领取时给 in_flight 设一个租约，进程中途中断后，租约到期的账单会被重新领取，已经 done 的账单不会再提交；
+提交失败按指数退避重新排队，达到最大次数后记为 failed（--retry-failed 可以重新排队）。
+中断时正在提交的账单无法确认 IBOS 是否已收到，重新领取后可能会再提交一次
+"""
+import logging
+import time
+from typing import Dict, Iterable, List, Optional
+
+from db_manager import DBManager
+from ibos_payload import PAYLOAD_SELECT, payload
+
+logger = logging.getLogger(__name__)
+
+STATUSES = ("pending", "in_flight", "done", "failed")
+
+
+class SubmissionQueue:
+    def __init__(self, db: DBManager, max_attempts: int = 5, base_delay: float = 2.0,
+                 max_delay: float = 300.0, lease_seconds: float = 300.0):
+        self.db = db
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.lease_seconds = lease_seconds
+
+    def enqueue_new(self) -> int:
+        """把还没有提交状态的账单加入队列，返回新加入的数量"""
+        with self.db.conn:
+            cursor = self.db.conn.execute(
+                "INSERT OR IGNORE INTO submissions (bill_number, updated_at) SELECT bill_number, ? FROM bills",
+                (time.time(),)
+            )
+        return cursor.rowcount
+
+    def claim(self, limit: int) -> List[Dict]:
+        """
+        领取最多 limit 张到期的账单（待提交的，或租约已过期的 in_flight），标记为 in_flight 并计一次尝试，
+        返回提交内容（见 ibos_payload.py）。领取在一条 UPDATE 语句中完成，多个进程同时领取也不会拿到同一张
+        """
+        now = time.time()
+        with self.db.conn:
+            rows = self.db.conn.execute(
+                """
+                UPDATE submissions
+                SET status = 'in_flight', attempts = attempts + 1, next_attempt_at = ?, updated_at = ?
+                WHERE bill_number IN (
+                    SELECT bill_number FROM submissions
+                    WHERE status IN ('pending', 'in_flight') AND next_attempt_at <= ?
+                    ORDER BY next_attempt_at
+                    LIMIT ?
+                )
+                RETURNING bill_number
+                """,
+                (now + self.lease_seconds, now, now, limit)
+            ).fetchall()
+        if not rows:
+            return []
+        bill_numbers = [row[0] for row in rows]
+        placeholders = ", ".join("?" * len(bill_numbers))
+        found = {
+            row[0]: payload(row)
+            for row in self.db.conn.execute(f"{PAYLOAD_SELECT} WHERE bills.bill_number IN ({placeholders})",
+                                            bill_numbers)
+        }
+        missing = [bill_number for bill_number in bill_numbers if bill_number not in found]
+        for bill_number in missing:
+            # 账单已被删除（例如重新解析后账单号变了），不再提交
+            self._set_failed(bill_number, "账单不存在")
+        return [found[bill_number] for bill_number in bill_numbers if bill_number in found]
+
+    def mark_done(self, bill_numbers: Iterable[str]):
+        now = time.time()
+        with self.db.conn:
+            self.db.conn.executemany(
+                "UPDATE submissions SET status = 'done', last_error = NULL, updated_at = ? WHERE bill_number = ?",
+                [(now, bill_number) for bill_number in bill_numbers]
+            )
+
+    def mark_failed(self, bill_number: str, error: str) -> bool:
+        """记录一次失败；未达到最大次数时按指数退避重新排队，返回是否还会重试"""
+        row = self.db.conn.execute("SELECT attempts FROM submissions WHERE bill_number = ?",
+                                   (bill_number,)).fetchone()
+        attempts = row[0] if row else self.max_attempts
+        if attempts >= self.max_attempts:
+            self._set_failed(bill_number, error)
+            logger.error(f"账单 {bill_number} 提交 {attempts} 次均失败: {error}")
+            return False
+        delay = min(self.max_delay, self.base_delay * 2 ** (attempts - 1))
+        now = time.time()
+        with self.db.conn:
+            self.db.conn.execute(
+                """
+                UPDATE submissions SET status = 'pending', last_error = ?, next_attempt_at = ?, updated_at = ?
+                WHERE bill_number = ?
+                """,
+                (error, now + delay, now, bill_number)
+            )
+        logger.warning(f"账单 {bill_number} 第 {attempts} 次提交失败，{delay:.0f}s 后重试: {error}")
+        return True
+
+    def _set_failed(self, bill_number: str, error: str):
+        with self.db.conn:
+            self.db.conn.execute(
+                "UPDATE submissions SET status = 'failed', last_error = ?, updated_at = ? WHERE bill_number = ?",
+                (error, time.time(), bill_number)
+            )
+
+    def release(self, bill_numbers: Iterable[str]):
+        """把领取后没有提交的账单放回队列，不计这次尝试"""
+        with self.db.conn:
+            self.db.conn.executemany(
+                """
+                UPDATE submissions SET status = 'pending', attempts = MAX(attempts - 1, 0), next_attempt_at = 0
+                WHERE bill_number = ? AND status = 'in_flight'
+                """,
+                [(bill_number,) for bill_number in bill_numbers]
+            )
+
+    def recover(self) -> int:
+        """不等租约到期，立即把 in_flight 的账单放回队列（确认没有其他进程在提交时使用），返回数量"""
+        with self.db.conn:
+            cursor = self.db.conn.execute(
+                "UPDATE submissions SET status = 'pending', next_attempt_at = 0, updated_at = ? "
+                "WHERE status = 'in_flight'",
+                (time.time(),)
+            )
+        return cursor.rowcount
+
+    def retry_failed(self) -> int:
+        """把 failed 的账单重新排队，尝试次数清零，返回数量"""
+        with self.db.conn:
+            cursor = self.db.conn.execute(
+                "UPDATE submissions SET status = 'pending', attempts = 0, next_attempt_at = 0, updated_at = ? "
+                "WHERE status = 'failed'",
+                (time.time(),)
+            )
+        return cursor.rowcount
+
+    def next_due_in(self) -> Optional[float]:
+        """距下一张等待重试的账单可以领取还有多少秒；没有 pending 的账单时为 None（其他进程领取的不算）"""
+        row = self.db.conn.execute(
+            "SELECT MIN(next_attempt_at) FROM submissions WHERE status = 'pending'"
+        ).fetchone()
+        return None if row[0] is None else max(0.0, row[0] - time.time())
+
+    def counts(self) -> Dict[str, int]:
+        counts = dict.fromkeys(STATUSES, 0)
+        counts.update(self.db.conn.execute("SELECT status, COUNT(*) FROM submissions GROUP BY status"))
+        return counts
+
+    def failures(self) -> List[tuple]:
+        """(账单号, 尝试次数, 最后的错误)"""
+        return self.db.conn.execute(
+            "SELECT bill_number, attempts, last_error FROM submissions WHERE status = 'failed' ORDER BY bill_number"
+        ).fetchall()
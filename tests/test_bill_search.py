@@ -0,0 +1,49 @@
+"""BillSearch：trigram 索引查询与在原表上 LIKE 的结果一致"""
+import pytest
+
+from bill_search import BillSearch
+from db_manager import DBManager
+
+BILLS = [
+    ("1001", "Max Müller", "BMW", "Gebühr"),
+    ("1002", "Jörg Weiß", "ID.4", "Servicerate"),
+    ("2003", "Anna Schmidt", "AUDI", "Finanzleasingrate"),
+]
+TERMS = ["Mü", "ül", "Müller", "müller", "MÜLLER", "ß", "Weiß", "ör", "Max", "max", "ax", "a", "10", "1002",
+         "büh", "üh", "rate", "ID"]
+
+
+@pytest.fixture
+def db(tmp_path):
+    with DBManager(str(tmp_path / "bills.db")) as db:
+        db.bulk_ingest(({"bill_number": number, "date": "01.02.2024", "user_name": user, "vehicle_name": vehicle,
+                         "items": [{"item_name": item, "amount": 10.0, "tax": 1.9, "tax_rate": "19",
+                                    "total_amount": 11.9}]}, f"{number}.pdf")
+                       for number, user, vehicle, item in BILLS)
+        yield db
+
+
+def like(db, field, term):
+    table, column = ("bill_items", "bill_id") if field == "item_name" else ("bills", "id")
+    return sorted(row[0] for row in db.conn.execute(f"SELECT {column} FROM {table} WHERE {field} LIKE ?",
+                                                    (f"%{term}%",)))
+
+
+def test_umlaut_term_matches_like(db):
+    search = BillSearch(db.conn)
+    assert search.bill_ids("Mü") == [1]
+    assert search.bill_ids("üh", "item_name") == [1]
+
+
+@pytest.mark.parametrize("field", ["bill_number", "user_name", "vehicle_name", "item_name"])
+def test_bill_ids_same_as_like(db, field):
+    search = BillSearch(db.conn)
+    for term in TERMS:
+        assert sorted(search.bill_ids(term, field)) == like(db, field, term), term
+
+
+def test_suggest_umlaut(db):
+    search = BillSearch(db.conn)
+    assert search.suggest("Jö") == ["Jörg Weiß"]  # 短前缀
+    assert search.suggest("ülle") == ["Max Müller"]
+    assert search.suggest("eiß") == ["Jörg Weiß"]
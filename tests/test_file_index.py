@@ -0,0 +1,42 @@
+"""FileIndex.find_bill：找到的文件与原来的子串匹配相同，完整账单号的文件排在前面"""
+import os
+
+import pytest
+
+from file_index import FileIndex
+
+NAMES = ["Rechnung_01234.pdf", "Rechnung_12345.pdf", "Rechnung_1234.pdf", "A_1234_Gutschrift.pdf", "Rechnung_1234.txt", "Rechnung_999.pdf"]
+
+
+@pytest.fixture
+def index(tmp_path):
+    bills = tmp_path / "Bills"
+    bills.mkdir()
+    for name in NAMES:
+        (bills / name).touch()
+    index = FileIndex(bills, str(tmp_path / "bills.db"))
+    yield index
+    index.close()
+
+
+def listdir_match(directory, bill_number):
+    """原来 checkinfo 中的查找方式"""
+    return {f for f in os.listdir(directory) if f.endswith(".pdf") and bill_number in f}
+
+
+@pytest.mark.parametrize("bill_number", ["1234", "12345", "234", "999", "Rechnung", "4711"])
+def test_same_files_as_substring_match(index, bill_number):
+    found = {path.name for path in index.find_bill(bill_number)}
+    assert found == listdir_match(index.directory, bill_number)
+
+
+def test_exact_number_first(index):
+    # Rechnung_01234.pdf 按文件名排在 Rechnung_1234.pdf 之前，但账单号不是 1234
+    names = [path.name for path in index.find_bill("1234")]
+    assert names == ["A_1234_Gutschrift.pdf", "Rechnung_1234.pdf", "Rechnung_01234.pdf", "Rechnung_12345.pdf"]
+
+
+def test_partial_number_sorted_by_name(index):
+    names = [path.name for path in index.find_bill("234")]
+    assert names == ["A_1234_Gutschrift.pdf", "Rechnung_01234.pdf", "Rechnung_1234.pdf", "Rechnung_12345.pdf"]
+    assert [path.name for path in index.find_bill("2345")] == ["Rechnung_12345.pdf"]
@@ -0,0 +1,90 @@
+"""DBManager.replace_bills：重新解析后原地更新账单，多项对应同一张账单时不丢数据"""
+import pytest
+
+from db_manager import DBManager
+
+
+def bill(number, amount, user="Max Mustermann", vehicle="BMW"):
+    return {"bill_number": number, "date": "01.02.2024", "user_name": user, "vehicle_name": vehicle,
+            "items": [{"item_name": "Servicerate", "amount": amount, "tax": 1.0, "tax_rate": "19",
+                       "total_amount": amount + 1.0}]}
+
+
+@pytest.fixture
+def db(tmp_path):
+    with DBManager(str(tmp_path / "bills.db")) as db:
+        yield db
+
+
+def ingest(db, files):
+    """files: [(文件名/内容哈希, bill_data)]，按导入流程写入账单和清单"""
+    for name, bill_data in files:
+        bill_id = db.bulk_ingest([(bill_data, name)])[0]
+        db.record_manifest(name, 1, 1, name, bill_id)
+
+
+def state(db):
+    bills = {number: (bill_id, amount) for bill_id, number, amount in db.conn.execute(
+        "SELECT bills.id, bills.bill_number, bill_totals.net FROM bills "
+        "LEFT JOIN bill_totals ON bill_totals.bill_id = bills.id")}
+    manifest = dict(db.conn.execute("SELECT content_hash, bill_id FROM ingest_manifest"))
+    return bills, manifest
+
+
+def test_update_keeps_bill_id(db):
+    ingest(db, [("h1", bill("A", 10.0))])
+    db.replace_bills(["h1"], [(bill("A", 20.0), "h1")])
+    bills, manifest = state(db)
+    assert bills == {"A": (1, 20.0)}
+    assert manifest == {"h1": 1}
+
+
+def test_files_collapsed_into_one_bill_are_split(db):
+    # 旧的解析规则把两个文件都解析成 X，两条清单都指向账单 1
+    ingest(db, [("h1", bill("X", 10.0)), ("h2", bill("X", 10.0))])
+    assert state(db)[1] == {"h1": 1, "h2": 1}
+
+    db.replace_bills(["h1", "h2"], [(bill("Y1", 11.0), "h1"), (bill("Y2", 22.0), "h2")])
+    bills, manifest = state(db)
+    assert bills["Y1"] == (1, 11.0)
+    assert bills["Y2"][1] == 22.0 and bills["Y2"][0] != 1
+    assert set(bills) == {"Y1", "Y2"}
+    assert manifest == {"h1": 1, "h2": bills["Y2"][0]}
+
+
+def test_collapsed_files_split_across_batches(db):
+    ingest(db, [("h1", bill("X", 10.0)), ("h2", bill("X", 10.0))])
+    claimed = set()
+    db.replace_bills(["h1"], [(bill("Y1", 11.0), "h1")], claimed)
+    db.replace_bills(["h2"], [(bill("Y2", 22.0), "h2")], claimed)
+    bills, manifest = state(db)
+    assert bills["Y1"] == (1, 11.0)
+    assert bills["Y2"][1] == 22.0
+    assert manifest == {"h1": 1, "h2": bills["Y2"][0]}
+
+
+def test_new_number_equals_another_bills_old_number(db):
+    ingest(db, [("h1", bill("A", 10.0)), ("h2", bill("B", 20.0))])
+    # h1 改正为 B（h2 原来的账单号），h2 改正为 C
+    db.replace_bills(["h1", "h2"], [(bill("B", 11.0), "h1"), (bill("C", 22.0), "h2")])
+    bills, manifest = state(db)
+    assert set(bills) == {"B", "C"}
+    assert bills["B"][1] == 11.0 and bills["C"][1] == 22.0
+    assert manifest == {"h1": bills["B"][0], "h2": bills["C"][0]}
+
+
+def test_duplicate_files_merge_like_ingest(db):
+    # 两个文件确实是同一张账单：与导入时一样并入同一张，明细合并
+    ingest(db, [("h1", bill("A", 10.0)), ("h2", bill("B", 20.0))])
+    db.replace_bills(["h1", "h2"], [(bill("A", 10.0), "h1"), (bill("A", 5.0), "h2")])
+    bills, manifest = state(db)
+    assert bills == {"A": (1, 15.0)}
+    assert manifest == {"h1": 1, "h2": 1}
+
+
+def test_failed_parse_removes_bill(db):
+    ingest(db, [("h1", bill("A", 10.0)), ("h2", bill("B", 20.0))])
+    db.replace_bills(["h1", "h2"], [(bill("A", 10.0), "h1"), None])
+    bills, manifest = state(db)
+    assert bills == {"A": (1, 10.0)}
+    assert manifest == {"h1": 1, "h2": None}
@@ -0,0 +1,126 @@
+"""
+按PDF内容哈希缓存的提取文本
+
+导入时把 pdfplumber 取出的文本用 zlib 压缩后存入数据库的 text_cache 表，总大小超过上限时按最近使用时间淘汰。
+解析规则（_parse_bill_text）变化后，reparse 直接从缓存文本重建账单和明细，不需要再打开任何PDF。
+版面模式（--layout）下缓存的是各区域拼接的文本，与当时解析所用的文本一致
+"""
+import logging
+import time
+import zlib
+from typing import Iterable, Iterator, Optional, Tuple
+
+from db_manager import DBManager
+from pdf_extractor import PDFExtractor
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+
+class TextCache:
+    def __init__(self, db: DBManager, max_bytes: int = DEFAULT_MAX_BYTES, level: int = 9):
+        self.db = db
+        self.max_bytes = max_bytes
+        self.level = level
+
+    def put_many(self, entries: Iterable[Tuple[str, str, str]]):
+        """写入 (内容哈希, 模式, 文本)，之后按大小上限淘汰"""
+        now = time.time_ns()
+        rows = []
+        for content_hash, mode, text in entries:
+            raw = text.encode('utf-8')
+            data = zlib.compress(raw, self.level)
+            rows.append((content_hash, mode, data, len(raw), len(data), now))
+        if not rows:
+            return
+        with self.db.conn:
+            self.db.conn.executemany(
+                """
+                INSERT OR REPLACE INTO text_cache (content_hash, mode, data, raw_size, stored_size, last_used)
+                VALUES (?, ?, ?, ?, ?, ?)
+                """,
+                rows
+            )
+        self.evict()
+
+    def get(self, content_hash: str) -> Optional[str]:
+        row = self.db.conn.execute("SELECT data FROM text_cache WHERE content_hash = ?", (content_hash,)).fetchone()
+        if row is None:
+            return None
+        with self.db.conn:
+            self.db.conn.execute("UPDATE text_cache SET last_used = ? WHERE content_hash = ?",
+                                 (time.time_ns(), content_hash))
+        return zlib.decompress(row[0]).decode('utf-8')
+
+    def iter_texts(self, batch_size: int = 500) -> Iterator[Tuple[str, str]]:
+        """按内容哈希顺序逐批读出全部 (内容哈希, 文本)"""
+        last = ''
+        while True:
+            rows = self.db.conn.execute(
+                "SELECT content_hash, data FROM text_cache WHERE content_hash > ? ORDER BY content_hash LIMIT ?",
+                (last, batch_size)
+            ).fetchall()
+            if not rows:
+                return
+            for content_hash, data in rows:
+                yield content_hash, zlib.decompress(data).decode('utf-8')
+            last = rows[-1][0]
+
+    def stats(self) -> Tuple[int, int, int]:
+        """(条数, 原始字节数, 压缩后字节数)"""
+        return self.db.conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(raw_size), 0), COALESCE(SUM(stored_size), 0) FROM text_cache"
+        ).fetchone()
+
+    def evict(self):
+        """压缩后总大小超过 max_bytes 时，从最久未使用的开始删除"""
+        _, _, total = self.stats()
+        if total <= self.max_bytes:
+            return
+        excess = total - self.max_bytes
+        removed = 0
+        hashes = []
+        for content_hash, size in self.db.conn.execute(
+                "SELECT content_hash, stored_size FROM text_cache ORDER BY last_used"):
+            hashes.append((content_hash,))
+            removed += size
+            if removed >= excess:
+                break
+        with self.db.conn:
+            self.db.conn.executemany("DELETE FROM text_cache WHERE content_hash = ?", hashes)
+        logger.info(f"文本缓存超过 {self.max_bytes / 1e6:.0f} MB，已淘汰 {len(hashes)} 条")
+
+
+def reparse(db: DBManager, cache: TextCache, extractor: Optional[PDFExtractor] = None,
+            batch_size: int = 500) -> Tuple[int, int]:
+    """
+    用当前的解析规则从缓存文本重建账单和明细，每批在一个事务中原地更新（账单ID不变），返回 (成功, 失败) 数
+    没有缓存文本的账单保持不变；中途中断后重新运行即可。最后清理不再出现的输入提示取值
+    """
+    extractor = extractor or PDFExtractor()
+    succeeded = failed = 0
+    hashes, bills = [], []
+    claimed = set()  # 本次已写入的账单ID，后面的批次不再原地覆盖
+
+    def flush():
+        db.replace_bills(hashes, bills, claimed)
+        hashes.clear()
+        bills.clear()
+
+    for content_hash, text in cache.iter_texts(batch_size):
+        bill_data = extractor.extract_from_text(text)
+        if bill_data and extractor.validate_data(bill_data):
+            bills.append((bill_data, content_hash))
+            succeeded += 1
+        else:
+            logger.error(f"缓存文本解析失败: {content_hash}")
+            bills.append(None)
+            failed += 1
+        hashes.append(content_hash)
+        if len(hashes) >= batch_size:
+            flush()
+    if hashes:
+        flush()
+    db.prune_search_terms()
+    return succeeded, failed